@@ -5,17 +5,18 @@ from flask_cors import CORS
 from PIL import Image
 import io
 import numpy as np
-import torch
 
 # Local imports (ensure these modules exist)
 from detection.detect_faces import detect_face
-from embedding.embedding_module import get_face_embedding
-from utils.similarity import is_similar
-from supabase_utils.supabase_client import get_embeddings, store_embedding, upload_image
+from embedding.batcher import embed_face
+from supabase_utils.supabase_client import store_embedding, upload_image
+from supabase_utils.gallery_cache import get_gallery
+from utils.gallery_partitions import partition_router
 from supabase_utils.attendance_logger import mark_attendance, get_attendance_summary, get_all_registered_faces
+from supabase_utils.attendance_reports import query_attendance, attendance_counts, etag_matches
 
 app = Flask(__name__)
-CORS(app, origins=["http://localhost:3000"])
+CORS(app, origins=["http://localhost:3000"], expose_headers=["ETag"])
 
 @app.route('/api/register', methods=['POST'])
 def register():
@@ -36,12 +37,12 @@ def register():
             return jsonify({'error': 'No face detected'}), 400
 
         # Get face embedding
-        embedding = get_face_embedding(face_tensor)
+        embedding = embed_face(face_tensor)
         if embedding is None:
             return jsonify({'error': 'Could not generate embedding'}), 500
 
         # Convert embedding for storage
-        embedding = embedding.detach().cpu().numpy().flatten()
+        embedding = embedding.flatten()
 
         # Prepare image for upload
         face_np = face_tensor.permute(1, 2, 0).cpu().numpy()
@@ -71,30 +72,27 @@ def scan():
         if face_tensor is None:
             return jsonify({'status': 'no_face'}), 200
 
-        embedding = get_face_embedding(face_tensor)
+        embedding = embed_face(face_tensor)
         if embedding is None:
             return jsonify({'error': 'Could not generate embedding'}), 500
 
-        embedding = embedding.detach().cpu().numpy().flatten()
-
-        known_embeddings = get_embeddings()
-        if not known_embeddings:
+        gallery = get_gallery()
+        if len(gallery) == 0:
             return jsonify({'error': 'No registered faces'}), 400
 
-        for person in known_embeddings:
-            db_embedding = np.array(person['embedding'], dtype=np.float32).flatten()
-            similar, dist = is_similar(embedding, db_embedding)
-            if similar:
-                mark_attendance(
-                    name=person['name'],
-                    camera_id="web_camera",
-                    confidence=1.0 - dist
-                )
-                return jsonify({
-                    'status': 'recognized',
-                    'name': person['name'],
-                    'confidence': float(1.0 - dist)
-                }), 200
+        camera_id = request.form.get('camera_id', 'web_camera')
+        match = partition_router.match(gallery, embedding, camera_id)
+        if match is not None:
+            mark_attendance(
+                name=match['name'],
+                camera_id=camera_id,
+                confidence=1.0 - match['distance']
+            )
+            return jsonify({
+                'status': 'recognized',
+                'name': match['name'],
+                'confidence': float(1.0 - match['distance'])
+            }), 200
 
         return jsonify({'status': 'unknown_face'}), 200
 
@@ -111,6 +109,54 @@ def get_attendance():
         return jsonify({'error': str(e)}), 500
 
 
+def etag_response(payload, etag):
+    """JSON response carrying an ETag, or an empty 304 if the client already has it"""
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/api/attendance/records', methods=['GET'])
+def get_attendance_records():
+    try:
+        args = request.args
+        kwargs = {'limit': args['limit']} if args.get('limit') else {}
+        payload, etag = query_attendance(
+            start=args.get('start'),
+            end=args.get('end'),
+            name=args.get('name'),
+            camera_id=args.get('camera_id'),
+            cursor=args.get('cursor'),
+            **kwargs
+        )
+        return etag_response(payload, etag)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/attendance/stats', methods=['GET'])
+def get_attendance_stats():
+    try:
+        args = request.args
+        payload, etag = attendance_counts(
+            start=args.get('start'),
+            end=args.get('end'),
+            name=args.get('name'),
+            camera_id=args.get('camera_id')
+        )
+        return etag_response(payload, etag)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/faces', methods=['GET'])
 def get_faces():
     try:
@@ -1,20 +1,25 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import cv2
-import numpy as np
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from PIL import Image
 import io
-import base64
-import torch
-from detection.detect_faces import detect_face
-from embedding.embedding_module import get_face_embedding
-from utils.similarity import is_similar
-from supabase_utils.supabase_client import get_embeddings, store_embedding
+from config import (SCANNER_CAMERA_ID, SCANNER_MULTI_FACE, MOTION_GATE, SCANNER_JPEG_QUALITY, ENROLL_BATCH_SIZE,
+                    REGISTER_MAX_ITEMS, REGISTER_MAX_IMAGE_BYTES, WARMUP_ON_STARTUP, SCANNER_WS_PING_SECONDS)
+from utils.gallery import GalleryIndex
+from utils.gallery_partitions import partition_router
+from supabase_utils.supabase_client import store_embedding, store_embeddings
+from supabase_utils.gallery_cache import get_gallery
 from supabase_utils.attendance_logger import mark_attendance, get_attendance_summary, get_all_registered_faces
-from utils.image_utils import draw_box
+from supabase_utils.attendance_reports import query_attendance, attendance_counts, etag_matches
+from utils.bulk_registration import items_from_zip, name_from_path, detect_item
+from scanner.tracker import FaceTracker
+from scanner.broadcast import FrameBroadcaster
+from utils.executors import run_inference, run_io
+from utils.warmup import model_warmup
+# torch, cv2, facenet_pytorch and the models are imported on first use (or by
+# model_warmup at start-up), so endpoints that only read the database start fast
 import asyncio
-from typing import Dict, List, Optional
+from typing import List, Optional
 import threading
 import queue
 import time
@@ -33,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Add middleware to log all requests
@@ -58,17 +64,31 @@ camera_thread = None
 frame_queue = queue.Queue(maxsize=1)
 latest_detection = {"name": None, "timestamp": None, "status": "waiting"}
 
+def open_rgb_image(image_data):
+    """Decode uploaded bytes into an RGB PIL image"""
+    img_pil = Image.open(io.BytesIO(image_data))
+    img_pil.load()
+    if img_pil.mode != 'RGB':
+        img_pil = img_pil.convert('RGB')
+    return img_pil
+
 class CameraManager:
     def __init__(self):
+        self.lock = threading.Lock()  # one frame at a time: the tracker and camera are not thread-safe
         self.cap = None
+        self.thread = None
         self.is_running = False
-        self.known_embeddings = []
+        self.gallery = GalleryIndex()
+        self.multi_face = SCANNER_MULTI_FACE
+        self.tracker = FaceTracker()
+        self.motion_gate = None  # created with the camera
+        self.frame_id = 0
         
     def load_embeddings(self):
         """Load known embeddings from database"""
         try:
-            self.known_embeddings = get_embeddings()
-            logger.info(f"Loaded {len(self.known_embeddings)} embeddings")
+            self.gallery = get_gallery()
+            logger.info(f"Loaded {len(self.gallery)} embeddings")
             return True
         except Exception as e:
             logger.error(f"Error loading embeddings: {e}")
@@ -76,23 +96,50 @@ class CameraManager:
     
     def start_camera(self):
         """Start camera capture"""
-        if self.cap is not None:
-            self.cap.release()
+        import cv2
+        from scanner.motion import MotionGate
+
+        with self.lock:
+            if self.cap is not None:
+                self.cap.release()
             
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            raise Exception("Could not open camera")
+            self.cap = cv2.VideoCapture(0)
+            if not self.cap.isOpened():
+                raise Exception("Could not open camera")
             
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            self.cap.set(cv2.CAP_PROP_FPS, 30)
         
-        self.is_running = True
+            self.tracker = FaceTracker()
+            self.motion_gate = MotionGate() if MOTION_GATE else None
+            self.is_running = True
+
+        # Recognition runs on its own loop and publishes to frame_broadcaster,
+        # independent of how many clients are watching
+        self.thread = threading.Thread(target=self._run_loop, name="scanner-loop", daemon=True)
+        self.thread.start()
         return True
-    
+
+    def _run_loop(self):
+        """Read, process and publish frames until stop_camera()"""
+        while self.is_running:
+            with self.lock:
+                if not self.is_running:
+                    break
+                result = self.process_frame()
+            if result is None:
+                time.sleep(0.01)
+                continue
+            frame_broadcaster.publish(result.pop("jpeg"), result)
+
     def process_frame(self):
-        """Process a single frame for face recognition"""
+        """Process a single frame for face recognition (caller holds self.lock)"""
         global latest_detection
+        import cv2
+        from detection.detect_faces import detect_faces
+        from embedding.batcher import embedding_batcher
+        from utils.image_utils import draw_box
         
         if not self.cap or not self.cap.isOpened():
             return None
@@ -102,71 +149,98 @@ class CameraManager:
             return None
             
         try:
-            # Convert to PIL Image
-            img_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            face_tensor = detect_face(img_pil)
-            
-            if face_tensor is not None:
-                # Generate embedding
-                embedding = get_face_embedding(face_tensor)
-                
-                if embedding is not None:
-                    # Convert to numpy if tensor
-                    if isinstance(embedding, torch.Tensor):
-                        embedding = embedding.detach().cpu().numpy()
-                    embedding = embedding.flatten()
-                    
-                    # Check against known embeddings
-                    for item in self.known_embeddings:
-                        item_embedding = item.get("embedding")
-                        if item_embedding is None:
-                            continue
-                            
-                        item_embedding = np.array(item_embedding, dtype=np.float32).flatten()
-                        similar, dist = is_similar(embedding, item_embedding)
-                        
-                        if similar:
-                            name = item.get("name", "Unknown")
-                            confidence = 1.0 - dist
-                            
-                            # Mark attendance
-                            attendance_marked = mark_attendance(
-                                name=name,
-                                camera_id="camera_0",
-                                confidence=confidence
-                            )
-                            
-                            latest_detection = {
-                                "name": name,
-                                "timestamp": time.time(),
-                                "status": "marked" if attendance_marked else "already_present",
-                                "confidence": confidence,
-                                "distance": dist
-                            }
-                            
-                            # Draw box on frame
-                            if attendance_marked:
-                                draw_box(frame, f"✅ {name} - Attendance Marked!")
-                            else:
-                                draw_box(frame, f"Present: {name}")
-                            break
+            detections = []
+            events = []
+            self.frame_id += 1
+
+            # Skip detection on static scenes unless a face is mid-identification
+            # (tracks judged unknown are re-checked on their own cadence)
+            identifying = any(not track.decided and not track.unknown for track in self.tracker.visible_tracks())
+            if self.motion_gate is None or self.motion_gate.should_detect(frame, force=identifying):
+                # The BGR frame goes to MTCNN as-is (no PIL round-trip)
+                faces = detect_faces(frame, max_faces=None if self.multi_face else 1, color="BGR")
+
+                # Follow faces across frames; only new or not yet identified
+                # tracks are embedded, and attendance is marked once per track
+                to_embed = [
+                    (track, face) for track, face in self.tracker.update(faces, self.frame_id)
+                    if self.tracker.needs_embedding(track)
+                ]
+            else:
+                to_embed = []
+
+            if to_embed:
+                # Embed through the shared batcher, then match them all
+                # against the gallery in one query (students timetabled for
+                # this camera first); the shared cache picks up faces
+                # registered since start
+                embeddings = embedding_batcher.embed_many([face["face"] for _, face in to_embed])
+                self.gallery = get_gallery()
+                matches = partition_router.match_many(self.gallery, embeddings, SCANNER_CAMERA_ID)
+
+                for (track, _), match in zip(to_embed, matches):
+                    track.last_embedded_frame = self.frame_id
+                    track.embeddings += 1
+                    if self.tracker.vote(track, match):
+                        # Mark attendance
+                        attendance_marked = mark_attendance(
+                            name=track.identity,
+                            camera_id=SCANNER_CAMERA_ID,
+                            confidence=track.confidence
+                        )
+                        track.status = "marked" if attendance_marked else "already_present"
+                        events.append({
+                            "type": "attendance",
+                            "name": track.identity,
+                            "status": track.status,
+                            "confidence": track.confidence,
+                            "track_id": track.id,
+                            "timestamp": time.time()
+                        })
+
+            for track in self.tracker.visible_tracks():
+                if track.decided:
+                    detection = {
+                        "name": track.identity,
+                        "timestamp": time.time(),
+                        "status": track.status,
+                        "confidence": track.confidence,
+                        "distance": 1.0 - track.confidence,
+                        "box": track.box,
+                        "track_id": track.id
+                    }
+
+                    # Draw box on frame
+                    if track.status == "marked":
+                        draw_box(frame, f"✅ {track.identity} - Attendance Marked!", track.box)
                     else:
-                        latest_detection = {
-                            "name": "Unknown",
-                            "timestamp": time.time(),
-                            "status": "unknown",
-                            "confidence": 0.0,
-                            "distance": 1.0
-                        }
-                        draw_box(frame, "Unknown Face")
+                        draw_box(frame, f"Present: {track.identity}", track.box)
+                else:
+                    detection = {
+                        "name": "Unknown",
+                        "timestamp": time.time(),
+                        "status": "unknown" if track.unknown else "identifying",
+                        "confidence": 0.0,
+                        "distance": 1.0,
+                        "box": track.box,
+                        "track_id": track.id
+                    }
+                    draw_box(frame, "Unknown Face" if track.unknown else "Identifying...", track.box)
+                detections.append(detection)
+
+            # Keep the single-detection field for existing clients
+            settled = [d for d in detections if d["status"] != "identifying"]
+            if settled:
+                latest_detection = max(settled, key=lambda d: d["confidence"])
                         
-            # Convert frame to base64 for streaming
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_b64 = base64.b64encode(buffer).decode('utf-8')
+            # Encode once; every viewer shares this JPEG
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, SCANNER_JPEG_QUALITY])
             
             return {
-                "frame": frame_b64,
-                "detection": latest_detection
+                "jpeg": buffer.tobytes(),
+                "detection": latest_detection,
+                "detections": detections,
+                "events": events
             }
             
         except Exception as e:
@@ -176,12 +250,17 @@ class CameraManager:
     def stop_camera(self):
         """Stop camera capture"""
         self.is_running = False
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+        with self.lock:
+            if self.cap:
+                self.cap.release()
+                self.cap = None
 
 # Global camera manager
 camera_manager = CameraManager()
+frame_broadcaster = FrameBroadcaster()
 
 @app.post("/api/register-face")
 async def register_face(
@@ -189,6 +268,9 @@ async def register_face(
     file: UploadFile = File(...)
 ):
     """Register a new face"""
+    from detection.detect_faces import detect_face
+    from embedding.batcher import embed_face
+
     try:
         logger.info(f"Attempting to register face for: {name}")
         logger.info(f"File info: {file.filename}, {file.content_type}, {file.size}")
@@ -214,19 +296,15 @@ async def register_face(
         
         # Convert to PIL Image
         try:
-            img_pil = Image.open(io.BytesIO(image_data))
+            img_pil = await run_inference(open_rgb_image, image_data)
             logger.info(f"Image opened successfully: {img_pil.size}, {img_pil.mode}")
-            
-            if img_pil.mode != 'RGB':
-                img_pil = img_pil.convert('RGB')
-                logger.info("Converted image to RGB")
         except Exception as e:
             logger.error(f"Error opening image: {e}")
             raise HTTPException(status_code=400, detail="Invalid image file")
         
         # Detect face
         try:
-            face_tensor = detect_face(img_pil)
+            face_tensor = await run_inference(detect_face, img_pil)
             logger.info(f"Face detection result: {face_tensor is not None}")
         except Exception as e:
             logger.error(f"Error detecting face: {e}")
@@ -237,7 +315,7 @@ async def register_face(
         
         # Generate embedding
         try:
-            embedding = get_face_embedding(face_tensor)
+            embedding = await run_inference(embed_face, face_tensor)
             logger.info(f"Embedding generation result: {embedding is not None}")
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
@@ -247,12 +325,12 @@ async def register_face(
             raise HTTPException(status_code=400, detail="Could not generate face embedding")
         
         # Convert to numpy if tensor
-        if isinstance(embedding, torch.Tensor):
+        if hasattr(embedding, "detach"):
             embedding = embedding.detach().cpu().numpy()
         
         # Store in database
         try:
-            store_embedding(name.strip(), embedding, None)
+            await run_io(store_embedding, name.strip(), embedding, None)
             logger.info(f"Successfully stored embedding for {name}")
         except Exception as e:
             logger.error(f"Error storing embedding: {e}")
@@ -270,6 +348,83 @@ async def register_face(
         logger.error(f"Unexpected error registering face: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/api/register-faces")
+async def register_faces(
+    names: List[str] = Form([]),
+    files: List[UploadFile] = File([]),
+    archive: Optional[UploadFile] = File(None)
+):
+    """
+    Register many faces at once: `files` paired with `names` by position
+    (a missing name falls back to the file name), and/or a zip `archive`
+    of "<name>.jpg" or "<name>/<photo>.jpg" entries. Faces are detected in
+    parallel, embedded in batches and stored with one bulk insert; the
+    response has a status per image. Images over REGISTER_MAX_IMAGE_BYTES
+    are reported as "too_large" without being read in full.
+    """
+    from embedding.embedding_module import get_face_embeddings
+
+    if len(files) > REGISTER_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {REGISTER_MAX_ITEMS} images per request")
+
+    items = []
+    for i, file in enumerate(files):
+        name = names[i].strip() if i < len(names) and names[i] else name_from_path(file.filename or "")
+        data = await file.read(REGISTER_MAX_IMAGE_BYTES + 1)
+        items.append((name, file.filename, data if len(data) <= REGISTER_MAX_IMAGE_BYTES else None))
+    if archive is not None:
+        max_archive_bytes = REGISTER_MAX_ITEMS * REGISTER_MAX_IMAGE_BYTES
+        data = await archive.read(max_archive_bytes + 1)
+        if len(data) > max_archive_bytes:
+            raise HTTPException(status_code=413, detail=f"Archive is larger than {max_archive_bytes} bytes")
+        try:
+            items.extend(await run_inference(items_from_zip, data, REGISTER_MAX_ITEMS))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if not items:
+        raise HTTPException(status_code=400, detail="No images provided")
+    if len(items) > REGISTER_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {REGISTER_MAX_ITEMS} images per request")
+    logger.info(f"Bulk registration of {len(items)} images")
+
+    results = [{"index": i, "name": name, "filename": filename, "status": None} for i, (name, filename, _) in enumerate(items)]
+    detections = await asyncio.gather(*(run_inference(detect_item, data) for _, _, data in items))
+
+    faces = []
+    for result, (face, status) in zip(results, detections):
+        if not result["name"]:
+            result["status"] = "missing_name"
+        elif face is None:
+            result["status"] = status
+        else:
+            faces.append((result, face))
+
+    embeddings = []
+    for start in range(0, len(faces), ENROLL_BATCH_SIZE):
+        batch = [face for _, face in faces[start:start + ENROLL_BATCH_SIZE]]
+        embeddings.extend(await run_inference(get_face_embeddings, batch))
+
+    if faces:
+        try:
+            rows = await run_io(store_embeddings, [(result["name"], embedding, None)
+                                                   for (result, _), embedding in zip(faces, embeddings)])
+            for (result, _), row in zip(faces, rows):
+                result["status"] = "registered"
+                result["id"] = row.get("id")
+        except Exception as e:
+            logger.error(f"Error storing bulk registration: {e}")
+            for result, _ in faces:
+                result["status"] = "error"
+
+    registered = sum(result["status"] == "registered" for result in results)
+    return {
+        "success": registered > 0,
+        "registered": registered,
+        "failed": len(results) - registered,
+        "results": results
+    }
+
 @app.post("/api/start-scanner")
 async def start_scanner():
     """Start the attendance scanner"""
@@ -280,20 +435,20 @@ async def start_scanner():
             return {"success": False, "message": "Scanner is already running"}
         
         # Load embeddings
-        if not camera_manager.load_embeddings():
+        if not await run_io(camera_manager.load_embeddings):
             raise HTTPException(status_code=500, detail="Failed to load known faces from database")
         
-        if len(camera_manager.known_embeddings) == 0:
+        if len(camera_manager.gallery) == 0:
             raise HTTPException(status_code=400, detail="No registered faces found. Register faces first.")
         
         # Start camera
-        camera_manager.start_camera()
+        await run_io(camera_manager.start_camera)
         camera_active = True
         
         return {
             "success": True,
             "message": "Scanner started successfully",
-            "registered_faces": len(camera_manager.known_embeddings)
+            "registered_faces": len(camera_manager.gallery)
         }
         
     except Exception as e:
@@ -309,7 +464,7 @@ async def stop_scanner():
         if not camera_active:
             return {"success": False, "message": "Scanner is not running"}
         
-        camera_manager.stop_camera()
+        await run_io(camera_manager.stop_camera)
         camera_active = False
         
         return {
@@ -323,35 +478,97 @@ async def stop_scanner():
 
 @app.get("/api/scanner-frame")
 async def get_scanner_frame():
-    """Get current frame from scanner"""
+    """Get the latest processed frame from the scanner (for polling clients)"""
     try:
         if not camera_active:
             raise HTTPException(status_code=400, detail="Scanner is not running")
         
-        frame_data = camera_manager.process_frame()
-        if frame_data is None:
+        seq, jpeg, payload = frame_broadcaster.latest()
+        if jpeg is None:
+            seq, jpeg, payload = await frame_broadcaster.next_frame(seq)
+        if jpeg is None:
             raise HTTPException(status_code=500, detail="Failed to capture frame")
         
-        return frame_data
+        return {
+            "frame": frame_broadcaster.latest_b64(),
+            "detection": payload["detection"],
+            "detections": payload["detections"]
+        }
         
     except Exception as e:
         logger.error(f"Error getting frame: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/scanner-stream")
+async def scanner_stream():
+    """Annotated scanner frames as an MJPEG (multipart/x-mixed-replace) stream"""
+    if not camera_active:
+        raise HTTPException(status_code=400, detail="Scanner is not running")
+
+    async def mjpeg():
+        seq = 0
+        while camera_active:
+            new_seq, jpeg, _ = await frame_broadcaster.next_frame(seq)
+            if new_seq == seq or jpeg is None:
+                continue
+            seq = new_seq
+            yield (
+                b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n"
+            )
+
+    return StreamingResponse(mjpeg(), media_type="multipart/x-mixed-replace; boundary=frame")
+
+@app.websocket("/api/scanner-ws")
+async def scanner_socket(websocket: WebSocket, frames: bool = True):
+    """
+    Push scanner updates to a client. With frames=true every new frame is sent
+    as {"type": "frame", "frame": <base64 JPEG>, "detection", "detections",
+    "events"}; with frames=false only frames carrying attendance events are
+    sent, without the image. A {"type": "ping"} goes out whenever nothing
+    else has been sent for SCANNER_WS_PING_SECONDS, so idle connections stay
+    alive and a client that has gone away is noticed on the next send.
+    """
+    await websocket.accept()
+    seq = frame_broadcaster.seq
+    last_sent = time.monotonic()
+    try:
+        while True:
+            new_seq, jpeg, payload = await frame_broadcaster.next_frame(seq, timeout=SCANNER_WS_PING_SECONDS)
+            message = None
+            if new_seq != seq and payload is not None:
+                seq = new_seq
+                if frames or payload["events"]:
+                    message = {"type": "frame", "seq": seq, **payload}
+                    if frames:
+                        message["frame"] = frame_broadcaster.latest_b64()
+            if message is None and time.monotonic() - last_sent >= SCANNER_WS_PING_SECONDS:
+                message = {"type": "ping", "active": camera_active}
+
+            if message is not None:
+                await websocket.send_json(message)
+                last_sent = time.monotonic()
+    except WebSocketDisconnect:
+        pass
+
 @app.get("/api/scanner-status")
 async def get_scanner_status():
     """Get scanner status and latest detection"""
     return {
         "active": camera_active,
         "latest_detection": latest_detection,
-        "registered_faces": len(camera_manager.known_embeddings) if camera_manager.known_embeddings else 0
+        "registered_faces": len(camera_manager.gallery),
+        "motion_gate": camera_manager.motion_gate.stats() if camera_manager.motion_gate else None,
+        "camera_id": SCANNER_CAMERA_ID,
+        "active_partitions": partition_router.active_partitions(SCANNER_CAMERA_ID),
+        "partition_matching": partition_router.stats()
     }
 
 @app.get("/api/attendance-summary")
 async def get_attendance_summary_api():
     """Get today's attendance summary"""
     try:
-        summary = get_attendance_summary()
+        summary = await run_io(get_attendance_summary)
         return {
             "success": True,
             "summary": summary
@@ -360,11 +577,61 @@ async def get_attendance_summary_api():
         logger.error(f"Error getting attendance summary: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def etag_response(request, payload, etag):
+    """JSON response carrying an ETag, or an empty 304 if the client already has it"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse({"success": True, **payload}, headers=headers)
+
+@app.get("/api/attendance/records")
+async def get_attendance_records(
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    name: Optional[str] = None,
+    camera_id: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: Optional[int] = None
+):
+    """
+    Attendance records between start and end (YYYY-MM-DD or ISO datetimes,
+    default today), filtered by person name and/or camera. Paginated by
+    id: pass next_cursor from one page as cursor for the next.
+    """
+    try:
+        kwargs = {"limit": limit} if limit else {}
+        payload, etag = await run_io(query_attendance, start, end, name, camera_id, cursor, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error querying attendance: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return etag_response(request, payload, etag)
+
+@app.get("/api/attendance/stats")
+async def get_attendance_stats(
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    name: Optional[str] = None,
+    camera_id: Optional[str] = None
+):
+    """Attendance counts per person per day (plus totals) between start and end"""
+    try:
+        payload, etag = await run_io(attendance_counts, start, end, name, camera_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error aggregating attendance: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return etag_response(request, payload, etag)
+
 @app.get("/api/registered-faces")
 async def get_registered_faces_api():
     """Get all registered faces"""
     try:
-        faces = get_all_registered_faces()
+        faces = await run_io(get_all_registered_faces)
         return {
             "success": True,
             "faces": faces
@@ -373,15 +640,34 @@ async def get_registered_faces_api():
         logger.error(f"Error getting registered faces: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.on_event("startup")
+async def start_warmup():
+    """Load and warm the models in the background; the server accepts requests meanwhile"""
+    if WARMUP_ON_STARTUP:
+        model_warmup.start()
+
+@app.on_event("shutdown")
+async def flush_attendance():
+    """Write out queued attendance marks before the process exits"""
+    import sys
+    if "supabase_utils.attendance_queue" in sys.modules:
+        await run_io(sys.modules["supabase_utils.attendance_queue"].attendance_writer.flush)
+
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness: answers as soon as the server is up)"""
     return {
         "status": "healthy",
         "scanner_active": camera_active,
         "timestamp": time.time()
     }
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness: 200 once the models are loaded and warmed up, 503 until then"""
+    status = model_warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 # Add a test endpoint to check if the server is receiving requests properly
 @app.post("/api/test-upload")
 async def test_upload(file: UploadFile = File(...)):
@@ -410,8 +696,14 @@ if __name__ == "__main__":
     print()
     print("🔧 Endpoints:")
     print("   - POST /api/register-face")
+    print("   - POST /api/register-faces")
     print("   - POST /api/start-scanner")
     print("   - GET /api/scanner-frame")
+    print("   - GET /api/scanner-stream (MJPEG)")
+    print("   - WS  /api/scanner-ws")
     print("   - GET /api/attendance-summary")
+    print("   - GET /api/attendance/records")
+    print("   - GET /api/attendance/stats")
+    print("   - GET /api/health, /api/ready")
     print()
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
@@ -1,16 +1,13 @@
 import cv2
 import sys
 import os
-import torch
 from detection.detect_faces import detect_face
 from embedding.embedding_module import get_face_embedding
-from utils.similarity import is_similar
-from supabase_utils.supabase_client import upload_image, get_embeddings, store_embedding, debug_database_connection
-from supabase_utils.attendance_logger import mark_attendance, get_attendance_summary, get_all_registered_faces, clear_today_attendance  # Updated imports
-from utils.image_utils import draw_box
+from supabase_utils.supabase_client import upload_image, store_embedding, debug_database_connection
+from supabase_utils.gallery_cache import get_gallery
+from supabase_utils.attendance_logger import get_attendance_summary, get_all_registered_faces, clear_today_attendance  # Updated imports
+from scanner.pipeline import ScannerPipeline
 import numpy as np
-from PIL import Image
-from torchvision import transforms
 
 def test_database_setup():
     """Test database connection and setup"""
@@ -51,13 +48,9 @@ def register_user():
         return
 
     try:
-        # Convert BGR to RGB and then to PIL
-        img_pil = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
-        print(f"✅ Converted to PIL: {img_pil.size}")
-
-        # Detect face
+        # Detect face (straight from the BGR array)
         print("🔍 Calling detect_face()...")
-        face_tensor = detect_face(img_pil)
+        face_tensor = detect_face(img, color="BGR")
 
         print(f"detect_face() returned: {type(face_tensor)}")
 
@@ -135,11 +128,10 @@ def realtime_attendance():
     # Load known embeddings from faces table
     try:
         print("🔍 Loading known embeddings from database...")
-        known_embeddings = get_embeddings()  # This should pull from faces table
-        print(f"🔍 get_embeddings() returned: {type(known_embeddings)}")
-        print(f"🔍 Number of embeddings: {len(known_embeddings) if known_embeddings else 0}")
+        gallery = get_gallery()  # Cached index over the faces table
+        print(f"🔍 Number of embeddings: {len(gallery)}")
         
-        if not known_embeddings:
+        if len(gallery) == 0:
             print("⚠️ Warning: No registered faces found. Register faces first.")
             print("🔍 Let's check what faces are in the database...")
             
@@ -150,12 +142,7 @@ def realtime_attendance():
             cap.release()
             return
             
-        print(f"✅ Retrieved {len(known_embeddings)} face embeddings")
-        
-        # Debug: Print first embedding structure
-        if len(known_embeddings) > 0:
-            first_embedding = known_embeddings[0]
-            print(f"🔍 First embedding structure: {first_embedding.keys() if hasattr(first_embedding, 'keys') else type(first_embedding)}")
+        print(f"✅ Retrieved {len(gallery)} face embeddings")
             
     except Exception as e:
         print(f"❌ Error loading embeddings: {e}")
@@ -164,108 +151,39 @@ def realtime_attendance():
         cap.release()
         return
 
-    frame_count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret or frame is None or frame.size == 0:
-            print("⚠️ Failed to grab frame")
-            continue
-
-        frame_count += 1
-        
-        try:
-            # Process every 5th frame for efficiency
-            if frame_count % 5 == 0:
-                img_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-                face_tensor = detect_face(img_pil)
-
-                if face_tensor is not None:
-                    print("🔍 Face detected, generating embedding...")
-                    embedding = get_face_embedding(face_tensor)
-                    
-                    if embedding is not None:
-                        print(f"✅ Generated embedding: shape={embedding.shape if hasattr(embedding, 'shape') else 'no shape'}")
-                        
-                        # Convert embedding to numpy if it's a tensor
-                        if isinstance(embedding, torch.Tensor):
-                            embedding = embedding.detach().cpu().numpy()
-                        
-                        # Ensure embedding is flattened
-                        embedding = embedding.flatten()
-                        print(f"🔍 Flattened embedding shape: {embedding.shape}")
-                        
-                        matched = False
-                        
-                        for i, item in enumerate(known_embeddings):
-                            try:
-                                print(f"🔍 Checking against item {i}: {item.keys() if hasattr(item, 'keys') else type(item)}")
-                                
-                                item_embedding = item.get("embedding")
-                                if item_embedding is None:
-                                    print(f"⚠️ Item {i} has no embedding")
-                                    continue
-
-                                # Convert DB embedding to NumPy and flatten
-                                item_embedding = np.array(item_embedding, dtype=np.float32).flatten()
-                                print(f"🔍 DB embedding shape: {item_embedding.shape}")
-
-                                # Similarity check
-                                similar, dist = is_similar(embedding, item_embedding)
-                                
-                                if similar:
-                                    matched = True
-                                    name = item.get("name", "Unknown")
-                                    print(f"🎯 MATCH FOUND: {name} (distance={dist:.4f})")
-                                    
-                                    # ✅ Mark attendance in database
-                                    attendance_marked = mark_attendance(
-                                        name=name, 
-                                        camera_id="camera_0",
-                                        confidence=1.0 - dist  # Convert distance to confidence
-                                    )
-                                    
-                                    if attendance_marked:
-                                        draw_box(frame, f"✅ {name} - Attendance Marked!")
-                                        print(f"[✓] Attendance marked for {name} (distance={dist:.4f})")
-                                    else:
-                                        draw_box(frame, f"Present: {name} (Already marked)")
-                                        print(f"[✓] {name} recognized but attendance already marked recently")
-                                    
-                                    break
-                                else:
-                                    print(f"[X] Not a match with {item.get('name')} (distance={dist:.4f})")
-                                        
-                            except Exception as e:
-                                print(f"⚠️ Error comparing embeddings with item {i}: {e}")
-                                continue
-
-                        if not matched:
-                            print("❌ No match found for detected face")
-                            draw_box(frame, "Unknown Face")
-                    else:
-                        print("❌ Failed to generate embedding")
-                else:
-                    print("❌ No face detected in frame")
-        
-        except Exception as e:
-            print(f"⚠️ Processing error: {e}")
-            import traceback
-            traceback.print_exc()
-            continue
-
-        # Display frame
-        try:
-            cv2.imshow("Attendance", frame)
-        except Exception as e:
-            print(f"❌ Error displaying frame: {e}")
-            break
-            
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+    # Capture, detection, embedding, matching and attendance logging run on
+    # their own threads; this loop only displays frames at camera rate
+    pipeline = ScannerPipeline(cap)  # camera id from SCANNER_CAMERA_ID
+    pipeline.start()
 
-    # Cleanup
-    cap.release()
-    cv2.destroyAllWindows()
+    last_frame_id = None
+    try:
+        while True:
+            latest = pipeline.read()
+            if latest is None or latest[0] == last_frame_id:
+                if cv2.waitKey(5) & 0xFF == ord('q'):
+                    break
+                continue
+
+            last_frame_id, frame = latest
+            frame = pipeline.annotate(frame.copy())
+
+            # Display frame
+            try:
+                cv2.imshow("Attendance", frame)
+            except Exception as e:
+                print(f"❌ Error displaying frame: {e}")
+                break
+
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+    finally:
+        # Cleanup
+        pipeline.stop()
+        print(f"📊 Scanner stats: {pipeline.stats()}")
+        cap.release()
+        cv2.destroyAllWindows()
 
 def view_attendance_summary():
     """View today's attendance summary"""
@@ -0,0 +1,95 @@
+# benchmarks/ann_benchmark.py
+"""
+Recall vs latency of the IVF gallery index against exact search.
+
+Uses synthetic FaceNet-like data: unit-length 512-d identity embeddings,
+with queries drawn as noisy views of enrolled identities (cosine distance
+to their own gallery entry of roughly 0.2-0.4, as for real camera frames).
+Identities are spread uniformly over the sphere, which is the worst case
+for IVF; real galleries cluster more and reach a given recall at lower nprobe.
+
+Run from the backend directory:
+    python -m benchmarks.ann_benchmark --faces 50000 --queries 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.gallery import GalleryIndex, l2_normalize  # noqa: E402
+from utils.ann_index import IVFIndex  # noqa: E402
+
+
+def synthetic_gallery(n_faces, dim=512, seed=0):
+    rng = np.random.default_rng(seed)
+    return l2_normalize(rng.standard_normal((n_faces, dim), dtype=np.float32))
+
+
+def synthetic_queries(gallery, n_queries, noise=0.045, seed=1):
+    rng = np.random.default_rng(seed)
+    truth = rng.choice(len(gallery), n_queries, replace=False)
+    queries = gallery[truth] + noise * rng.standard_normal((n_queries, gallery.shape[1]), dtype=np.float32)
+    return l2_normalize(queries), truth
+
+
+def time_queries(index, queries, k):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([r["id"] for r in index.search(query, k=k)])
+    elapsed = time.perf_counter() - start
+    return results, elapsed / len(queries) * 1000
+
+
+def recall_at_k(results, reference):
+    hits = sum(len(set(r) & set(ref)) for r, ref in zip(results, reference))
+    return hits / sum(len(ref) for ref in reference)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=1)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print(f"📊 {args.faces} faces x 512-d, {args.queries} queries, k={args.k}")
+    embeddings = synthetic_gallery(args.faces)
+    queries, _ = synthetic_queries(embeddings, args.queries)
+    ids = np.arange(args.faces)
+    names = [f"student_{i}" for i in ids]
+
+    exact = GalleryIndex(ids, names, embeddings)
+    reference, exact_ms = time_queries(exact, queries, args.k)
+    print(f"exact        : {exact_ms:8.3f} ms/query  recall=1.000  matrix={exact.matrix.nbytes / 1e6:.1f} MB")
+
+    start = time.perf_counter()
+    ivf = IVFIndex(ids, names, embeddings, nlist=args.nlist)
+    build_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "ivf.npz")
+        start = time.perf_counter()
+        ivf.save(path)
+        save_s = time.perf_counter() - start
+        start = time.perf_counter()
+        ivf = IVFIndex.load(path)
+        load_s = time.perf_counter() - start
+    print(f"ivf build    : {build_s:.2f}s (nlist={ivf.nlist}), save {save_s:.2f}s, load {load_s:.2f}s")
+
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        results, ivf_ms = time_queries(ivf, queries, args.k)
+        print(f"ivf nprobe={nprobe:<3}: {ivf_ms:8.3f} ms/query  recall={recall_at_k(results, reference):.3f}"
+              f"  speedup={exact_ms / ivf_ms:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/frame_path_benchmark.py
+"""
+Per-frame cost of handing camera frames to MTCNN: the old path
+(cv2.cvtColor -> Image.fromarray -> detect on the PIL image, which
+facenet_pytorch turns back into an array with np.uint8 + np.stack + copy)
+against detect_faces(frame, color="BGR"), which makes one cvtColor copy
+and wraps it as a tensor.
+
+For each resolution a test image is pasted into a BGR frame of that size.
+Reported per frame:
+  - bytes of full-frame intermediates made before MTCNN's own float
+    conversion (identical on both paths, so left out)
+  - median time of the conversion alone and of the full detect + crop
+  - the largest difference between the aligned faces of the two paths
+
+Run from the backend directory:
+    python -m benchmarks.frame_path_benchmark --sizes 640x480 1920x1080 --runs 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection import detect_faces as detection  # noqa: E402
+
+TEST_IMAGE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_images", "alice.jpg")
+
+
+def make_frame(path, width, height):
+    """BGR frame of the given size with the test image scaled into its centre"""
+    image = cv2.imread(path)
+    scale = min(width / image.shape[1], height / image.shape[0]) * 0.8
+    image = cv2.resize(image, (int(image.shape[1] * scale), int(image.shape[0] * scale)))
+    frame = np.full((height, width, 3), 90, np.uint8)
+    y, x = (height - image.shape[0]) // 2, (width - image.shape[1]) // 2
+    frame[y:y + image.shape[0], x:x + image.shape[1]] = image
+    return frame
+
+
+def old_conversion(frame):
+    """The copies the PIL path makes before MTCNN sees the frame; returns (tensor, bytes allocated)"""
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    pil = Image.fromarray(rgb)
+    array = np.uint8(pil)
+    stacked = np.stack([array])
+    tensor = torch.as_tensor(stacked.copy())
+    pil_bytes = pil.width * pil.height * 4  # PIL stores RGB as 4 bytes per pixel
+    return tensor, rgb.nbytes + pil_bytes + array.nbytes + stacked.nbytes * 2
+
+
+def new_conversion(frame):
+    tensor = detection.to_frame_tensor(frame, "BGR")
+    shares = tensor.data_ptr() == frame.ctypes.data
+    return tensor, 0 if shares else tensor.numel() * tensor.element_size()
+
+
+def old_detect(frame):
+    pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    boxes, probs = detection.mtcnn.detect(pil)
+    if boxes is None:
+        return []
+    return [detection.mtcnn.extract(pil, box[None], None) for box in boxes[probs >= detection.MIN_FACE_PROB]]
+
+
+def new_detect(frame):
+    return [d["face"] for d in detection.detect_faces(frame, color="BGR")]
+
+
+def median_ms(old, new, frame, runs):
+    """Median times of the two paths, alternated run by run so drift affects both alike"""
+    old(frame), new(frame)  # warm-up
+    times = ([], [])
+    for _ in range(runs):
+        for fn, samples in zip((old, new), times):
+            start = time.perf_counter()
+            fn(frame)
+            samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times[0]), statistics.median(times[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=["640x480", "1920x1080"])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--image", default=TEST_IMAGE)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    print(f"📊 torch {torch.__version__}, {torch.get_num_threads()} threads")
+
+    for size in args.sizes:
+        width, height = (int(v) for v in size.lower().split("x"))
+        frame = make_frame(args.image, width, height)
+
+        _, old_bytes = old_conversion(frame)
+        _, new_bytes = new_conversion(frame)
+        old_convert, new_convert = median_ms(old_conversion, new_conversion, frame, args.runs)
+        old_total, new_total = median_ms(old_detect, new_detect, frame, args.runs)
+
+        old_faces, new_faces = old_detect(frame), new_detect(frame)
+        if len(old_faces) == len(new_faces) and old_faces:
+            diff = max(float((a - b).abs().max()) for a, b in zip(old_faces, new_faces))
+            parity = f"{len(new_faces)} face(s), max diff {diff:.4f}"
+        else:
+            parity = f"face count differs: {len(old_faces)} vs {len(new_faces)}"
+
+        print(f"\n{width}x{height}  ({parity})")
+        print(f"  intermediates  PIL path {old_bytes / 1e6:6.2f} MB   array path {new_bytes / 1e6:6.2f} MB")
+        print(f"  conversion     PIL path {old_convert:6.2f} ms   array path {new_convert:6.2f} ms")
+        print(f"  detect + crop  PIL path {old_total:6.1f} ms   array path {new_total:6.1f} ms"
+              f"   ({old_total - new_total:+.1f} ms saved)")
+
+
+if __name__ == "__main__":
+    main()
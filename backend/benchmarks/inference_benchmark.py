@@ -0,0 +1,106 @@
+# benchmarks/inference_benchmark.py
+"""
+Accuracy parity and CPU latency of the embedding backends
+(embedding/inference_backends.py) against eager PyTorch.
+
+Faces are detected in backend/test_images with MTCNN and embedded by
+every backend. A backend passes parity if each face's embedding has a
+cosine similarity of at least --tolerance with the eager embedding; the
+script exits non-zero if any available backend fails. Latency is the
+median of --runs forward passes at each batch size.
+
+Run from the backend directory:
+    python -m benchmarks.inference_benchmark --threads 4 --batch 1 8 32
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detection.detect_faces import detect_face  # noqa: E402
+from embedding.inference_backends import BACKENDS, build_backend, configure_threads, bf16_supported  # noqa: E402
+from utils.model_weights import load_resnet  # noqa: E402
+
+TEST_IMAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_images")
+
+
+def load_faces(directory):
+    faces, names = [], []
+    for filename in sorted(os.listdir(directory)):
+        try:
+            image = Image.open(os.path.join(directory, filename)).convert("RGB")
+        except OSError:
+            continue
+        face = detect_face(image)
+        if face is not None:
+            faces.append(face)
+            names.append(filename)
+    return torch.stack(faces), names
+
+
+def embed(model, batch):
+    with torch.no_grad():
+        return model(batch).float().numpy()
+
+
+def latency_ms(model, batch, runs):
+    embed(model, batch)  # warm-up
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        embed(model, batch)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=0.99, help="minimum cosine similarity to eager")
+    parser.add_argument("--images", default=TEST_IMAGES)
+    args = parser.parse_args()
+
+    configure_threads(args.threads)
+    print(f"📊 torch {torch.__version__}, {torch.get_num_threads()} threads, bf16 native: {bf16_supported()}")
+
+    faces, names = load_faces(args.images)
+    print(f"🙂 {len(names)} faces from {args.images}")
+    eager = load_resnet()
+    reference = embed(eager, faces)
+
+    failed = []
+    for backend in args.backends:
+        start = time.perf_counter()
+        model = build_backend(eager, backend)
+        build_s = time.perf_counter() - start
+
+        similarity = np.sum(embed(model, faces) * reference, axis=1)
+        parity = "ok" if similarity.min() >= args.tolerance else "FAIL"
+        if parity == "FAIL":
+            failed.append(backend)
+
+        timings = []
+        for batch_size in args.batch:
+            batch = faces[torch.arange(batch_size) % len(faces)]
+            ms = latency_ms(model, batch, args.runs)
+            timings.append(f"b{batch_size}: {ms:7.1f} ms ({ms / batch_size:5.1f}/face)")
+        print(f"{backend:<11} min cosine {similarity.min():.5f} [{parity}]  build {build_s:4.1f}s  " + "  ".join(timings))
+
+    if failed:
+        print(f"❌ Parity below {args.tolerance} for: {', '.join(failed)}")
+        sys.exit(1)
+    print("✅ All backends within tolerance")
+
+
+if __name__ == "__main__":
+    main()
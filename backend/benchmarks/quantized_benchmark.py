@@ -0,0 +1,110 @@
+# benchmarks/quantized_benchmark.py
+"""
+Memory footprint and throughput of the int8 quantised gallery
+(utils/quantized_index.py) against the float32 exact gallery.
+
+Uses the same synthetic FaceNet-like data as ann_benchmark.py. Reports
+the heap each index keeps (measured with tracemalloc; the int8 index's
+float32 re-rank rows are memory-mapped from disk), single-query latency, batched
+throughput (match_many, as used by the live scanner) and how often the
+int8 path makes a different decision (id or accept/reject at the cosine
+threshold) than float32.
+
+Run from the backend directory:
+    python -m benchmarks.quantized_benchmark --faces 50000 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.gallery import GalleryIndex, DEFAULT_THRESHOLD  # noqa: E402
+from utils.quantized_index import QuantizedIndex  # noqa: E402
+from benchmarks.ann_benchmark import synthetic_gallery, synthetic_queries  # noqa: E402
+
+
+def records_bytes(n_faces, dim=512):
+    """Rough size of get_embeddings()-style dicts holding Python float lists"""
+    per_float = sys.getsizeof(0.1) + 8  # float object + list slot
+    per_row = sys.getsizeof({}) + sys.getsizeof([]) + dim * per_float + 3 * 64
+    return n_faces * per_row
+
+
+def time_single(index, queries):
+    start = time.perf_counter()
+    results = [index.match(query) for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def time_batched(index, queries, batch_size):
+    start = time.perf_counter()
+    results = []
+    for i in range(0, len(queries), batch_size):
+        results.extend(index.match_many(queries[i:i + batch_size]))
+    return results, len(queries) / (time.perf_counter() - start)
+
+
+def disagreements(results, reference):
+    return sum(
+        (r is None) != (ref is None) or (r is not None and r["id"] != ref["id"])
+        for r, ref in zip(results, reference)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--faces", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=8, help="faces per match_many call")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--noise", type=float, nargs="+", default=[0.045, 0.1],
+                        help="query noise; the larger value puts many queries near the threshold")
+    args = parser.parse_args()
+
+    print(f"📊 {args.faces} faces x 512-d, {args.queries} queries, threshold={DEFAULT_THRESHOLD}")
+    embeddings = synthetic_gallery(args.faces)
+    ids = np.arange(args.faces)
+    names = [f"student_{i}" for i in ids]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    exact = GalleryIndex(ids, names, embeddings)
+    exact_heap = tracemalloc.get_traced_memory()[0] - before
+
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    quantized = QuantizedIndex.from_index(exact)  # shares ids / names with `exact`
+    quantize_s = time.perf_counter() - start
+    int8_heap = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f"records (dicts of float lists) : ~{records_bytes(args.faces) / 1e6:8.1f} MB")
+    print(f"float32 index                  : {exact_heap / 1e6:8.1f} MB heap (matrix {exact.matrix.nbytes / 1e6:.1f} MB)")
+    print(f"int8 index                     : {int8_heap / 1e6:8.1f} MB heap (memory_bytes {quantized.memory_bytes() / 1e6:.1f} MB)"
+          f" + {quantized.matrix.nbytes / 1e6:.1f} MB float32 re-rank rows memory-mapped from disk"
+          f"  (quantised in {quantize_s:.2f}s)")
+
+    for noise in args.noise:
+        queries, _ = synthetic_queries(embeddings, args.queries, noise=noise)
+        reference, exact_ms = time_single(exact, queries)
+        _, exact_qps = time_batched(exact, queries, args.batch)
+        accepted = sum(r is not None for r in reference)
+        print(f"\nnoise={noise}: float32 accepts {accepted}/{len(queries)}")
+        print(f"float32          : {exact_ms:7.3f} ms/query  {exact_qps:8.1f} queries/s (batch {args.batch})")
+
+        for rerank in args.rerank:
+            quantized.rerank = rerank
+            results, int8_ms = time_single(quantized, queries)
+            batched, int8_qps = time_batched(quantized, queries, args.batch)
+            print(f"int8 rerank={rerank:<4}: {int8_ms:7.3f} ms/query  {int8_qps:8.1f} queries/s"
+                  f"  decisions differing from float32: {disagreements(results, reference)}"
+                  f" single / {disagreements(batched, reference)} batched")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,4 +9,109 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 BUCKET_NAME = os.getenv("BUCKET_NAME", "faces")
 SUPABASE_ANON_KEY = os.getenv("ANON_KEY")
-SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY") 
\ No newline at end of file
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
+
+# face gallery / matching
+
+GALLERY_INDEX = os.getenv("GALLERY_INDEX", "exact")  # "exact", "ivf" or "int8"
+GALLERY_INDEX_PATH = os.getenv("GALLERY_INDEX_PATH", os.path.join(os.path.dirname(__file__), "data", "gallery_ivf.npz"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+GALLERY_INT8_RERANK = int(os.getenv("GALLERY_INT8_RERANK", "32"))  # int8 candidates re-scored in float32
+GALLERY_INT8_RERANK_DIR = os.getenv("GALLERY_INT8_RERANK_DIR", os.path.join(os.path.dirname(__file__), "data", "gallery_int8"))  # float32 rows, memory-mapped
+GALLERY_REFRESH_SECONDS = float(os.getenv("GALLERY_REFRESH_SECONDS", "30"))  # background delta refresh
+GALLERY_MAX_STALENESS_SECONDS = float(os.getenv("GALLERY_MAX_STALENESS_SECONDS", "300"))  # callers block beyond this
+GALLERY_FULL_RELOAD_SECONDS = float(os.getenv("GALLERY_FULL_RELOAD_SECONDS", "3600"))  # picks up edits/deletes
+GALLERY_SNAPSHOT = os.getenv("GALLERY_SNAPSHOT", "true").lower() in ("1", "true", "yes")  # mmap'd local copy for fast start
+GALLERY_SNAPSHOT_DIR = os.getenv("GALLERY_SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "data", "gallery_snapshot"))
+
+# embedding inference
+
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "eager")  # "eager", "torchscript", "int8" or "bf16" (embedding/inference_backends.py)
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0"))  # torch intra-op threads, 0 = torch default
+EMBED_INTEROP_THREADS = int(os.getenv("EMBED_INTEROP_THREADS", "0"))  # 0 = torch default
+
+# model weights (see utils/model_weights.py; populate with: python -m utils.model_weights prefetch)
+
+MODEL_WEIGHTS_DIR = os.getenv("MODEL_WEIGHTS_DIR", os.path.join(os.path.dirname(__file__), "data", "models"))
+MODEL_WEIGHTS_OFFLINE = os.getenv("MODEL_WEIGHTS_OFFLINE", "false").lower() in ("1", "true", "yes")  # never download
+MODEL_WEIGHTS_VERIFY = os.getenv("MODEL_WEIGHTS_VERIFY", "true").lower() in ("1", "true", "yes")  # sha256 check on load
+
+# embedding storage: "f16" / "f32" (base64 strings) or "json" (legacy float list)
+
+EMBEDDING_ENCODING = os.getenv("EMBEDDING_ENCODING", "f16")
+
+# live scanner
+
+SCANNER_CAMERA_ID = os.getenv("SCANNER_CAMERA_ID", "camera_0")  # logged with attendance, keys the timetable
+SCANNER_MULTI_FACE = os.getenv("SCANNER_MULTI_FACE", "true").lower() in ("1", "true", "yes")
+SCANNER_JPEG_QUALITY = int(os.getenv("SCANNER_JPEG_QUALITY", "80"))
+SCANNER_QUEUE_SIZE = int(os.getenv("SCANNER_QUEUE_SIZE", "2"))  # frames buffered between stages (drop-oldest)
+SCANNER_DETECT_WORKERS = int(os.getenv("SCANNER_DETECT_WORKERS", "1"))
+SCANNER_WS_PING_SECONDS = float(os.getenv("SCANNER_WS_PING_SECONDS", "5"))  # longest a scanner-ws client goes without a message
+
+# face tracking (live scanner)
+
+TRACK_IOU_THRESHOLD = float(os.getenv("TRACK_IOU_THRESHOLD", "0.3"))
+TRACK_MAX_MISSES = int(os.getenv("TRACK_MAX_MISSES", "10"))  # detection passes a track may go unseen
+TRACK_VOTES_REQUIRED = int(os.getenv("TRACK_VOTES_REQUIRED", "3"))  # k ...
+TRACK_VOTES_WINDOW = int(os.getenv("TRACK_VOTES_WINDOW", "5"))  # ... of the last n embeddings
+TRACK_RECHECK_FRAMES = int(os.getenv("TRACK_RECHECK_FRAMES", "15"))  # re-embed unknown faces this often
+
+# motion gating ahead of face detection
+
+MOTION_GATE = os.getenv("MOTION_GATE", "true").lower() in ("1", "true", "yes")
+MOTION_GATE_METHOD = os.getenv("MOTION_GATE_METHOD", "diff")  # "diff" (running average) or "mog2"
+MOTION_THRESHOLD = float(os.getenv("MOTION_THRESHOLD", "0.005"))  # fraction of pixels that must change
+MOTION_PIXEL_DELTA = int(os.getenv("MOTION_PIXEL_DELTA", "25"))  # per-pixel grayscale change that counts
+MOTION_DOWNSCALE_WIDTH = int(os.getenv("MOTION_DOWNSCALE_WIDTH", "160"))
+MOTION_MAX_SKIP = int(os.getenv("MOTION_MAX_SKIP", "30"))  # always detect at least every N frames
+
+# API server start-up: models load and run dummy passes in the background (GET /api/ready)
+
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+WARMUP_GALLERY = os.getenv("WARMUP_GALLERY", "true").lower() in ("1", "true", "yes")  # also load the face gallery
+
+# pre-fork multi-worker serving (serve.py)
+
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "2"))
+SERVE_HOST = os.getenv("SERVE_HOST", "0.0.0.0")
+SERVE_PORT = int(os.getenv("SERVE_PORT", "8000"))
+
+# API server thread pools
+
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))  # detection / embedding
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))  # Supabase calls
+
+# attendance writes
+
+ATTENDANCE_DEDUP_MINUTES = float(os.getenv("ATTENDANCE_DEDUP_MINUTES", "5"))  # one mark per person per window
+ATTENDANCE_BATCH_SIZE = int(os.getenv("ATTENDANCE_BATCH_SIZE", "100"))
+ATTENDANCE_FLUSH_SECONDS = float(os.getenv("ATTENDANCE_FLUSH_SECONDS", "1.0"))  # max delay before a partial batch is written
+ATTENDANCE_MAX_BACKOFF_SECONDS = float(os.getenv("ATTENDANCE_MAX_BACKOFF_SECONDS", "30"))
+ATTENDANCE_MAX_RETRIES = int(os.getenv("ATTENDANCE_MAX_RETRIES", "6"))  # then the batch is split to isolate bad rows
+ATTENDANCE_DEAD_LETTER_PATH = os.getenv("ATTENDANCE_DEAD_LETTER_PATH", os.path.join(os.path.dirname(__file__), "data", "attendance_dead_letter.jsonl"))
+ATTENDANCE_NAME_REFRESH_SECONDS = float(os.getenv("ATTENDANCE_NAME_REFRESH_SECONDS", "300"))  # name -> id map
+ATTENDANCE_SUMMARY_CACHE_SECONDS = float(os.getenv("ATTENDANCE_SUMMARY_CACHE_SECONDS", "30"))  # covers writes by other processes
+ATTENDANCE_PAGE_SIZE = int(os.getenv("ATTENDANCE_PAGE_SIZE", "100"))  # /attendance/records default page
+ATTENDANCE_MAX_PAGE_SIZE = int(os.getenv("ATTENDANCE_MAX_PAGE_SIZE", "1000"))
+
+# schedule-aware gallery partitions (see schedule.example.json)
+
+SCHEDULE_PATH = os.getenv("SCHEDULE_PATH", os.path.join(os.path.dirname(__file__), "schedule.json"))
+SCHEDULE_FALLBACK_THRESHOLD = float(os.getenv("SCHEDULE_FALLBACK_THRESHOLD")) if os.getenv("SCHEDULE_FALLBACK_THRESHOLD") else None  # stricter cut-off outside the active roster
+
+# bulk enrollment (embedding/embedder.py)
+
+ENROLL_DOWNLOAD_WORKERS = int(os.getenv("ENROLL_DOWNLOAD_WORKERS", "16"))
+ENROLL_DETECT_WORKERS = int(os.getenv("ENROLL_DETECT_WORKERS", str(INFERENCE_WORKERS)))
+ENROLL_BATCH_SIZE = int(os.getenv("ENROLL_BATCH_SIZE", "64"))  # faces per embedding forward pass
+ENROLL_UPSERT_BATCH = int(os.getenv("ENROLL_UPSERT_BATCH", "200"))  # rows per bulk upsert
+ENROLL_SIGN_BATCH = int(os.getenv("ENROLL_SIGN_BATCH", "100"))  # storage paths per signed-URL request
+ENROLL_CHECKPOINT_PATH = os.getenv("ENROLL_CHECKPOINT_PATH", os.path.join(os.path.dirname(__file__), "data", "enroll_checkpoint.jsonl"))
+
+# bulk registration (POST /api/register-faces)
+
+REGISTER_MAX_ITEMS = int(os.getenv("REGISTER_MAX_ITEMS", "500"))  # images per request, files or zip entries
+REGISTER_MAX_IMAGE_BYTES = int(os.getenv("REGISTER_MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
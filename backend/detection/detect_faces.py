@@ -1,33 +1,166 @@
 # face_detection.py
 
-from facenet_pytorch import MTCNN
+import warnings
+
+import cv2
+from facenet_pytorch import fixed_image_standardization
+import numpy as np
 import torch
+import torch.nn.functional as F
+
+from utils.model_weights import load_mtcnn
 
 device = torch.device("cpu")
-mtcnn = MTCNN(keep_all=False, post_process=True, device=device)
+mtcnn = load_mtcnn(keep_all=False, post_process=True, device=device)
+
+MIN_FACE_PROB = 0.90
 
-def detect_face(image_pil):
+def to_frame_tensor(image, color="RGB"):
     """
-    Accepts a PIL image, returns a cropped and aligned face tensor (3x160x160)
-    or None if no face is found.
+    (H, W, 3) uint8 RGB tensor for MTCNN from a PIL image, a NumPy array or
+    a torch tensor, copying as little as possible:
+
+    - contiguous RGB arrays / HWC tensors are wrapped without a copy
+    - BGR arrays (OpenCV frames, color="BGR") cost a single cvtColor,
+      replacing cvtColor + Image.fromarray + MTCNN's own conversions
+    - CHW tensors are permuted as a view, BGR tensors flipped in one copy;
+      PIL images cost one copy
     """
-    try:
-        face, prob = mtcnn(image_pil, return_prob=True)  # <-- explicit tuple output
-    except Exception as e:
-        print(f"⚠️ Face detection error: {e}")
-        return None
+    if isinstance(image, torch.Tensor):
+        frame = image.detach()
+        if frame.dim() == 3 and frame.shape[0] == 3 and frame.shape[-1] != 3:
+            frame = frame.permute(1, 2, 0)  # CHW -> HWC view
+    else:
+        if not isinstance(image, np.ndarray):  # PIL
+            image = np.array(image.convert("RGB") if image.mode != "RGB" else image)
+        if image.ndim == 2:
+            image = np.repeat(image[:, :, None], 3, axis=2)
+            color = "RGB"
+        if color.upper() == "BGR":
+            image, color = cv2.cvtColor(image, cv2.COLOR_BGR2RGB), "RGB"  # far faster than a strided flip
+        elif image.strides[-1] < 0:
+            image = np.ascontiguousarray(image)  # torch can't wrap negative strides
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # read-only arrays are fine: frames are never written
+            frame = torch.from_numpy(image)
+
+    if frame.dim() != 3 or frame.shape[-1] != 3:
+        raise ValueError(f"Expected an (H, W, 3) image, got shape {tuple(frame.shape)}")
+    if color.upper() == "BGR":
+        frame = frame.flip(-1)
+    return frame
+
+def _detect(frame):
+    """MTCNN boxes and probabilities for one frame tensor (or an N x H x W x 3 batch), largest first"""
+    return mtcnn.detect(frame)
+
+def _extract(frame, box):
+    """
+    Aligned 3x160x160 face from a frame tensor, cropped with MTCNN's margin
+    and resized like facenet_pytorch does for PIL images (antialiased
+    bilinear, rounded to 8 bits), so embeddings match those of PIL inputs.
+    """
+    size, margin = mtcnn.image_size, mtcnn.margin
+    height, width = frame.shape[:2]
+    margin_x = margin * (box[2] - box[0]) / (size - margin)
+    margin_y = margin * (box[3] - box[1]) / (size - margin)
+    x1, y1 = int(max(box[0] - margin_x / 2, 0)), int(max(box[1] - margin_y / 2, 0))
+    x2, y2 = int(min(box[2] + margin_x / 2, width)), int(min(box[3] + margin_y / 2, height))
+
+    crop = frame[y1:y2, x1:x2].permute(2, 0, 1).unsqueeze(0).float()  # only the crop is converted
+    face = F.interpolate(crop, size=(size, size), mode="bilinear", align_corners=False, antialias=True)
+    face = face.round().clamp(0, 255).squeeze(0)
+    return fixed_image_standardization(face) if mtcnn.post_process else face
 
-    if face is None:
+def _face_from_detection(frame, boxes, probs):
+    if boxes is None:
         print("❌ No face detected")
         return None
 
-    if face.shape != (3, 160, 160):
-        print(f"❌ Invalid face tensor shape: {face.shape}")
+    prob = probs[0]  # MTCNN returns the largest face first
+    if prob is not None and prob < MIN_FACE_PROB:
+        print(f"⚠️ Low confidence face detection: {prob:.2f}")
         return None
 
-    if prob is not None and prob < 0.90:
-        print(f"⚠️ Low confidence face detection: {prob:.2f}")
+    return _extract(frame, boxes[0])
+
+def detect_face(image, color="RGB"):
+    """
+    Accepts a PIL image, a NumPy array (RGB, or BGR with color="BGR", e.g.
+    straight from cv2) or a torch tensor (HWC or CHW), returns a cropped
+    and aligned face tensor (3x160x160) or None if no face is found.
+    """
+    try:
+        frame = to_frame_tensor(image, color)
+        boxes, probs = _detect(frame)
+    except Exception as e:
+        print(f"⚠️ Face detection error: {e}")
         return None
 
-    return face
+    return _face_from_detection(frame, boxes, probs)
+
+def _faces_from_detection(frame, boxes, probs, max_faces, min_prob):
+    if boxes is None:
+        return []
+
+    detections = []
+    for box, prob in zip(boxes, probs):
+        if prob is None or prob < min_prob:
+            continue
+        x1, y1, x2, y2 = (int(round(v)) for v in box)
+        detections.append({"face": _extract(frame, box), "box": (x1, y1, x2 - x1, y2 - y1), "prob": float(prob)})
+
+    detections.sort(key=lambda d: d["box"][2] * d["box"][3], reverse=True)
+    return detections[:max_faces] if max_faces else detections
+
+def detect_faces(image, max_faces=None, min_prob=MIN_FACE_PROB, color="RGB"):
+    """
+    Multi-face variant of detect_face (same inputs): runs MTCNN once and
+    returns every confident face in the image, largest first, as a list of
+    dicts with 'face' (aligned 3x160x160 tensor), 'box' ((x, y, w, h) ints,
+    for utils.image_utils.draw_box) and 'prob'. Returns [] if nothing is found.
+    """
+    try:
+        frame = to_frame_tensor(image, color)
+        boxes, probs = _detect(frame)
+    except Exception as e:
+        print(f"⚠️ Face detection error: {e}")
+        return []
+
+    return _faces_from_detection(frame, boxes, probs, max_faces, min_prob)
+
+def _detect_batch(images, color):
+    """Frame tensors and per-frame (boxes, probs); same-sized frames share one MTCNN pass"""
+    frames = [to_frame_tensor(image, color) for image in images]
+    results = [None] * len(frames)
+    by_size = {}
+    for i, frame in enumerate(frames):
+        by_size.setdefault(tuple(frame.shape), []).append(i)
+
+    for indices in by_size.values():
+        batch = torch.stack([frames[i] for i in indices])
+        boxes, probs = _detect(batch)
+        for i, frame_boxes, frame_probs in zip(indices, boxes, probs):
+            results[i] = (frame_boxes, frame_probs)
+    return frames, results
+
+def detect_face_batch(images, color="RGB"):
+    """detect_face() for several images (e.g. frames from many cameras); returns a list of faces or None"""
+    try:
+        frames, results = _detect_batch(images, color)
+    except Exception as e:
+        print(f"⚠️ Face detection error: {e}")
+        return [None] * len(images)
+
+    return [_face_from_detection(frame, boxes, probs) for frame, (boxes, probs) in zip(frames, results)]
+
+def detect_faces_batch(images, max_faces=None, min_prob=MIN_FACE_PROB, color="RGB"):
+    """detect_faces() for several images; returns one list of detections per image"""
+    try:
+        frames, results = _detect_batch(images, color)
+    except Exception as e:
+        print(f"⚠️ Face detection error: {e}")
+        return [[] for _ in images]
 
+    return [_faces_from_detection(frame, boxes, probs, max_faces, min_prob)
+            for frame, (boxes, probs) in zip(frames, results)]
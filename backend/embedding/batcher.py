@@ -0,0 +1,104 @@
+# embedding/batcher.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config import EMBED_MAX_BATCH_SIZE, EMBED_MAX_WAIT_MS
+from embedding.embedding_module import FACE_SHAPE, get_face_embeddings
+
+
+class EmbeddingBatcher:
+    """
+    Dynamic micro-batching for face embeddings.
+
+    Callers on any thread submit single face crops; a background worker
+    collects whatever arrives within `max_wait_ms` of the first crop (up to
+    `max_batch_size`), runs them through the model in one forward pass and
+    resolves each caller's Future with its own (512,) embedding.
+    """
+
+    def __init__(self, embed_fn=get_face_embeddings, max_batch_size=EMBED_MAX_BATCH_SIZE,
+                 max_wait_ms=EMBED_MAX_WAIT_MS):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # The worker thread doesn't survive fork() (serve.py workers), but its
+        # wait on the queue would still swallow a notification: start afresh
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, face_tensor):
+        """Queue one (3, 160, 160) face crop; returns a Future for its embedding (None if invalid)"""
+        future = Future()
+        if face_tensor is None or tuple(face_tensor.shape) != FACE_SHAPE:
+            print(f"❌ Invalid face tensor shape: {None if face_tensor is None else face_tensor.shape}")
+            future.set_result(None)
+            return future
+
+        self._ensure_worker()
+        self._queue.put((face_tensor.detach().cpu(), future))
+        return future
+
+    def embed(self, face_tensor, timeout=None):
+        """Blocking helper: embed one face crop through the shared batch"""
+        return self.submit(face_tensor).result(timeout)
+
+    def embed_many(self, face_tensors, timeout=None):
+        """Blocking helper: embed several crops, returning a list in the same order"""
+        futures = [self.submit(face) for face in face_tensors]
+        return [future.result(timeout) for future in futures]
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first crop, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            faces = [face for face, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                embeddings = self.embed_fn(faces)
+            except Exception as e:
+                print(f"❌ Batched embedding failed for {len(faces)} faces: {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            for future, embedding in zip(futures, embeddings):
+                future.set_result(embedding)
+
+
+embedding_batcher = EmbeddingBatcher()
+
+
+def embed_face(face_tensor, timeout=None):
+    """Embed one face crop via the process-wide micro-batcher"""
+    return embedding_batcher.embed(face_tensor, timeout)
@@ -1,11 +1,46 @@
+"""
+Bulk enrollment: compute embeddings for every row of the `users` table
+from its photo in storage and write them back.
+
+Run from backend/:
+    python -m embedding.embedder [--download-workers 16] [--detect-workers 4] [--batch-size 64]
+
+Photos are signed in bulk, downloaded concurrently over one keep-alive
+session, run through MTCNN on a worker pool, embedded in batches and
+written back with bulk upserts, with periodic progress / throughput lines.
+
+Runs are incremental: each embedding is stored with the SHA-256 of the
+photo it came from (image_hash), the photo's storage ETag (image_etag)
+and MODEL_VERSION (embedding_model). Users whose ETag, or failing that
+downloaded content, and model version are unchanged are skipped. Progress
+is checkpointed to ENROLL_CHECKPOINT_PATH, so a crashed run resumes where
+it stopped (--restart ignores the checkpoint, --force re-embeds everyone).
+
+The users table needs these columns:
+    ALTER TABLE users ADD COLUMN IF NOT EXISTS image_hash TEXT;
+    ALTER TABLE users ADD COLUMN IF NOT EXISTS image_etag TEXT;
+    ALTER TABLE users ADD COLUMN IF NOT EXISTS embedding_model TEXT;
+"""
+import argparse
+import hashlib
+import json
 import os
-import requests
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from PIL import Image
-import torch
 from supabase import create_client
 from dotenv import load_dotenv
 
+from config import (ENROLL_DOWNLOAD_WORKERS, ENROLL_DETECT_WORKERS, ENROLL_BATCH_SIZE, ENROLL_UPSERT_BATCH,
+                    ENROLL_SIGN_BATCH, ENROLL_CHECKPOINT_PATH)
+
 # Load environment variables
 load_dotenv()
 
@@ -16,60 +51,351 @@ BUCKET_NAME = os.getenv("BUCKET_NAME", "faces")
 
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-# Import embedding and detection modules
-from embedding_module import get_face_embedding
-from detect_faces import detect_face
+# Import embedding and detection modules (run from backend/: python -m embedding.embedder)
+from embedding.embedding_module import get_face_embeddings, MODEL_VERSION
+from detection.detect_faces import detect_face
+from utils.embedding_codec import encode_embedding
 
-# Set device
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
-# Step 1: Fetch users
-res = supabase.table("users").select("id, name, image_path").execute()
-users = res.data
+class EnrollmentProgress:
+    """Thread-safe counters with a throttled progress / throughput line"""
 
-# Step 2: Process each user
-for user in users:
-    user_id = user.get("id")
-    name = user.get("name")
-    image_path = user.get("image_path")
+    def __init__(self, total, interval=5.0):
+        self.total = total
+        self.interval = interval
+        self.counts = {"stored": 0, "unchanged": 0, "no_face": 0, "failed": 0, "skipped": 0}
+        self.start = time.monotonic()
+        self._last_report = self.start
+        self._lock = threading.Lock()
 
-    if not image_path:
-        print(f"⚠️ Skipping {name} (no image path)")
-        continue
+    def add(self, outcome, n=1):
+        with self._lock:
+            self.counts[outcome] += n
 
-    try:
-        # Step 3: Get signed URL
-        url_resp = supabase.storage.from_(BUCKET_NAME).create_signed_url(image_path, 60)
-        signed_url = url_resp.get("signedURL") or url_resp.get("signed_url")  # Handle key variation
+    @property
+    def done(self):
+        return sum(self.counts.values())
 
-        if not signed_url:
-            print(f"❌ Failed to get signed URL for {name}")
-            continue
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        elapsed = now - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float("inf")
+        print(f"📈 {self.done}/{self.total} users ({rate:.1f}/s, ETA {eta:.0f}s) - "
+              + ", ".join(f"{k}: {v}" for k, v in self.counts.items()))
 
-        # Step 4: Load image
-        img_data = requests.get(signed_url, timeout=10).content
-        img = Image.open(BytesIO(img_data)).convert("RGB")
 
-        # Step 5: Detect face
-        face_tensor = detect_face(img)
-        if face_tensor is None:
-            print(f"❌ No face detected for {name}")
-            continue
+def fetch_users(page_size=1000):
+    """All users with a photo, in keyset-paginated pages"""
+    users, last_id = [], None
+    while True:
+        query = (supabase.table("users").select("id, name, image_path, image_hash, image_etag, embedding_model")
+                 .order("id").limit(page_size))
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.execute().data or []
+        users.extend(page)
+        if len(page) < page_size:
+            return users
+        last_id = page[-1]["id"]
+
+
+def signed_urls(paths, expires_in=3600):
+    """{path: signed URL} for many storage paths in one request"""
+    response = supabase.storage.from_(BUCKET_NAME).create_signed_urls(paths, expires_in)
+    urls = {}
+    for item in response or []:
+        url = item.get("signedURL") or item.get("signedUrl") or item.get("signed_url")  # Handle key variation
+        if url and not item.get("error"):
+            urls[item.get("path")] = url
+    return urls
+
+
+def photo_etags(paths, page_size=1000):
+    """
+    {path: storage ETag} for the given photos, listed folder by folder
+    (one request per 1000 objects). Photos whose ETag can't be read are
+    left out and simply get downloaded and hashed.
+    """
+    folders = {}
+    for path in paths:
+        folder, _, name = path.rpartition("/")
+        folders.setdefault(folder, set()).add(name)
+
+    etags = {}
+    for folder, names in folders.items():
+        offset = 0
+        try:
+            while True:
+                items = supabase.storage.from_(BUCKET_NAME).list(folder, {"limit": page_size, "offset": offset}) or []
+                for item in items:
+                    etag = (item.get("metadata") or {}).get("eTag")
+                    if item.get("name") in names and etag:
+                        etags[f"{folder}/{item['name']}" if folder else item["name"]] = etag
+                if len(items) < page_size:
+                    break
+                offset += page_size
+        except Exception as e:
+            print(f"⚠️ Could not list storage folder '{folder}': {e}")
+    return etags
+
+
+class Checkpoint:
+    """
+    Append-only log of users finished in the current run (JSON lines), so a
+    crashed run can resume. Entries only count for the same model version
+    and photo path; the file is removed once a run completes.
+    """
+
+    def __init__(self, path=ENROLL_CHECKPOINT_PATH):
+        self.path = path
+        self.done = {}  # user id -> image_path
+        self._file = None
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return self
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line after a crash
+                if entry.get("model") == MODEL_VERSION:
+                    self.done[entry["id"]] = entry.get("image_path")
+        print(f"↩️ Resuming from checkpoint: {len(self.done)} users already done")
+        return self
+
+    def is_done(self, user):
+        return user["id"] in self.done and self.done[user["id"]] == user.get("image_path")
+
+    def record(self, users):
+        if not self.path:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a")
+        for user in users:
+            self._file.write(json.dumps({"id": user["id"], "image_path": user.get("image_path"), "model": MODEL_VERSION}) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def is_current(user, etag=None, content_hash=None):
+    """True if the stored embedding came from this model and this photo"""
+    if user.get("embedding_model") != MODEL_VERSION or not user.get("image_hash"):
+        return False
+    if content_hash is not None:
+        return content_hash == user["image_hash"]
+    return etag is not None and etag == user.get("image_etag")
+
 
-        # Step 6: Get embedding
-        face_tensor = face_tensor.to(device)
-        embedding = get_face_embedding(face_tensor)
-        if embedding is None:
-            print(f"❌ Embedding failed for {name}")
-            continue
+def make_session(pool_size):
+    """Keep-alive session whose connection pool matches the download concurrency"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
-        # Step 7: Store embedding
-        embedding_list = embedding.cpu().numpy().astype(float).tolist()
-        supabase.table("users").update({
-            "embedding": embedding_list
-        }).eq("id", user_id).execute()
 
-        print(f"✅ Processed {name}")
+def download(session, url):
+    response = session.get(url, timeout=10)
+    response.raise_for_status()
+    return response.content
 
+
+def detect(user, img_data):
+    """(user, face tensor or None, error) for one downloaded photo"""
+    try:
+        img = Image.open(BytesIO(img_data)).convert("RGB")
+        face_tensor = detect_face(img)
+        return user, face_tensor, None if face_tensor is not None else "no face detected"
     except Exception as e:
-        print(f"❌ Error processing {name}: {e}")
+        return user, None, str(e)
+
+
+def upsert_embeddings(rows):
+    """Write a batch of {id, name, image_path, embedding} rows in one request"""
+    if rows:
+        supabase.table("users").upsert(rows).execute()
+
+
+def enroll(users, download_workers=ENROLL_DOWNLOAD_WORKERS, detect_workers=ENROLL_DETECT_WORKERS,
+           batch_size=ENROLL_BATCH_SIZE, upsert_batch=ENROLL_UPSERT_BATCH, sign_batch=ENROLL_SIGN_BATCH,
+           checkpoint=None, force=False):
+    """
+    Enroll `users` (dicts with id, name, image_path and the stored
+    image_hash / image_etag / embedding_model):
+
+        skip unchanged -> bulk sign -> download pool -> hash -> detect pool -> batched embed -> bulk upsert
+
+    Downloads and detections overlap; the calling thread embeds and writes.
+    At most a few batches of photos are in flight at once.
+    """
+    progress = EnrollmentProgress(len(users))
+    checkpoint = checkpoint or Checkpoint(None)
+    results = queue.Queue()  # (user, face tensor or None, error)
+    max_in_flight = max(batch_size * 4, download_workers * 2)
+    in_flight = 0
+    faces, rows, touched = [], [], []
+
+    def on_downloaded(user, future, detectors):
+        try:
+            img_data = future.result()
+        except Exception as e:
+            results.put((user, None, f"download failed: {e}"))
+            return
+        user["new_hash"] = hashlib.sha256(img_data).hexdigest()
+        if not force and is_current(user, content_hash=user["new_hash"]):
+            results.put((user, None, "unchanged"))  # same bytes re-uploaded: just remember the new ETag
+            return
+        detectors.submit(detect, user, img_data).add_done_callback(lambda f: results.put(f.result()))
+
+    def consume(block):
+        nonlocal in_flight
+        user, face_tensor, error = results.get(block)
+        in_flight -= 1
+        if error == "unchanged":
+            touched.append({
+                "id": user["id"],
+                "name": user.get("name"),
+                "image_path": user.get("image_path"),
+                "image_hash": user["new_hash"],
+                "image_etag": user.get("new_etag"),
+                "embedding_model": MODEL_VERSION,
+            })
+            if len(touched) >= upsert_batch:
+                flush_rows()
+        elif face_tensor is None:
+            progress.add("no_face" if error == "no face detected" else "failed")
+            print(f"❌ {user.get('name')}: {error}")
+        else:
+            faces.append((user, face_tensor))
+        if len(faces) >= batch_size:
+            embed_batch()
+        progress.report()
+
+    def embed_batch():
+        if not faces:
+            return
+        try:
+            embeddings = get_face_embeddings([face for _, face in faces])
+            for (user, _), embedding in zip(faces, embeddings):
+                rows.append({
+                    "id": user["id"],
+                    "name": user.get("name"),
+                    "image_path": user.get("image_path"),
+                    "embedding": encode_embedding(embedding),
+                    "image_hash": user["new_hash"],
+                    "image_etag": user.get("new_etag"),
+                    "embedding_model": MODEL_VERSION,
+                })
+        except Exception as e:
+            print(f"❌ Embedding failed for a batch of {len(faces)}: {e}")
+            progress.add("failed", len(faces))
+        faces.clear()
+        if len(rows) >= upsert_batch:
+            flush_rows()
+
+    def flush_rows():
+        # Embedded and unchanged users go in separate upserts: a bulk upsert
+        # needs the same columns on every row
+        for batch, outcome in ((rows, "stored"), (touched, "unchanged")):
+            if not batch:
+                continue
+            try:
+                upsert_embeddings(batch)
+                checkpoint.record(batch)
+                progress.add(outcome, len(batch))
+            except Exception as e:
+                print(f"❌ Upsert of {len(batch)} users failed: {e}")
+                progress.add("failed", len(batch))
+            batch.clear()
+
+    session = make_session(download_workers)
+    with ThreadPoolExecutor(download_workers, thread_name_prefix="enroll-download") as downloaders, \
+            ThreadPoolExecutor(detect_workers, thread_name_prefix="enroll-detect") as detectors:
+        with_photo = [dict(user) for user in users if user.get("image_path")]
+        progress.add("skipped", len(users) - len(with_photo))
+
+        # Skip users finished before a crash, then those whose photo ETag and model are unchanged
+        resumed = [user for user in with_photo if checkpoint.is_done(user)]
+        with_photo = [user for user in with_photo if not checkpoint.is_done(user)]
+        progress.add("unchanged", len(resumed))
+        etags = photo_etags([user["image_path"] for user in with_photo])
+        todo = []
+        for user in with_photo:
+            user["new_etag"] = etags.get(user["image_path"])
+            if not force and is_current(user, etag=user["new_etag"]):
+                progress.add("unchanged")
+            else:
+                todo.append(user)
+        print(f"🔎 {len(todo)} users with new or changed photos")
+        with_photo = todo
+
+        for start in range(0, len(with_photo), sign_batch):
+            chunk = with_photo[start:start + sign_batch]
+            try:
+                urls = signed_urls([user["image_path"] for user in chunk])
+            except Exception as e:
+                print(f"❌ Could not sign {len(chunk)} photo URLs: {e}")
+                urls = {}
+
+            for user in chunk:
+                url = urls.get(user["image_path"])
+                if not url:
+                    print(f"❌ Failed to get signed URL for {user.get('name')}")
+                    progress.add("failed")
+                    continue
+                while in_flight >= max_in_flight:
+                    consume(block=True)
+                in_flight += 1
+                future = downloaders.submit(download, session, url)
+                future.add_done_callback(lambda f, user=user: on_downloaded(user, f, detectors))
+
+        while in_flight:
+            consume(block=True)
+
+    embed_batch()
+    flush_rows()
+    progress.report(force=True)
+    checkpoint.finish()  # the run completed; failed users are retried next time anyway
+    return progress.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute and store embeddings for all users")
+    parser.add_argument("--download-workers", type=int, default=ENROLL_DOWNLOAD_WORKERS)
+    parser.add_argument("--detect-workers", type=int, default=ENROLL_DETECT_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=ENROLL_BATCH_SIZE, help="faces per embedding forward pass")
+    parser.add_argument("--upsert-batch", type=int, default=ENROLL_UPSERT_BATCH, help="rows per bulk upsert")
+    parser.add_argument("--force", action="store_true", help="re-embed every user, even if unchanged")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of an interrupted run")
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint()
+    if args.restart:
+        checkpoint.finish()
+    checkpoint.load()
+
+    users = fetch_users()
+    print(f"👥 Enrolling {len(users)} users")
+    counts = enroll(users, args.download_workers, args.detect_workers, args.batch_size, args.upsert_batch,
+                    checkpoint=checkpoint, force=args.force)
+    print(f"✅ Enrollment finished: {counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,44 @@
 # embedding_module.py
-from facenet_pytorch import InceptionResnetV1
 import torch
 import numpy as np
 
+from config import EMBED_BACKEND, EMBED_THREADS, EMBED_INTEROP_THREADS
+from embedding.inference_backends import build_backend, configure_threads, bf16_supported
+from utils.model_weights import load_resnet
+
+configure_threads(EMBED_THREADS, EMBED_INTEROP_THREADS)
 device = torch.device("cpu")
-model = InceptionResnetV1(pretrained='vggface2').eval().to(device)
+model = build_backend(load_resnet().to(device), EMBED_BACKEND)
+
+FACE_SHAPE = (3, 160, 160)
+# Recorded with every stored embedding (bump when detection/embedding changes output).
+# int8 / bf16 change the embeddings, so the backend in use is part of it
+BACKEND = "eager" if EMBED_BACKEND == "bf16" and not bf16_supported() else EMBED_BACKEND
+MODEL_VERSION = f"mtcnn160+inception_resnet_v1-vggface2-{BACKEND}"
 
 def get_face_embedding(face_img_tensor):
-    if face_img_tensor is None or face_img_tensor.shape != (3, 160, 160):
+    if face_img_tensor is None or face_img_tensor.shape != FACE_SHAPE:
         print(f"❌ Invalid face tensor shape: {None if face_img_tensor is None else face_img_tensor.shape}")
         return None
 
-    face_img_tensor = face_img_tensor.unsqueeze(0).to(device)  # (1, 3, 160, 160)
+    return get_face_embeddings(face_img_tensor.unsqueeze(0))[0]   # ✅ returns (512,) numpy array
 
-    with torch.no_grad():
-        embedding = model(face_img_tensor)
+def get_face_embeddings(face_batch):
+    """
+    Embed a batch of aligned faces in one forward pass.
 
-        return embedding.squeeze(0).cpu().detach().numpy().astype(np.float32)   # ✅ returns (512,) numpy array
+    Accepts an (N, 3, 160, 160) tensor or a list of (3, 160, 160) tensors and
+    returns an (N, 512) float32 numpy array, in the same order.
+    """
+    if isinstance(face_batch, (list, tuple)):
+        if len(face_batch) == 0:
+            return np.zeros((0, 512), dtype=np.float32)
+        face_batch = torch.stack([face.detach().cpu() for face in face_batch])
+
+    if face_batch.dim() != 4 or tuple(face_batch.shape[1:]) != FACE_SHAPE:
+        raise ValueError(f"Invalid face batch shape: {tuple(face_batch.shape)}")
+
+    with torch.no_grad():
+        embeddings = model(face_batch.to(device))
 
+    return embeddings.cpu().numpy().astype(np.float32)   # ✅ returns (N, 512) numpy array
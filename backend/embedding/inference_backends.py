@@ -0,0 +1,73 @@
+# embedding/inference_backends.py
+import torch
+
+BACKENDS = ("eager", "torchscript", "int8", "bf16")
+
+
+def configure_threads(threads=0, interop_threads=0):
+    """
+    Set torch's CPU thread pools (0 keeps torch's default). Call before the
+    first forward pass: inter-op threads can't be changed once work has run.
+    """
+    if threads > 0:
+        torch.set_num_threads(threads)
+    if interop_threads > 0:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            print(f"⚠️ Could not set inter-op threads: {e}")
+
+
+def bf16_supported():
+    """True if oneDNN can run bf16 kernels on this CPU (AVX512-BF16 / AMX)"""
+    try:
+        return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+class Bf16Model(torch.nn.Module):
+    """Runs the wrapped model under CPU bf16 autocast, returning float32 outputs"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            out = self.model(x)
+        return torch.nn.functional.normalize(out.float(), p=2, dim=1)
+
+
+def build_backend(model, backend, face_shape=(3, 160, 160)):
+    """
+    Wrap an eval-mode InceptionResnetV1 for CPU inference:
+
+        eager        the model as is
+        torchscript  traced and frozen graph (conv+bn folded, no Python dispatch)
+        int8         dynamic int8 quantisation of the Linear layers
+        bf16         bf16 autocast, on CPUs with native bf16 (falls back to eager)
+
+    `model` is not modified (it stays usable as the eager reference). Every backend takes an (N, 3, 160, 160) float
+    tensor and returns (N, 512) L2-normalised embeddings.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    if backend == "eager":
+        return model
+
+    if backend == "torchscript":
+        with torch.no_grad():
+            traced = torch.jit.trace(model, torch.zeros(2, *face_shape))
+            frozen = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+            frozen(torch.zeros(1, *face_shape))  # first runs specialise the graph
+        return frozen
+
+    if backend == "int8":
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if not bf16_supported():
+        print("⚠️ bf16 is not supported natively on this CPU, using the eager backend")
+        return model
+    return Bf16Model(model).eval()
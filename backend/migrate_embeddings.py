@@ -0,0 +1,71 @@
+# migrate_embeddings.py
+"""
+Re-encode stored face embeddings in the compact format from
+utils/embedding_codec.py (legacy rows hold a JSON list of 512 floats).
+
+    python migrate_embeddings.py                 # faces table, EMBEDDING_ENCODING
+    python migrate_embeddings.py --encoding f32 --table users
+    python migrate_embeddings.py --dry-run
+
+Rows are read in keyset pages and written back one update per row, so the
+script can be stopped and re-run at any time; rows already in the target
+encoding are skipped.
+"""
+import argparse
+import time
+
+from config import EMBEDDING_ENCODING
+from supabase_utils.supabase_client import supabase
+from utils.embedding_codec import decode_embedding, encode_embedding, is_encoded
+
+
+def migrate(table="faces", encoding=EMBEDDING_ENCODING, page_size=500, dry_run=False):
+    converted = skipped = failed = 0
+    bytes_before = bytes_after = 0
+    last_id = None
+    start = time.time()
+
+    while True:
+        query = supabase.table(table).select("id, embedding").order("id").limit(page_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = query.execute().data or []
+        if not rows:
+            break
+        last_id = rows[-1]["id"]
+
+        for row in rows:
+            value = row.get("embedding")
+            if value is None or is_encoded(value, encoding):
+                skipped += 1
+                continue
+            try:
+                encoded = encode_embedding(decode_embedding(value), encoding)
+                bytes_before += len(str(value))
+                bytes_after += len(str(encoded))
+                if not dry_run:
+                    supabase.table(table).update({"embedding": encoded}).eq("id", row["id"]).execute()
+                converted += 1
+            except Exception as e:
+                failed += 1
+                print(f"❌ Row {row['id']}: {e}")
+
+        print(f"🔄 {table}: {converted} converted, {skipped} skipped, {failed} failed (up to id {last_id})")
+        if len(rows) < page_size:
+            break
+
+    if converted:
+        print(f"📦 Embedding payload: {bytes_before / converted:.0f} -> {bytes_after / converted:.0f} chars per row")
+    print(f"✅ Done in {time.time() - start:.1f}s{' (dry run, nothing written)' if dry_run else ''}")
+    return converted, skipped, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode stored face embeddings")
+    parser.add_argument("--table", default="faces", help="table with id / embedding columns (faces or users)")
+    parser.add_argument("--encoding", default=EMBEDDING_ENCODING, choices=["f16", "f32", "json"])
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    migrate(args.table, args.encoding, args.page_size, args.dry_run)
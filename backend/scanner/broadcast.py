@@ -0,0 +1,73 @@
+# scanner/broadcast.py
+import asyncio
+import base64
+import threading
+
+
+class FrameBroadcaster:
+    """
+    Latest-frame fan-out for the API scanner.
+
+    The scanner loop publish()es each annotated frame once, already JPEG
+    encoded. Any number of MJPEG / WebSocket viewers (on the asyncio event
+    loop) and pollers share that single encode; the base64 form used by
+    JSON clients is also computed at most once per frame.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = []  # (event loop, future) pairs woken on the next publish
+        self.seq = 0
+        self.jpeg = None
+        self.payload = None  # detection data published with the frame
+        self._b64 = None
+        self._b64_seq = -1
+
+    def publish(self, jpeg, payload):
+        """Called from the scanner thread with the encoded frame and its detections"""
+        with self._lock:
+            self.seq += 1
+            self.jpeg = jpeg
+            self.payload = payload
+            waiters, self._waiters = self._waiters, []
+
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                pass  # that viewer's event loop has already shut down
+
+    def latest(self):
+        """(seq, jpeg bytes, payload) of the most recent frame"""
+        with self._lock:
+            return self.seq, self.jpeg, self.payload
+
+    def latest_b64(self):
+        """Base64 of the most recent JPEG, encoded once per frame however many clients ask"""
+        with self._lock:
+            if self._b64_seq != self.seq and self.jpeg is not None:
+                self._b64 = base64.b64encode(self.jpeg).decode("utf-8")
+                self._b64_seq = self.seq
+            return self._b64
+
+    async def next_frame(self, after_seq, timeout=5.0):
+        """Wait (without blocking the event loop) for a frame newer than after_seq"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.seq > after_seq:
+                return self.seq, self.jpeg, self.payload
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+        return self.latest()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,87 @@
+# scanner/motion.py
+import cv2
+
+from config import MOTION_GATE_METHOD, MOTION_THRESHOLD, MOTION_PIXEL_DELTA, MOTION_DOWNSCALE_WIDTH, MOTION_MAX_SKIP
+
+
+class MotionGate:
+    """
+    Cheap scene-change check that runs ahead of MTCNN.
+
+    Frames are downscaled to `width` pixels wide, converted to grayscale and
+    blurred, then compared either against a running-average background
+    ("diff") or with OpenCV's MOG2 background subtractor ("mog2"). Detection
+    is skipped while less than `threshold` of the pixels have changed, except
+    that every `max_skip`-th frame is let through as a safety net.
+    """
+
+    def __init__(self, method=MOTION_GATE_METHOD, threshold=MOTION_THRESHOLD, pixel_delta=MOTION_PIXEL_DELTA,
+                 width=MOTION_DOWNSCALE_WIDTH, max_skip=MOTION_MAX_SKIP, learning_rate=0.05):
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"Unknown motion gate method: {method}")
+        self.method = method
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.width = width
+        self.max_skip = max_skip
+        self.learning_rate = learning_rate
+
+        self.checked = 0
+        self.skipped = 0
+        self.last_changed_fraction = 0.0
+        self._background = None
+        self._since_detect = 0
+        self._subtractor = None
+        if method == "mog2":
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(history=200, varThreshold=pixel_delta, detectShadows=False)
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.width / float(width)
+        small = cv2.resize(frame, (self.width, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def changed_fraction(self, frame):
+        """Fraction of (downscaled) pixels that differ from the background model"""
+        gray = self._prepare(frame)
+
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(gray, learningRate=self.learning_rate)
+            return cv2.countNonZero(mask) / float(mask.size)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype("float32")
+            return 1.0  # first frame: always detect
+
+        delta = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        _, mask = cv2.threshold(delta, self.pixel_delta, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / float(mask.size)
+
+    def should_detect(self, frame, force=False):
+        """True if this frame should go through face detection"""
+        self.checked += 1
+        self.last_changed_fraction = self.changed_fraction(frame)
+
+        if force or self.last_changed_fraction >= self.threshold or self._since_detect >= self.max_skip:
+            self._since_detect = 0
+            return True
+
+        self._since_detect += 1
+        self.skipped += 1
+        return False
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.checked if self.checked else 0.0
+
+    def stats(self):
+        return {
+            "method": self.method,
+            "checked": self.checked,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skip_ratio, 3),
+            "last_changed_fraction": round(self.last_changed_fraction, 4),
+        }
@@ -0,0 +1,303 @@
+# scanner/pipeline.py
+import collections
+import threading
+import time
+
+
+from config import SCANNER_CAMERA_ID, SCANNER_MULTI_FACE, SCANNER_QUEUE_SIZE, SCANNER_DETECT_WORKERS, MOTION_GATE
+from detection.detect_faces import detect_faces
+from embedding.embedding_module import get_face_embeddings
+from supabase_utils.attendance_logger import mark_attendance
+from supabase_utils.gallery_cache import get_gallery
+from utils.gallery_partitions import partition_router
+from scanner.motion import MotionGate
+from scanner.tracker import FaceTracker
+from utils.image_utils import draw_box
+
+
+class DropOldestQueue:
+    """
+    Bounded hand-off queue between pipeline stages. When full, put() evicts
+    the oldest item instead of blocking, so a slow stage always works on the
+    freshest data and never stalls the stages in front of it.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next item, or None on timeout / after close()"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class EventQueue(DropOldestQueue):
+    """
+    Unbounded hand-off queue for events that must not be lost (attendance
+    marks: each track is logged once, so a dropped mark is never retried)
+    """
+
+    def __init__(self):
+        super().__init__(maxsize=None)
+
+    def put(self, item):
+        with self._cond:
+            self._items.append(item)
+            self._cond.notify()
+
+
+class Stage:
+    """One pipeline step: `workers` threads applying `fn` to items from `inbox`"""
+
+    def __init__(self, name, fn, inbox, outbox=None, workers=1):
+        self.name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = workers
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"scanner-{self.name}-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self.inbox.close()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            item = self.inbox.get(timeout=0.1)
+            if item is None:
+                continue
+
+            start = time.perf_counter()
+            try:
+                result = self.fn(item)
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Scanner stage '{self.name}' error: {e}")
+                continue
+            finally:
+                self.busy_seconds += time.perf_counter() - start
+
+            self.processed += 1
+            if result is not None and self.outbox is not None:
+                self.outbox.put(result)
+
+
+class ScannerPipeline:
+    """
+    Multi-threaded attendance scanner:
+
+        capture -> detect -> embed -> match -> log
+
+    Frames move through DropOldestQueues and attendance events through an
+    EventQueue (never dropped); each step runs on its own worker(s),
+    so detection, embedding and Supabase writes overlap instead of running
+    back to back. Detections are tracked across frames (FaceTracker), so
+    only faces on new or unidentified tracks go on to the embed stage, and
+    a MotionGate keeps static frames from reaching MTCNN at all. The display side only calls read() / annotate() and keeps
+    up with the camera no matter how slow recognition or the database is.
+    A pipeline is single-use: create a new one after stop().
+    """
+
+    def __init__(self, capture, camera_id=SCANNER_CAMERA_ID, multi_face=SCANNER_MULTI_FACE,
+                 queue_size=SCANNER_QUEUE_SIZE,
+                 detect_workers=SCANNER_DETECT_WORKERS, motion_gate=MOTION_GATE, overlay_ttl=1.5):
+        self.capture = capture
+        self.camera_id = camera_id
+        self.multi_face = multi_face
+        self.overlay_ttl = overlay_ttl
+
+        self.detect_queue = DropOldestQueue(queue_size)
+        self.embed_queue = DropOldestQueue(queue_size)
+        self.match_queue = DropOldestQueue(queue_size)
+        self.log_queue = EventQueue()
+        self.stages = [
+            Stage("detect", self._detect, self.detect_queue, self.embed_queue, workers=detect_workers),
+            Stage("embed", self._embed, self.embed_queue, self.match_queue),
+            Stage("match", self._match, self.match_queue),
+            Stage("log", self._log, self.log_queue),
+        ]
+
+        self.tracker = FaceTracker()
+        self.motion_gate = MotionGate() if motion_gate else None
+        self._tracking = False  # a visible face is still being identified
+
+        self._lock = threading.Lock()  # guards _latest, _overlay and the tracker
+        self._latest = None  # (frame_id, frame) from the camera
+        self._overlay = (0.0, [])  # (timestamp, [(box, label)])
+        self._running = threading.Event()
+        self._capture_thread = None
+        self.frames_captured = 0
+
+    def start(self):
+        self._running.set()
+        for stage in self.stages:
+            stage.start()
+        self._capture_thread = threading.Thread(target=self._capture_loop, name="scanner-capture", daemon=True)
+        self._capture_thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._capture_thread is not None:
+            self._capture_thread.join(2.0)
+        for stage in self.stages:
+            stage.stop()
+
+    def read(self):
+        """Latest (frame_id, frame) grabbed from the camera, or None before the first frame"""
+        with self._lock:
+            return self._latest
+
+    def annotate(self, frame):
+        """
+        Draw the most recent recognition results onto `frame` in place. Pass
+        a copy of the frame from read(), which the detect stage may still be
+        reading.
+        """
+        with self._lock:
+            timestamp, faces = self._overlay
+        if time.monotonic() - timestamp > self.overlay_ttl:
+            return frame
+
+        for box, label in faces:
+            draw_box(frame, label, box)
+        return frame
+
+    def stats(self):
+        """Per-stage counters plus queue drops, for logging / status endpoints"""
+        return {
+            "frames_captured": self.frames_captured,
+            "active_tracks": len(self.tracker.tracks),
+            "motion_gate": self.motion_gate.stats() if self.motion_gate else None,
+            "stages": {
+                stage.name: {
+                    "processed": stage.processed,
+                    "errors": stage.errors,
+                    "busy_seconds": round(stage.busy_seconds, 3),
+                    "dropped": stage.inbox.dropped,
+                    "queued": len(stage.inbox),
+                }
+                for stage in self.stages
+            },
+        }
+
+    def _capture_loop(self):
+        frame_id = 0
+        while self._running.is_set():
+            ret, frame = self.capture.read()
+            if not ret or frame is None or frame.size == 0:
+                time.sleep(0.01)
+                continue
+
+            frame_id += 1
+            self.frames_captured = frame_id
+            with self._lock:
+                self._latest = (frame_id, frame)
+
+            # Skip MTCNN while the scene is static, unless a face is mid-identification
+            if self.motion_gate is not None and not self.motion_gate.should_detect(frame, force=self._tracking):
+                continue
+            self.detect_queue.put({"frame_id": frame_id, "frame": frame})
+
+    def _detect(self, item):
+        faces = detect_faces(item["frame"], max_faces=None if self.multi_face else 1, color="BGR")
+
+        with self._lock:
+            if item["frame_id"] < self.tracker.last_frame_id:
+                return None  # a newer frame already updated the tracker
+
+            # Only faces on new or not yet identified tracks are embedded
+            to_embed = []
+            for track, face in self.tracker.update(faces, item["frame_id"]):
+                if self.tracker.needs_embedding(track):
+                    track.last_embedded_frame = item["frame_id"]
+                    to_embed.append((track, face))
+            self._publish_overlay()
+
+        if not to_embed:
+            return None
+        item["tracks"] = [track for track, _ in to_embed]
+        item["faces"] = [face for _, face in to_embed]
+        return item
+
+    def _embed(self, item):
+        item["embeddings"] = get_face_embeddings([f["face"] for f in item["faces"]])
+        return item
+
+    def _match(self, item):
+        # Students timetabled for this camera first, then everyone
+        matches = partition_router.match_many(get_gallery(), item["embeddings"], self.camera_id)
+
+        decided = []
+        with self._lock:
+            for track, match in zip(item["tracks"], matches):
+                track.embeddings += 1
+                if self.tracker.vote(track, match):
+                    decided.append(track)
+            self._publish_overlay()
+
+        # Attendance is logged once per track, when its identity is decided
+        for track in decided:
+            print(f"🎯 Track {track.id} identified as {track.identity} (confidence={track.confidence:.3f})")
+            self.log_queue.put(track)
+        return None
+
+    def _log(self, track):
+        marked = mark_attendance(name=track.identity, camera_id=self.camera_id, confidence=track.confidence)
+        with self._lock:
+            track.status = "marked" if marked else "already_present"
+            self._publish_overlay()
+
+    def _publish_overlay(self):
+        """Rebuild the display overlay from the visible tracks (caller holds the lock)"""
+        overlay = []
+        # Unknown tracks (unregistered people, posters) don't hold the motion gate open
+        self._tracking = any(not track.decided and not track.unknown for track in self.tracker.visible_tracks())
+        for track in self.tracker.visible_tracks():
+            if track.status == "marked":
+                label = f"✅ {track.identity} - Attendance Marked!"
+            elif track.status == "already_present":
+                label = f"Present: {track.identity}"
+            elif track.decided:
+                label = track.identity
+            elif track.unknown:
+                label = "Unknown Face"
+            else:
+                label = "Identifying..."
+            overlay.append((track.box, label))
+        self._overlay = (time.monotonic(), overlay)
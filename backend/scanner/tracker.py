@@ -0,0 +1,151 @@
+# scanner/tracker.py
+import collections
+import itertools
+
+from config import TRACK_IOU_THRESHOLD, TRACK_MAX_MISSES, TRACK_VOTES_REQUIRED, TRACK_VOTES_WINDOW, TRACK_RECHECK_FRAMES
+
+
+def iou(box_a, box_b):
+    """Intersection-over-union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def centroid_distance(box_a, box_b):
+    """Distance between box centres, relative to the size of box_a"""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    dx = (ax + aw / 2) - (bx + bw / 2)
+    dy = (ay + ah / 2) - (by + bh / 2)
+    return (dx * dx + dy * dy) ** 0.5 / max(aw, ah, 1)
+
+
+class Track:
+    """One face followed across frames, with its recognition votes"""
+
+    def __init__(self, track_id, box, frame_id, votes_window):
+        self.id = track_id
+        self.box = box
+        self.hits = 1
+        self.misses = 0
+        self.last_frame_id = frame_id
+        self.last_embedded_frame = None
+        self.votes = collections.deque(maxlen=votes_window)  # (name or None, confidence)
+        self.identity = None  # decided name
+        self.confidence = 0.0
+        self.unknown = False  # k of the last n embeddings matched nobody
+        self.status = None  # set once attendance has been logged ("marked" / "already_present")
+        self.embeddings = 0
+
+    @property
+    def decided(self):
+        return self.identity is not None
+
+
+class FaceTracker:
+    """
+    Lightweight IoU tracker (with a centroid-distance fallback for fast
+    motion) for the live scanner. Each face keeps the same track while it
+    stays in view, so it only needs to be embedded until k of its last n
+    embeddings agree on an identity, and attendance is logged once per track.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_misses=TRACK_MAX_MISSES,
+                 votes_required=TRACK_VOTES_REQUIRED, votes_window=TRACK_VOTES_WINDOW,
+                 recheck_frames=TRACK_RECHECK_FRAMES, max_centroid_distance=0.5):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.votes_required = votes_required
+        self.votes_window = votes_window
+        self.recheck_frames = recheck_frames
+        self.max_centroid_distance = max_centroid_distance
+        self.tracks = {}
+        self.last_frame_id = 0
+        self._ids = itertools.count(1)
+
+    def update(self, detections, frame_id):
+        """
+        Associate this frame's detections (dicts with a 'box') with tracks.
+        Returns a list of (track, detection) pairs; unmatched detections
+        start new tracks and tracks missing for too long are dropped.
+        """
+        self.last_frame_id = frame_id
+        tracks = list(self.tracks.values())
+
+        candidates = []
+        for ti, track in enumerate(tracks):
+            for di, detection in enumerate(detections):
+                overlap = iou(track.box, detection["box"])
+                if overlap >= self.iou_threshold:
+                    candidates.append((1.0 + overlap, ti, di))
+                elif centroid_distance(track.box, detection["box"]) <= self.max_centroid_distance:
+                    candidates.append((1.0 - centroid_distance(track.box, detection["box"]), ti, di))
+
+        # Greedy assignment, best score first
+        pairs, used_tracks, used_detections = [], set(), set()
+        for _, ti, di in sorted(candidates, reverse=True):
+            if ti in used_tracks or di in used_detections:
+                continue
+            used_tracks.add(ti)
+            used_detections.add(di)
+            track = tracks[ti]
+            track.box = detections[di]["box"]
+            track.hits += 1
+            track.misses = 0
+            track.last_frame_id = frame_id
+            pairs.append((track, detections[di]))
+
+        for ti, track in enumerate(tracks):
+            if ti not in used_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    del self.tracks[track.id]
+
+        for di, detection in enumerate(detections):
+            if di not in used_detections:
+                track = Track(next(self._ids), detection["box"], frame_id, self.votes_window)
+                self.tracks[track.id] = track
+                pairs.append((track, detection))
+
+        return pairs
+
+    def needs_embedding(self, track):
+        """True while a track is unidentified; tracks judged unknown are re-checked every recheck_frames"""
+        if track.decided:
+            return False
+        if track.unknown and track.last_embedded_frame is not None:
+            return track.last_frame_id - track.last_embedded_frame >= self.recheck_frames
+        return True
+
+    def vote(self, track, match):
+        """
+        Record one gallery match (or None) for a track. Returns True when this
+        vote decides the track's identity (k of the last n votes agree).
+        """
+        if track.decided:
+            return False
+
+        track.votes.append((match["name"], 1.0 - match["distance"]) if match else (None, 0.0))
+        counts = collections.Counter(name for name, _ in track.votes)
+        name, count = max(
+            ((n, c) for n, c in counts.items() if n is not None),
+            key=lambda item: item[1],
+            default=(None, 0),
+        )
+        if count >= self.votes_required:
+            track.identity = name
+            track.confidence = sum(conf for n, conf in track.votes if n == name) / count
+            track.unknown = False
+            return True
+
+        track.unknown = counts[None] >= self.votes_required
+        return False
+
+    def visible_tracks(self):
+        """Tracks seen in the most recent frame"""
+        return [track for track in self.tracks.values() if track.misses == 0]
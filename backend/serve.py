@@ -0,0 +1,150 @@
+# serve.py
+"""
+Pre-fork multi-worker API server.
+
+Unlike `uvicorn --workers N`, which starts N fresh interpreters that each
+load MTCNN, InceptionResnetV1 and the gallery, this master process loads
+and warms the models once and then forks the workers, so the weights are
+shared copy-on-write. The gallery lives in shared memory: the master is
+the only process that talks to Supabase for it (delta / full refreshes as
+configured for GalleryCache) and publishes each new version; workers map
+it without copying, and a registration in any worker asks the master to
+refresh.
+
+Run from backend/:
+    python serve.py --workers 4 [--host 0.0.0.0] [--port 8000]
+
+Each worker has its own camera scanner state, so the live scanner
+endpoints (/api/start-scanner, /api/scanner-*) need --workers 1 or a
+load balancer with sticky sessions.
+"""
+import os
+
+# The master must not start torch's OpenMP pool before forking (children
+# would hang on their first forward pass): warm up single-threaded and let
+# each worker pick its thread count after the fork.
+WORKER_THREADS = int(os.getenv("EMBED_THREADS", "0"))
+os.environ["EMBED_THREADS"] = "1"
+
+import argparse  # noqa: E402
+import gc  # noqa: E402
+import signal  # noqa: E402
+import socket  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+
+import uvicorn  # noqa: E402
+
+from config import SERVE_WORKERS, SERVE_HOST, SERVE_PORT  # noqa: E402
+from api_server import app  # noqa: E402
+from supabase_utils.gallery_cache import gallery_cache  # noqa: E402
+from utils.shared_gallery import SharedGalleryPublisher, SharedGalleryReader  # noqa: E402
+from utils.warmup import model_warmup  # noqa: E402
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, control_name, threads):
+    """Body of a forked worker: attach to the shared gallery and serve on the inherited socket"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    from embedding.inference_backends import configure_threads
+    configure_threads(threads)
+    gallery_cache.shared = SharedGalleryReader(control_name)
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+
+def refresh_gallery(publisher, stop, poll_interval=0.5):
+    """Master-side loop: keep the cache synced with Supabase and publish every new index"""
+    published, _ = gallery_cache.get_with_watermark()
+    while not stop.wait(poll_interval):
+        if publisher.refresh_requested():
+            gallery_cache.invalidate()
+        try:
+            index, watermark = gallery_cache.get_with_watermark()  # refreshes in the background when due
+        except Exception as e:
+            print(f"❌ Gallery refresh failed: {e}")
+            continue
+        if index is not published:
+            publisher.publish(index, watermark)
+            published = index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    args = parser.parse_args()
+    threads = WORKER_THREADS or max(1, (os.cpu_count() or 1) // args.workers)
+
+    # Load everything the workers share before forking
+    start = time.perf_counter()
+    model_warmup.warm_gallery = False
+    if not model_warmup.wait():
+        raise SystemExit(f"❌ Model warm-up failed: {model_warmup.error}")
+    publisher = SharedGalleryPublisher()
+    publisher.publish(*gallery_cache.get_with_watermark())
+    sock = bind_socket(args.host, args.port)
+    print(f"🚀 Models and gallery loaded in {time.perf_counter() - start:.1f}s; "
+          f"forking {args.workers} workers ({threads} inference threads each) on {args.host}:{args.port}")
+
+    gc.collect()
+    gc.freeze()  # keep the collector from touching (and un-sharing) the parent's objects
+
+    workers = {}
+    stopping = threading.Event()
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, publisher.name, threads)
+            finally:
+                os._exit(0)
+        workers[pid] = slot
+
+    def shutdown(signum, frame):
+        stopping.set()
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for slot in range(args.workers):
+        spawn(slot)
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    threading.Thread(target=refresh_gallery, args=(publisher, stopping), name="gallery-refresher", daemon=True).start()
+
+    try:
+        while workers:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            slot = workers.pop(pid, None)
+            if slot is not None and not stopping.is_set():
+                print(f"⚠️ Worker {pid} exited with status {status}, restarting")
+                time.sleep(1.0)
+                spawn(slot)
+    finally:
+        publisher.close()
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,27 @@
 # supabase_utils/attendance_logger.py
 from datetime import datetime, timedelta
 import os
-from supabase import create_client
+import threading
+import time
 from dotenv import load_dotenv
+from config import ATTENDANCE_DEDUP_MINUTES, ATTENDANCE_SUMMARY_CACHE_SECONDS
+from supabase_utils.lazy_client import LazyClient
 
 # Load environment variables
 load_dotenv()
 
-# Supabase client setup
+# Supabase client setup (created on first use)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase = LazyClient("SUPABASE_URL", "SUPABASE_KEY", required=False)
+
+# face id -> name, filled by bulk lookups (names of registered faces don't change)
+_face_names = {}
+_face_names_lock = threading.Lock()
+
+# Today's summary, rebuilt only after a new mark is written (or the TTL expires)
+_summary_cache = {"value": None, "date": None, "built_at": 0.0, "version": 0}
+_summary_lock = threading.Lock()
 
 def get_face_id_by_name(name):
     """Get face ID from faces table by name"""
@@ -24,16 +35,31 @@ def get_face_id_by_name(name):
         print(f"❌ Error getting face ID for {name}: {e}")
         return None
 
-def get_face_name_by_id(face_id):
-    """Get face name from faces table by ID"""
+def get_face_names_by_ids(face_ids, chunk_size=500):
+    """
+    Map face IDs to names with one bulk in_() query per chunk of IDs not
+    already cached. IDs missing from the faces table map to "Unknown".
+    """
+    wanted = {face_id for face_id in face_ids if face_id is not None}
+    with _face_names_lock:
+        missing = [face_id for face_id in wanted if face_id not in _face_names]
+
     try:
-        response = supabase.table("faces").select("name").eq("id", face_id).execute()
-        if response.data and len(response.data) > 0:
-            return response.data[0]["name"]
-        return "Unknown"
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            response = supabase.table("faces").select("id, name").in_("id", chunk).execute()
+            with _face_names_lock:
+                for row in response.data or []:
+                    _face_names[row["id"]] = row["name"]
     except Exception as e:
-        print(f"❌ Error getting face name for ID {face_id}: {e}")
-        return "Unknown"
+        print(f"❌ Error getting face names for {len(missing)} IDs: {e}")
+
+    with _face_names_lock:
+        return {face_id: _face_names.get(face_id, "Unknown") for face_id in wanted}
+
+def get_face_name_by_id(face_id):
+    """Get face name from faces table by ID"""
+    return get_face_names_by_ids([face_id]).get(face_id, "Unknown")
 
 def check_recent_attendance(face_id, minutes=5):
     """Check if face has attendance marked in the last N minutes"""
@@ -53,62 +79,35 @@ def mark_attendance(name, camera_id="camera_0", confidence=None):
     """
     Mark attendance for a face/person
     
+    The record is queued and written to Supabase in the background by the
+    attendance writer (supabase_utils/attendance_queue.py); duplicates within
+    the dedup window (ATTENDANCE_DEDUP_MINUTES) are dropped in memory.
+    
     Args:
         name: Person name from faces table
         camera_id: Camera identifier (default: "camera_0")
         confidence: Recognition confidence score (optional)
     
     Returns:
-        bool: True if attendance marked successfully, False otherwise
+        bool: True if attendance was marked, False if already marked recently
+        or the person is not in the faces table
     """
+    from supabase_utils.attendance_queue import attendance_writer
+
     try:
-        print(f"🔍 Attempting to mark attendance for: {name}")
-        
-        # Get face ID from faces table
-        face_id = get_face_id_by_name(name)
-        if face_id is None:
+        if not attendance_writer.is_registered(name):
             print(f"❌ Person '{name}' not found in faces table")
             return False
-        
-        print(f"✅ Found face_id: {face_id} for {name}")
-        
-        # Check if attendance already marked recently (prevent duplicate entries)
-        if check_recent_attendance(face_id, minutes=5):
-            print(f"⚠️ Attendance already marked for {name} in the last 5 minutes")
-            return False
-        
-        # Prepare attendance data (using user_id column to store face_id)
-        attendance_data = {
-            "user_id": face_id,  # This will reference the faces table ID
-            "timestamp": datetime.now().isoformat(),
-            "camera_id": camera_id
-        }
-        
-        # Add confidence if provided
-        if confidence is not None:
-            try:
-                attendance_data["confidence"] = float(confidence)
-            except:
-                pass  # Skip if confidence column doesn't exist
-        
-        print(f"🔍 Inserting attendance data: {attendance_data}")
-        
-        # Insert attendance record
-        response = supabase.table("attendance").insert(attendance_data).execute()
-        
-        print(f"🔍 Supabase response: {response.data}")
-        
-        if response.data:
+
+        if attendance_writer.mark(name, camera_id=camera_id, confidence=confidence):
             print(f"✅ Attendance marked for {name} at {datetime.now().strftime('%H:%M:%S')}")
             return True
-        else:
-            print(f"❌ Failed to mark attendance for {name}")
-            return False
+
+        print(f"⚠️ Attendance already marked for {name} in the last {ATTENDANCE_DEDUP_MINUTES:g} minutes")
+        return False
             
     except Exception as e:
         print(f"❌ Error marking attendance for {name}: {e}")
-        import traceback
-        traceback.print_exc()
         return False
 
 def get_today_attendance():
@@ -116,17 +115,22 @@ def get_today_attendance():
     try:
         today = datetime.now().date()
         
-        # Get attendance records for today
-        response = supabase.table("attendance").select("*").gte("timestamp", today.isoformat()).execute()
-        
-        # Add face names to each record
+        # Get attendance records for today, a page at a time (PostgREST caps each response)
+        records, page_size = [], 1000
+        while True:
+            response = (supabase.table("attendance").select("*").gte("timestamp", today.isoformat())
+                        .order("id").range(len(records), len(records) + page_size - 1).execute())
+            page = response.data or []
+            records.extend(page)
+            if len(page) < page_size:
+                break
+        
+        # Add face names to each record (user_id actually contains face_id)
+        names = get_face_names_by_ids(record.get("user_id") for record in records)
         attendance_with_names = []
-        for record in response.data:
-            face_id = record.get("user_id")  # user_id actually contains face_id
-            face_name = get_face_name_by_id(face_id) if face_id else "Unknown"
-            
+        for record in records:
             record_with_name = record.copy()
-            record_with_name["face_name"] = face_name
+            record_with_name["face_name"] = names.get(record.get("user_id"), "Unknown")
             attendance_with_names.append(record_with_name)
         
         return attendance_with_names
@@ -135,8 +139,51 @@ def get_today_attendance():
         print(f"❌ Error getting today's attendance: {e}")
         return []
 
+def format_attendance_time(timestamp):
+    """HH:MM:SS for an attendance timestamp string"""
+    if not timestamp:
+        return "Unknown"
+    try:
+        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        return dt.strftime('%H:%M:%S')
+    except:
+        return timestamp[:19] if len(timestamp) > 19 else timestamp
+
+def attendance_version():
+    """Counter bumped on every invalidate_attendance_summary(); keys other attendance caches"""
+    return _summary_cache["version"]
+
+def invalidate_attendance_summary():
+    """Drop the cached summary (and report pages), e.g. after attendance has been written"""
+    with _summary_lock:
+        _summary_cache["version"] += 1
+        _summary_cache["value"] = None
+
 def get_attendance_summary():
-    """Get attendance summary for today"""
+    """
+    Get attendance summary for today
+    
+    The summary is cached until new attendance is written (see
+    invalidate_attendance_summary) or ATTENDANCE_SUMMARY_CACHE_SECONDS
+    pass, which covers writes from other processes. Treat it as read-only.
+    """
+    today = datetime.now().date()
+    with _summary_lock:
+        cached = _summary_cache["value"]
+        if (cached is not None and _summary_cache["date"] == today
+                and time.monotonic() - _summary_cache["built_at"] < ATTENDANCE_SUMMARY_CACHE_SECONDS):
+            return cached
+        version = _summary_cache["version"]
+
+    summary = _build_attendance_summary()
+
+    with _summary_lock:
+        # Don't cache a summary that a write made stale while it was being built
+        if _summary_cache["version"] == version:
+            _summary_cache.update(value=summary, date=today, built_at=time.monotonic())
+    return summary
+
+def _build_attendance_summary():
     try:
         attendance_records = get_today_attendance()
         
@@ -146,22 +193,9 @@ def get_attendance_summary():
         }
         
         for record in attendance_records:
-            face_name = record.get("face_name", "Unknown")
-            timestamp = record.get("timestamp", "")
-            
-            # Format timestamp for display
-            if timestamp:
-                try:
-                    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    formatted_time = dt.strftime('%H:%M:%S')
-                except:
-                    formatted_time = timestamp[:19] if len(timestamp) > 19 else timestamp
-            else:
-                formatted_time = "Unknown"
-            
             summary["records"].append({
-                "name": face_name,
-                "time": formatted_time,
+                "name": record.get("face_name", "Unknown"),
+                "time": format_attendance_time(record.get("timestamp", "")),
                 "camera": record.get("camera_id", "Unknown"),
                 "confidence": record.get("confidence")
             })
@@ -188,6 +222,10 @@ def clear_today_attendance():
     try:
         today = datetime.now().date()
         response = supabase.table("attendance").delete().gte("timestamp", today.isoformat()).execute()
+
+        from supabase_utils.attendance_queue import attendance_writer
+        attendance_writer.forget()
+        invalidate_attendance_summary()
         print(f"✅ Cleared attendance records for today")
         return True
     except Exception as e:
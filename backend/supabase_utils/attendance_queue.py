@@ -0,0 +1,305 @@
+# supabase_utils/attendance_queue.py
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from config import (ATTENDANCE_DEDUP_MINUTES, ATTENDANCE_BATCH_SIZE, ATTENDANCE_FLUSH_SECONDS,
+                    ATTENDANCE_MAX_BACKOFF_SECONDS, ATTENDANCE_MAX_RETRIES, ATTENDANCE_DEAD_LETTER_PATH,
+                    ATTENDANCE_NAME_REFRESH_SECONDS)
+from supabase_utils.attendance_logger import supabase, invalidate_attendance_summary
+
+
+class AttendanceWriter:
+    """
+    Write-behind queue for attendance marks.
+
+    mark() only touches memory: it checks a per-person "last marked" map
+    covering the dedup window and queues the record. A background worker
+    resolves names to face ids from a cached name -> id map and inserts
+    the queued records in batches, retrying failed inserts with exponential
+    backoff. Recognition therefore never waits on a Supabase round trip.
+
+    A batch that still fails after `max_retries` attempts is split in halves
+    until the failing rows are isolated; those are appended to the
+    dead-letter file (JSON lines) so one bad row cannot block later writes.
+
+    The writer thread seeds the dedup map from the attendance table before
+    its first batch (retrying until it succeeds), so a restart does not
+    re-mark people seen in the last few minutes; marks queued meanwhile
+    are checked against the seed before they are written.
+    """
+
+    def __init__(self, dedup_minutes=ATTENDANCE_DEDUP_MINUTES, batch_size=ATTENDANCE_BATCH_SIZE,
+                 flush_interval=ATTENDANCE_FLUSH_SECONDS, max_backoff=ATTENDANCE_MAX_BACKOFF_SECONDS,
+                 max_retries=ATTENDANCE_MAX_RETRIES, dead_letter_path=ATTENDANCE_DEAD_LETTER_PATH,
+                 name_refresh_interval=ATTENDANCE_NAME_REFRESH_SECONDS):
+        self.dedup_window = dedup_minutes * 60.0
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_retries = max(1, max_retries)
+        self.dead_letter_path = dead_letter_path
+        self.name_refresh_interval = name_refresh_interval
+
+        self._cond = threading.Condition()
+        self._pending = []  # records waiting to be inserted, oldest first
+        self._inflight = 0  # records taken by the worker but not yet written
+        self._last_marked = {}  # name -> time.time() of the last accepted mark
+        self._seeded = False
+        self._seed_attempted_at = None
+        self._names_lock = threading.Lock()
+        self._name_to_id = {}
+        self._names_loaded_at = 0.0
+        self._thread = None
+
+        self.written = 0
+        self.duplicates = 0
+        self.failures = 0
+        self.unknown = 0
+        self.dead_lettered = 0
+
+    def mark(self, name, camera_id="camera_0", confidence=None):
+        """
+        Queue attendance for `name`. Returns True if the mark was accepted,
+        False if the person was already marked within the dedup window.
+        """
+        now = time.time()
+
+        with self._cond:
+            last = self._last_marked.get(name)
+            if last is not None and now - last < self.dedup_window:
+                self.duplicates += 1
+                return False
+            self._last_marked[name] = now
+
+            record = {"name": name, "timestamp": datetime.fromtimestamp(now).isoformat(), "camera_id": camera_id}
+            if confidence is not None:
+                record["confidence"] = float(confidence)
+            self._pending.append(record)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+        self._ensure_worker()
+        return True
+
+    def is_registered(self, name):
+        """
+        True if `name` is in the cached name -> id map. A miss reloads the map
+        (at most once per flush interval) to pick up new registrations; if the
+        faces table cannot be read the name is assumed registered and left for
+        the worker to resolve.
+        """
+        try:
+            if name in self._face_ids():
+                return True
+            stale = time.monotonic() - self._names_loaded_at >= self.flush_interval
+            if stale and name in self._face_ids(refresh=True):
+                return True
+        except Exception as e:
+            print(f"⚠️ Could not load registered names, accepting '{name}': {e}")
+            return True
+        self.unknown += 1
+        return False
+
+    def flush(self, timeout=10.0):
+        """Block until everything queued so far has been written (or timeout); True if drained"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._cond.notify_all()
+            while self._pending or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, 0.1))
+        return True
+
+    def forget(self, name=None):
+        """Drop the dedup entry for one person (or everyone), e.g. after clearing attendance"""
+        with self._cond:
+            if name is None:
+                self._last_marked.clear()
+            else:
+                self._last_marked.pop(name, None)
+
+    def stats(self):
+        return {
+            "pending": len(self._pending) + self._inflight,
+            "written": self.written,
+            "duplicates": self.duplicates,
+            "failures": self.failures,
+            "unknown": self.unknown,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+                self._thread.start()
+
+    def _seed_recent(self):
+        """Load who was marked within the dedup window (writer thread; retried until it succeeds)"""
+        now = time.monotonic()
+        if self._seed_attempted_at is not None and now - self._seed_attempted_at < self.max_backoff:
+            return
+        self._seed_attempted_at = now
+
+        try:
+            since = datetime.now() - timedelta(seconds=self.dedup_window)
+            response = supabase.table("attendance").select("user_id, timestamp").gte("timestamp", since.isoformat()).execute()
+            id_to_name = {face_id: name for name, face_id in self._face_ids().items()}
+        except Exception as e:
+            print(f"⚠️ Could not load recent attendance for dedup, will retry: {e}")
+            return
+
+        seeded = {}
+        for row in response.data or []:
+            name = id_to_name.get(row.get("user_id"))
+            if name is None:
+                continue
+            try:
+                marked_at = datetime.fromisoformat(row["timestamp"].replace('Z', '+00:00')).timestamp()
+            except (KeyError, AttributeError, ValueError):
+                marked_at = time.time()
+            seeded[name] = max(seeded.get(name, 0.0), marked_at)
+
+        with self._cond:
+            # Marks accepted before the seed arrived may repeat one from before the restart
+            kept = []
+            for record in self._pending:
+                seeded_at = seeded.get(record["name"])
+                if seeded_at is not None and 0 <= datetime.fromisoformat(record["timestamp"]).timestamp() - seeded_at < self.dedup_window:
+                    self.duplicates += 1
+                else:
+                    kept.append(record)
+            self._pending[:] = kept
+            for name, marked_at in seeded.items():
+                self._last_marked[name] = max(self._last_marked.get(name, 0.0), marked_at)
+            self._seeded = True
+
+    def _face_ids(self, refresh=False):
+        """Cached name -> face id map (the lowest id wins for duplicate names)"""
+        with self._names_lock:
+            loaded = self._names_loaded_at and time.monotonic() - self._names_loaded_at < self.name_refresh_interval
+            if loaded and not refresh:
+                return self._name_to_id
+
+            name_to_id = {}
+            page_size, offset = 1000, 0
+            while True:
+                response = supabase.table("faces").select("id, name").order("id").range(offset, offset + page_size - 1).execute()
+                rows = response.data or []
+                for row in rows:
+                    name_to_id.setdefault(row["name"], row["id"])
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+
+            self._name_to_id = name_to_id
+            self._names_loaded_at = time.monotonic()
+            return name_to_id
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._pending) >= self.batch_size, self.flush_interval)
+            batch = self._pending[:self.batch_size]
+            del self._pending[:len(batch)]
+            self._inflight = len(batch)
+            return batch
+
+    def _to_rows(self, batch):
+        """Attendance rows for a batch, resolving names to face ids"""
+        name_to_id = self._face_ids()
+        if any(record["name"] not in name_to_id for record in batch):
+            name_to_id = self._face_ids(refresh=True)  # someone registered since the last load
+
+        rows = []
+        for record in batch:
+            face_id = name_to_id.get(record["name"])
+            if face_id is None:
+                self.unknown += 1
+                print(f"❌ Person '{record['name']}' not found in faces table")
+                continue
+            row = {key: value for key, value in record.items() if key != "name"}
+            row["user_id"] = face_id
+            rows.append(row)
+        return rows
+
+    def _insert(self, rows):
+        if not rows:
+            return
+        supabase.table("attendance").insert(rows).execute()
+        invalidate_attendance_summary()
+        self.written += len(rows)
+        print(f"✅ Attendance written: {len(rows)} records")
+
+    def _write(self, batch):
+        """Insert one batch, retrying up to max_retries times before isolating the failing rows"""
+        backoff = 0.5
+        rows = None
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                if rows is None:
+                    rows = self._to_rows(batch)
+                self._insert(rows)
+                return
+            except Exception as e:
+                self.failures += 1
+                error = e
+                if attempt < self.max_retries:
+                    print(f"❌ Attendance insert failed ({len(batch)} records), retrying in {backoff:.1f}s: {e}")
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+
+        print(f"❌ Attendance insert failed {self.max_retries} times ({len(batch)} records): {error}")
+        if rows is None:
+            self._dead_letter(batch, error)  # names could not be resolved
+        else:
+            self._bisect(rows, error)
+
+    def _bisect(self, rows, error):
+        """Insert the halves of a failed batch separately, dead-lettering rows that fail on their own"""
+        if len(rows) == 1:
+            self._dead_letter(rows, error)
+            return
+        middle = len(rows) // 2
+        for half in (rows[:middle], rows[middle:]):
+            try:
+                self._insert(half)
+            except Exception as e:
+                self.failures += 1
+                self._bisect(half, e)
+
+    def _dead_letter(self, records, error):
+        self.dead_lettered += len(records)
+        failed_at = datetime.now().isoformat()
+        try:
+            directory = os.path.dirname(self.dead_letter_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps({"record": record, "error": str(error), "failed_at": failed_at}, default=str) + "\n")
+            print(f"⚠️ {len(records)} attendance records moved to {self.dead_letter_path}")
+        except OSError as e:
+            print(f"❌ Could not write the attendance dead-letter file ({e}), dropping: {records}")
+
+    def _run(self):
+        while True:
+            if not self._seeded:
+                self._seed_recent()
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+
+            with self._cond:
+                self._inflight = 0
+                self._cond.notify_all()
+
+attendance_writer = AttendanceWriter()
+atexit.register(attendance_writer.flush)
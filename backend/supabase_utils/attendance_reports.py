@@ -0,0 +1,182 @@
+# supabase_utils/attendance_reports.py
+import collections
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, date, timedelta
+
+from config import ATTENDANCE_SUMMARY_CACHE_SECONDS, ATTENDANCE_PAGE_SIZE, ATTENDANCE_MAX_PAGE_SIZE
+from supabase_utils.attendance_logger import (supabase, get_face_names_by_ids, format_attendance_time,
+                                              attendance_version)
+
+_REPORT_CACHE_SIZE = 256
+_report_cache = collections.OrderedDict()  # query key -> (version, built_at, payload, etag)
+_report_lock = threading.Lock()
+
+
+def parse_date_range(start=None, end=None):
+    """
+    (start, end) ISO strings for a half-open timestamp range. Both accept
+    YYYY-MM-DD or a full ISO datetime; a bare end date includes that whole
+    day. Defaults to today. Raises ValueError on a bad value.
+
+    Attendance timestamps are stored as naive local time, so datetimes with
+    'Z' or an offset are converted to local time and made naive too.
+    """
+    def naive_local(value):
+        return value.astimezone().replace(tzinfo=None) if value.tzinfo is not None else value
+
+    def parse(value, is_end):
+        if isinstance(value, datetime):
+            return naive_local(value)
+        if isinstance(value, date):
+            return datetime.combine(value + timedelta(days=1) if is_end else value, datetime.min.time())
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            return datetime.combine(day + timedelta(days=1) if is_end else day, datetime.min.time())
+        return naive_local(datetime.fromisoformat(value.replace('Z', '+00:00')))
+
+    today = datetime.now().date()
+    start_dt = parse(start or today, False)
+    end_dt = parse(end or start_dt.date(), True)
+    if end_dt <= start_dt:
+        raise ValueError("end must be after start")
+    return start_dt.isoformat(), end_dt.isoformat()
+
+
+def response_etag(payload):
+    """Strong ETag for a JSON-serialisable payload"""
+    body = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """True if an If-None-Match header value covers `etag`"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def _cached(key, build):
+    """(payload, etag) for `key`, rebuilt after new attendance is written or the TTL expires"""
+    version = attendance_version()
+    with _report_lock:
+        entry = _report_cache.get(key)
+        if entry and entry[0] == version and time.monotonic() - entry[1] < ATTENDANCE_SUMMARY_CACHE_SECONDS:
+            _report_cache.move_to_end(key)
+            return entry[2], entry[3]
+
+    payload = build()
+    etag = response_etag(payload)
+    with _report_lock:
+        _report_cache[key] = (version, time.monotonic(), payload, etag)
+        _report_cache.move_to_end(key)
+        while len(_report_cache) > _REPORT_CACHE_SIZE:
+            _report_cache.popitem(last=False)
+    return payload, etag
+
+
+def _face_ids_for_name(name):
+    response = supabase.table("faces").select("id").eq("name", name).execute()
+    return [row["id"] for row in response.data or []]
+
+
+def _filtered(columns, start, end, face_ids=None, camera_id=None):
+    query = supabase.table("attendance").select(columns).gte("timestamp", start).lt("timestamp", end)
+    if face_ids is not None:
+        query = query.in_("user_id", face_ids)
+    if camera_id:
+        query = query.eq("camera_id", camera_id)
+    return query
+
+
+def query_attendance(start=None, end=None, name=None, camera_id=None, cursor=None, limit=ATTENDANCE_PAGE_SIZE):
+    """
+    One page of attendance records in [start, end), optionally for one
+    person and/or camera, ordered by id. Pass the returned next_cursor
+    back as `cursor` for the following page (keyset pagination: every page
+    is an indexed range scan, however deep). Returns (payload, etag).
+    """
+    start, end = parse_date_range(start, end)
+    limit = max(1, min(int(limit), ATTENDANCE_MAX_PAGE_SIZE))
+    cursor = int(cursor) if cursor not in (None, "") else None
+    key = ("records", start, end, name, camera_id, cursor, limit)
+
+    def build():
+        face_ids = _face_ids_for_name(name) if name else None
+        if face_ids == []:
+            return {"records": [], "next_cursor": None}
+
+        query = _filtered("id, user_id, timestamp, camera_id, confidence", start, end, face_ids, camera_id)
+        if cursor is not None:
+            query = query.gt("id", cursor)
+        rows = (query.order("id").limit(limit + 1).execute()).data or []
+
+        page = rows[:limit]
+        names = get_face_names_by_ids(row.get("user_id") for row in page)
+        return {
+            "records": [
+                {
+                    "id": row["id"],
+                    "name": names.get(row.get("user_id"), "Unknown"),
+                    "user_id": row.get("user_id"),
+                    "timestamp": row.get("timestamp"),
+                    "time": format_attendance_time(row.get("timestamp", "")),
+                    "camera": row.get("camera_id", "Unknown"),
+                    "confidence": row.get("confidence"),
+                }
+                for row in page
+            ],
+            "next_cursor": page[-1]["id"] if len(rows) > limit else None,
+        }
+
+    return _cached(key, build)
+
+
+def attendance_counts(start=None, end=None, name=None, camera_id=None, page_size=1000):
+    """
+    Attendance counts per person per day in [start, end), plus per-person
+    and overall totals. Only user_id and timestamp are fetched (keyset
+    paged) and the aggregation happens here, so clients get a few rows per
+    person instead of every record. Returns (payload, etag).
+    """
+    start, end = parse_date_range(start, end)
+    key = ("counts", start, end, name, camera_id)
+
+    def build():
+        face_ids = _face_ids_for_name(name) if name else None
+        counts = collections.Counter()
+        if face_ids != []:
+            last_id = None
+            while True:
+                query = _filtered("id, user_id, timestamp", start, end, face_ids, camera_id)
+                if last_id is not None:
+                    query = query.gt("id", last_id)
+                rows = (query.order("id").limit(page_size).execute()).data or []
+                for row in rows:
+                    counts[(row.get("user_id"), str(row.get("timestamp", ""))[:10])] += 1
+                if len(rows) < page_size:
+                    break
+                last_id = rows[-1]["id"]
+
+        names = get_face_names_by_ids(user_id for user_id, _ in counts)
+        per_day = sorted(
+            ({"name": names.get(user_id, "Unknown"), "user_id": user_id, "date": day, "count": count}
+             for (user_id, day), count in counts.items()),
+            key=lambda row: (row["date"], row["name"]),
+        )
+        per_person = collections.Counter()
+        for row in per_day:
+            per_person[row["name"]] += row["count"]
+
+        return {
+            "start": start,
+            "end": end,
+            "counts": per_day,
+            "per_person": dict(sorted(per_person.items())),
+            "total": sum(counts.values()),
+        }
+
+    return _cached(key, build)
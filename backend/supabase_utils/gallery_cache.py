@@ -0,0 +1,201 @@
+# supabase_utils/gallery_cache.py
+import threading
+import time
+
+from config import (GALLERY_REFRESH_SECONDS, GALLERY_MAX_STALENESS_SECONDS, GALLERY_FULL_RELOAD_SECONDS,
+                    GALLERY_SNAPSHOT, GALLERY_SNAPSHOT_DIR)
+from supabase_utils.supabase_client import get_embeddings_since, embeddings_watermark
+from utils.gallery import build_gallery, wrap_gallery
+from utils.gallery_snapshot import load_snapshot, save_snapshot
+
+
+class GalleryCache:
+    """
+    Process-wide cache of the face gallery index.
+
+    - Single-flight: concurrent callers that need a load wait on one fetch
+      instead of each pulling the faces table.
+    - Delta refresh: after `refresh_interval` (or invalidate()) only faces
+      added after the newest one seen, by (created_at, id), are fetched in
+      the background while callers keep using the current index.
+    - Staleness bound: if the last successful sync is older than
+      `max_staleness`, callers block until a refresh completes.
+    - Full reload every `full_reload_interval` to pick up edits and deletes.
+    - Local snapshot: with `snapshot_dir` set, the first get() serves the
+      memory-mapped on-disk snapshot straight away and reconciles it with
+      the database by a full reload in the background; every successful
+      load or delta is written back as the next snapshot, by one writer
+      thread that always saves the latest index (older ones are skipped).
+    - Shared mode: in a serve.py worker, `shared` is a SharedGalleryReader
+      and get() returns the index the refresher process published in shared
+      memory; invalidate() asks that process to refresh.
+    """
+
+    def __init__(self, refresh_interval=GALLERY_REFRESH_SECONDS, max_staleness=GALLERY_MAX_STALENESS_SECONDS,
+                 full_reload_interval=GALLERY_FULL_RELOAD_SECONDS,
+                 snapshot_dir=GALLERY_SNAPSHOT_DIR if GALLERY_SNAPSHOT else None):
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.full_reload_interval = full_reload_interval
+        self.snapshot_dir = snapshot_dir
+
+        self._lock = threading.Lock()
+        self._inflight = None  # threading.Event of the running refresh, if any
+        self._index = None
+        self._watermark = None  # (created_at, id) of the newest face in the index
+        self._synced_at = 0.0  # last successful fetch (delta or full)
+        self._loaded_at = 0.0  # last successful full load
+        self._dirty = False
+        self._last_error = None
+        self._retry_after = 0.0  # back off background refreshes after a failure
+        self._snapshot_checked = False
+        self._snapshot_pending = None  # latest (index, watermark) waiting to be written
+        self._snapshot_writer = None
+        self.shared = None  # utils.shared_gallery.SharedGalleryReader in serve.py workers
+
+    def get(self):
+        """Return the current gallery index, loading or refreshing it as needed"""
+        if self.shared is not None:
+            return self.shared.get()
+
+        if self._index is None and not self._snapshot_checked:
+            self._load_snapshot()
+
+        index = self._index
+        now = time.monotonic()
+
+        if index is None or (now - self._synced_at > self.max_staleness and now >= self._retry_after):
+            return self._refresh(wait=True)
+
+        if (self._dirty or now - self._synced_at > self.refresh_interval) and now >= self._retry_after:
+            self._refresh(wait=False)
+        return index
+
+    def get_with_watermark(self):
+        """
+        get() plus the (created_at, id) delta watermark of the returned
+        index, read together under the lock so they always match
+        """
+        self.get()
+        with self._lock:
+            return self._index, self._watermark
+
+    def invalidate(self):
+        """Mark the cache stale, e.g. after a new face has been registered"""
+        self._dirty = True
+        if self.shared is not None:
+            self.shared.request_refresh()
+
+    def clear(self):
+        """Drop the cached index so the next get() does a full blocking load"""
+        with self._lock:
+            self._index = None
+            self._watermark = None
+
+    def _load_snapshot(self):
+        """Serve the on-disk snapshot (if any) until the first database load completes"""
+        with self._lock:
+            if self._snapshot_checked:
+                return
+            self._snapshot_checked = True
+            if self.snapshot_dir is None or self._index is not None:
+                return
+            try:
+                index, meta = load_snapshot(self.snapshot_dir)
+            except Exception as e:
+                print(f"⚠️ Could not load gallery snapshot: {e}")
+                return
+            if index is None:
+                return
+
+            self._index = wrap_gallery(index)
+            self._watermark = meta.get("watermark")
+            self._synced_at = time.monotonic()  # serve it without blocking ...
+            self._loaded_at = float("-inf")  # ... but reconcile with a full reload
+            self._dirty = True
+            print(f"✅ Gallery snapshot {meta['version']} loaded: {len(index)} faces (reconciling in background)")
+
+    def _queue_snapshot(self, index, watermark):
+        """Hand (index, watermark) to the snapshot writer, replacing any version it has not started on"""
+        with self._lock:
+            self._snapshot_pending = (index, watermark)
+            if self._snapshot_writer is None:
+                self._snapshot_writer = threading.Thread(target=self._write_snapshots, daemon=True)
+                self._snapshot_writer.start()
+
+    def _write_snapshots(self):
+        while True:
+            with self._lock:
+                pending, self._snapshot_pending = self._snapshot_pending, None
+                if pending is None:
+                    self._snapshot_writer = None
+                    return
+            index, watermark = pending
+            try:
+                save_snapshot(index, self.snapshot_dir, watermark=watermark)
+            except Exception as e:
+                print(f"⚠️ Could not write gallery snapshot: {e}")
+
+    def _refresh(self, wait):
+        with self._lock:
+            event = self._inflight
+            leader = event is None
+            if leader:
+                event = self._inflight = threading.Event()
+                self._dirty = False
+
+        if leader:
+            if wait:
+                self._run_refresh(event)
+            else:
+                threading.Thread(target=self._run_refresh, args=(event,), daemon=True).start()
+        elif wait:
+            event.wait()
+
+        if wait and self._index is None:
+            raise RuntimeError(f"Could not load face gallery: {self._last_error}")
+        return self._index
+
+    def _run_refresh(self, event):
+        try:
+            full = self._index is None or time.monotonic() - self._loaded_at > self.full_reload_interval
+            if full:
+                records = get_embeddings_since()
+                index = build_gallery(records)
+            else:
+                records = get_embeddings_since(self._watermark)
+                index = self._index.extended(records)
+
+            now = time.monotonic()
+            with self._lock:
+                if full or records:
+                    self._watermark = embeddings_watermark(records, None if full else self._watermark)
+                self._index = index
+                self._synced_at = now
+                if full:
+                    self._loaded_at = now
+                    print(f"✅ Gallery loaded: {len(index)} faces")
+                elif records:
+                    print(f"✅ Gallery refreshed: +{len(records)} faces ({len(index)} total)")
+                watermark = self._watermark
+
+            if self.snapshot_dir is not None and (full or records):
+                self._queue_snapshot(index, watermark)
+
+        except Exception as e:
+            self._last_error = e
+            self._retry_after = time.monotonic() + min(self.refresh_interval, 5.0)
+            print(f"❌ Gallery refresh failed: {e}")
+
+        finally:
+            with self._lock:
+                self._inflight = None
+            event.set()
+
+
+gallery_cache = GalleryCache()
+
+
+def get_gallery():
+    """Current face gallery index shared by the whole process"""
+    return gallery_cache.get()
@@ -0,0 +1,55 @@
+# supabase_utils/lazy_client.py
+import os
+import threading
+
+
+class LazyClient:
+    """
+    Stand-in for a supabase Client that is created on first use, so
+    importing a module costs neither the supabase/httpx imports nor a client
+    set-up. Attribute access (supabase.table(...), supabase.storage, ...) is
+    forwarded to the real client.
+    """
+
+    def __init__(self, url_env="SUPABASE_URL", key_env="SUPABASE_SERVICE_KEY", required=True):
+        self._url_env = url_env
+        self._key_env = key_env
+        self._required = required
+        self._client = None
+        self._lock = threading.Lock()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # A client created before fork() (serve.py's master loads the gallery
+        # first) shares its keep-alive sockets, and possibly a held pool lock,
+        # with the parent: each child creates its own on first use
+        self._client = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is not None:
+            return self._client
+        with self._lock:
+            if self._client is None:
+                url, key = os.getenv(self._url_env), os.getenv(self._key_env)
+                if self._required and not url:
+                    raise ValueError(f"{self._url_env} environment variable is required")
+                if self._required and not key:
+                    raise ValueError(f"{self._key_env} environment variable is required")
+
+                from supabase import create_client
+                try:
+                    self._client = create_client(url, key)
+                    print("✅ Supabase client created successfully")
+                except Exception as e:
+                    print(f"❌ Failed to create Supabase client: {e}")
+                    raise
+        return self._client
+
+    @property
+    def created(self):
+        return self._client is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -1,10 +1,11 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client
 import uuid
 from PIL import Image
 import io
 import numpy as np
+from utils.embedding_codec import encode_embedding  # faces.embedding writer (decode_embedding reads it)
+from supabase_utils.lazy_client import LazyClient
 
 # Load environment variables
 load_dotenv()
@@ -14,19 +15,8 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY")
 BUCKET_NAME = "faces"
 
-# Validate environment variables
-if not SUPABASE_URL:
-    raise ValueError("SUPABASE_URL environment variable is required")
-if not SUPABASE_SERVICE_KEY:
-    raise ValueError("SUPABASE_SERVICE_KEY environment variable is required")
-
-# Create Supabase client
-try:
-    supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
-    print("✅ Supabase client created successfully")
-except Exception as e:
-    print(f"❌ Failed to create Supabase client: {e}")
-    raise
+# Supabase client, created (and SUPABASE_URL / SUPABASE_SERVICE_KEY checked) on first use
+supabase = LazyClient("SUPABASE_URL", "SUPABASE_SERVICE_KEY")
 
 def upload_image(face_image):
     """Upload face image to Supabase storage"""
@@ -66,97 +56,73 @@ def upload_image(face_image):
         print(f"❌ Image upload error: {e}")
         raise
 
+def _face_row(name, embedding, image_url=None):
+    """faces row for `embedding` (tensor, array or list), encoded for storage"""
+    # Convert PyTorch tensor to numpy if needed
+    if not isinstance(embedding, np.ndarray):
+        if hasattr(embedding, 'cpu'):  # PyTorch tensor
+            embedding = embedding.detach().cpu().numpy()
+        else:
+            embedding = np.array(embedding)
+
+    # Ensure it's float32 and flatten
+    embedding = embedding.astype(np.float32).flatten()
+    if embedding.size == 0:
+        raise ValueError("Empty embedding")
+
+    # Compact versioned encoding (see utils/embedding_codec.py)
+    row = {"name": name, "embedding": encode_embedding(embedding)}
+    if image_url:
+        row["image_url"] = image_url
+    return row
+
 def store_embedding(name, embedding, image_url=None):
-    """Store face embedding in database"""
+    """Store face embedding in database (one insert)"""
     try:
-        # Convert PyTorch tensor to numpy if needed
-        if not isinstance(embedding, np.ndarray):
-            if hasattr(embedding, 'cpu'):  # PyTorch tensor
-                embedding = embedding.detach().cpu().numpy()
-            else:
-                embedding = np.array(embedding)
-        
-        # Ensure it's float32 and flatten
-        embedding = embedding.astype(np.float32).flatten()
-        
-        # Convert to Python list (JSON serializable)
-        embedding_list = embedding.tolist()
-        
-        # Validate the conversion
-        if not isinstance(embedding_list, list) or len(embedding_list) == 0:
-            raise ValueError("Failed to convert embedding to valid list")
-        
-        print(f"✅ Embedding converted to list of {len(embedding_list)} floats")
-        
-        # First, let's check if the table exists and what columns it has
-        try:
-            # Try to get the table structure by selecting with limit 0
-            test_response = supabase.table("faces").select("*").limit(0).execute()
-            print("✅ Table 'faces' exists and is accessible")
-        except Exception as table_error:
-            print(f"❌ Table access error: {table_error}")
-            # Try to create the table if it doesn't exist
-            print("🔧 Attempting to create table...")
-            create_table_if_not_exists()
-        
-        # Prepare minimal data for insertion first (test with just name)
-        print("🔍 Testing with minimal data insertion...")
-        test_data = {"name": name}
-        
-        try:
-            test_response = supabase.table("faces").insert(test_data).execute()
-            print("✅ Minimal data insertion successful")
-            
-            # If successful, delete the test record and insert full data
-            if test_response.data:
-                test_id = test_response.data[0].get('id')
-                if test_id:
-                    supabase.table("faces").delete().eq('id', test_id).execute()
-                    print("🗑️ Deleted test record")
-        
-        except Exception as test_error:
-            print(f"❌ Minimal data insertion failed: {test_error}")
-            raise
-        
-        # Now try with full data
-        insert_data = {
-            "name": name,
-            "embedding": embedding_list
-        }
-        
-        # Add image_url if provided
-        if image_url:
-            insert_data["image_url"] = image_url
-        
-        print(f"🔍 Inserting full data: {list(insert_data.keys())}")
-        
-        # Insert into database
-        response = supabase.table("faces").insert(insert_data).execute()
-        
+        response = supabase.table("faces").insert(_face_row(name, embedding, image_url)).execute()
+
         if response.data:
             print(f"✅ Successfully stored embedding for '{name}'")
+
+            # Let cached galleries pick up the new face on their next lookup
+            from supabase_utils.gallery_cache import gallery_cache
+            gallery_cache.invalidate()
+
             return response.data[0]
         else:
             raise Exception("No data returned from database insert")
-            
+
     except Exception as e:
-        print(f"❌ Error storing embedding: {e}")
-        print(f"❌ Error type: {type(e)}")
-        
-        # Additional debugging
-        try:
-            # Check if we can at least connect to the database
-            tables_response = supabase.table("faces").select("count").execute()
-            print("✅ Database connection is working")
-        except Exception as conn_error:
-            print(f"❌ Database connection error: {conn_error}")
-        
+        print(f"❌ Error storing embedding for '{name}': {e}")
+        raise
+
+def store_embeddings(faces):
+    """
+    Store many faces in one bulk insert. `faces` is a list of
+    (name, embedding, image_url) tuples; returns the inserted rows in the
+    same order.
+    """
+    if not faces:
+        return []
+    rows = [_face_row(name, embedding, image_url) for name, embedding, image_url in faces]
+    try:
+        response = supabase.table("faces").insert(rows).execute()
+        if not response.data or len(response.data) != len(rows):
+            raise Exception(f"Expected {len(rows)} rows back from bulk insert, got {len(response.data or [])}")
+        print(f"✅ Stored {len(rows)} embeddings in one insert")
+
+        from supabase_utils.gallery_cache import gallery_cache
+        gallery_cache.invalidate()
+        return response.data
+
+    except Exception as e:
+        print(f"❌ Error storing {len(rows)} embeddings: {e}")
         raise
 
 def get_embeddings():
     """Retrieve all face embeddings from database"""
     try:
-        response = supabase.table("faces").select("*").execute()
+        response = supabase.table("faces").select("id, name, embedding").execute()
         
         if response.data:
             print(f"✅ Retrieved {len(response.data)} embeddings")
@@ -169,6 +135,40 @@ def get_embeddings():
         print(f"❌ Database retrieval error: {e}")
         raise
 
+def embeddings_watermark(rows, watermark=None):
+    """Highest (created_at, id) among `rows` (and `watermark`), as a list so it survives JSON"""
+    keys = [(row.get("created_at") or "", row["id"]) for row in rows]
+    if watermark is not None:
+        keys.append(tuple(watermark))
+    return list(max(keys)) if keys else None
+
+def get_embeddings_since(after=None, page_size=1000):
+    """
+    Retrieve faces added after the `after` watermark, a (created_at, id)
+    pair from embeddings_watermark(), or all faces when it is None; oldest
+    first. Keying on created_at rather than id alone also picks up rows
+    inserted with a lower id (restored or back-filled rows). Only the
+    columns needed for matching are selected, and rows are fetched in
+    keyset-paginated pages so large tables are not cut off by the API row limit.
+    """
+    rows = []
+    try:
+        while True:
+            query = (supabase.table("faces").select("id, name, embedding, created_at")
+                     .order("created_at").order("id").limit(page_size))
+            if after is not None:
+                created_at, face_id = after
+                query = query.or_(f'created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{face_id})')
+            page = query.execute().data or []
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            after = embeddings_watermark(page[-1:])
+
+    except Exception as e:
+        print(f"❌ Database retrieval error: {e}")
+        raise
+
 def create_table_if_not_exists():
     """Create the faces table if it doesn't exist"""
     try:
@@ -1,12 +1,13 @@
 from PIL import Image
-from facenet_pytorch import MTCNN, InceptionResnetV1
 import torch
 
+from utils.model_weights import load_mtcnn, load_resnet
+
 device = torch.device("cpu")
 
 # Load face detector and embedding model
-mtcnn = MTCNN(device='cpu')
-model = InceptionResnetV1(pretrained='vggface2').eval().to(device)
+mtcnn = load_mtcnn(device='cpu')
+model = load_resnet().to(device)
 
 # Load image
 img = Image.open(r"/Users/adityapratapsingh/Documents/Face_Recognition_IITD/test_images/alice.jpg")  # replace with your test image
@@ -0,0 +1,60 @@
+# tests/test_ann_index.py
+import numpy as np
+import pytest
+
+from utils.ann_index import IVFIndex, gallery_fingerprint
+
+
+@pytest.fixture
+def records():
+    rng = np.random.default_rng(0)
+    return [{"id": i, "name": f"person{i}", "embedding": rng.standard_normal(16).tolist()} for i in range(1, 61)]
+
+
+def test_fingerprint_ignores_row_order():
+    matrix = np.random.default_rng(1).standard_normal((5, 4)).astype(np.float32)
+    ids = np.asarray([5, 1, 4, 2, 3], dtype=object)
+    order = np.argsort([str(i) for i in ids])
+    assert gallery_fingerprint(ids, matrix) == gallery_fingerprint(ids[order], matrix[order])
+
+
+def test_fingerprint_changes_with_embeddings():
+    matrix = np.random.default_rng(1).standard_normal((5, 4)).astype(np.float32)
+    changed = matrix.copy()
+    changed[2, 0] += 0.5
+    assert gallery_fingerprint(range(5), matrix) != gallery_fingerprint(range(5), changed)
+
+
+def test_saved_index_round_trips(records, tmp_path):
+    path = str(tmp_path / "ivf.npz")
+    built = IVFIndex.load_or_build(records, path, nprobe=4, dim=16)
+    loaded = IVFIndex.load_or_build(records, path, nprobe=4, dim=16)
+
+    assert loaded.fingerprint == gallery_fingerprint(built.ids, built.matrix)
+    np.testing.assert_array_equal(loaded.centroids, built.centroids)  # reused, not retrained
+    query = np.asarray(records[7]["embedding"], dtype=np.float32)
+    assert loaded.match(query)["name"] == "person8"
+
+
+def test_saved_index_is_extended_with_new_faces(records, tmp_path):
+    path = str(tmp_path / "ivf.npz")
+    built = IVFIndex.load_or_build(records[:50], path, nprobe=4, dim=16)
+    extended = IVFIndex.load_or_build(records, path, nprobe=4, dim=16)
+
+    assert len(extended) == 60
+    np.testing.assert_array_equal(extended.centroids, built.centroids)
+    query = np.asarray(records[55]["embedding"], dtype=np.float32)
+    assert extended.match(query, threshold=2.0)["name"] == "person56"
+
+
+def test_changed_embedding_rebuilds(records, tmp_path):
+    path = str(tmp_path / "ivf.npz")
+    IVFIndex.load_or_build(records, path, nprobe=4, dim=16)
+    before = IVFIndex.load(path).fingerprint
+
+    records[0] = {**records[0], "embedding": np.ones(16).tolist()}  # same ids, re-embedded face
+    rebuilt = IVFIndex.load_or_build(records, path, nprobe=4, dim=16)
+
+    saved = IVFIndex.load(path).fingerprint
+    assert saved != before
+    assert saved == gallery_fingerprint(rebuilt.ids, rebuilt.matrix)
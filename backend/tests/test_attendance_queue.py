@@ -0,0 +1,165 @@
+# tests/test_attendance_queue.py
+import json
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from supabase_utils import attendance_queue
+from supabase_utils.attendance_queue import AttendanceWriter
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.rows = None
+        self.filters = []
+        self.bounds = None
+
+    def select(self, *columns):
+        return self
+
+    def order(self, column, desc=False):
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row[column] >= value)
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end + 1)
+        return self
+
+    def insert(self, rows):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        if self.rows is not None:
+            return self.client.insert(self.table, self.rows)
+        data = [row for row in self.client.tables[self.table] if all(f(row) for f in self.filters)]
+        if self.bounds:
+            data = data[slice(*self.bounds)]
+        return SimpleNamespace(data=data)
+
+
+class FakeClient:
+    """In-memory faces / attendance tables; an insert containing a user_id in `bad_ids` fails as a whole"""
+
+    def __init__(self, faces, bad_ids=(), failing_inserts=0):
+        self.tables = {"faces": faces, "attendance": []}
+        self.bad_ids = set(bad_ids)
+        self.failing_inserts = failing_inserts
+        self.inserts = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def insert(self, table, rows):
+        self.inserts += 1
+        if self.failing_inserts:
+            self.failing_inserts -= 1
+            raise RuntimeError("connection reset")
+        if any(row["user_id"] in self.bad_ids for row in rows):
+            raise RuntimeError("violates foreign key constraint")
+        self.tables[table].extend(rows)
+        return SimpleNamespace(data=rows)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient([{"id": 1, "name": "alice"}, {"id": 2, "name": "bob"}, {"id": 3, "name": "carol"}])
+    monkeypatch.setattr(attendance_queue, "supabase", client)
+    monkeypatch.setattr(attendance_queue.time, "sleep", lambda seconds: None)  # retry backoff
+    return client
+
+
+@pytest.fixture
+def writer(client, monkeypatch, tmp_path):
+    writer = AttendanceWriter(dedup_minutes=5, batch_size=10, max_retries=2,
+                              dead_letter_path=str(tmp_path / "dead_letter.jsonl"))
+    monkeypatch.setattr(writer, "_ensure_worker", lambda: None)  # batches are written by the test
+    return writer
+
+
+def write_pending(writer):
+    batch, writer._pending = writer._pending, []
+    writer._write(batch)
+
+
+def test_marks_within_window_are_dropped(writer):
+    assert writer.mark("alice")
+    assert not writer.mark("alice")
+    assert writer.mark("bob")
+    assert [record["name"] for record in writer._pending] == ["alice", "bob"]
+    assert writer.stats()["duplicates"] == 1
+
+    writer.forget("alice")
+    assert writer.mark("alice")
+
+
+def test_window_expiry_allows_a_new_mark(writer):
+    writer.mark("alice")
+    writer._last_marked["alice"] -= writer.dedup_window + 1
+    assert writer.mark("alice")
+
+
+def test_batch_is_written_with_face_ids(writer, client):
+    writer.mark("alice", camera_id="gate", confidence=0.9)
+    writer.mark("carol")
+    write_pending(writer)
+
+    rows = client.tables["attendance"]
+    assert [row["user_id"] for row in rows] == [1, 3]
+    assert rows[0]["camera_id"] == "gate" and rows[0]["confidence"] == 0.9
+    assert "name" not in rows[0]
+    assert writer.stats()["written"] == 2
+
+
+def test_failed_insert_is_retried(writer, client):
+    client.failing_inserts = 1
+    writer.mark("alice")
+    write_pending(writer)
+
+    assert client.inserts == 2
+    assert writer.stats()["failures"] == 1 and writer.stats()["written"] == 1
+
+
+def test_bad_row_is_bisected_out_and_dead_lettered(writer, client):
+    client.bad_ids = {2}
+    for name in ("alice", "bob", "carol"):
+        writer.mark(name)
+    write_pending(writer)
+
+    assert sorted(row["user_id"] for row in client.tables["attendance"]) == [1, 3]
+    assert writer.stats()["dead_lettered"] == 1
+
+    with open(writer.dead_letter_path, encoding="utf-8") as f:
+        [entry] = [json.loads(line) for line in f]
+    assert entry["record"]["user_id"] == 2
+    assert "foreign key" in entry["error"]
+
+
+def test_is_registered_uses_cached_names(writer, client):
+    assert writer.is_registered("alice")
+    assert not writer.is_registered("dave")
+    assert writer.stats()["unknown"] == 1
+
+    client.tables["faces"].append({"id": 4, "name": "dave"})
+    writer._names_loaded_at = time.monotonic() - writer.flush_interval  # the map is old enough to reload
+    assert writer.is_registered("dave")
+
+
+def test_seed_drops_marks_repeating_one_before_restart(writer, client):
+    marked_at = datetime.now() - timedelta(minutes=1)
+    client.tables["attendance"].append({"user_id": 1, "timestamp": marked_at.isoformat()})
+
+    writer.mark("alice")  # accepted before the seed has loaded
+    writer.mark("bob")
+    writer._seed_recent()
+
+    assert [record["name"] for record in writer._pending] == ["bob"]
+    assert writer.stats()["duplicates"] == 1
+    assert not writer.mark("alice")
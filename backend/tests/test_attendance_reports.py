@@ -0,0 +1,52 @@
+# tests/test_attendance_reports.py
+from datetime import date, datetime, timezone
+
+import pytest
+
+from supabase_utils.attendance_reports import parse_date_range
+
+
+def local(utc_value):
+    return utc_value.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None).isoformat()
+
+
+def test_bare_dates_cover_whole_days():
+    assert parse_date_range("2024-03-01") == ("2024-03-01T00:00:00", "2024-03-02T00:00:00")
+    assert parse_date_range("2024-03-01", "2024-03-03") == ("2024-03-01T00:00:00", "2024-03-04T00:00:00")
+    assert parse_date_range(date(2024, 3, 1)) == ("2024-03-01T00:00:00", "2024-03-02T00:00:00")
+
+
+def test_defaults_to_today():
+    today = datetime.now().date()
+    assert parse_date_range() == parse_date_range(today.isoformat())
+
+
+def test_naive_datetimes_are_kept():
+    assert parse_date_range("2024-03-01T08:30:00", "2024-03-01T17:00:00") == (
+        "2024-03-01T08:30:00", "2024-03-01T17:00:00")
+
+
+def test_aware_datetimes_become_naive_local():
+    start, end = parse_date_range("2024-03-01T10:00:00Z", "2024-03-01T12:00:00+00:00")
+    assert start == local(datetime(2024, 3, 1, 10))
+    assert end == local(datetime(2024, 3, 1, 12))
+
+    start, _ = parse_date_range(datetime(2024, 3, 1, 10, tzinfo=timezone.utc), "2024-03-05")
+    assert start == local(datetime(2024, 3, 1, 10))
+
+
+def test_aware_start_with_bare_end_date():
+    start, end = parse_date_range("2024-03-01T10:00:00+00:00", "2024-03-02")
+    assert start == local(datetime(2024, 3, 1, 10))
+    assert end == "2024-03-03T00:00:00"
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2024-03-02", "2024-03-01"),
+    ("2024-03-01T12:00:00", "2024-03-01T12:00:00"),
+    ("yesterday", None),
+    ("2024-13-01", None),
+])
+def test_bad_ranges_raise(start, end):
+    with pytest.raises(ValueError):
+        parse_date_range(start, end)
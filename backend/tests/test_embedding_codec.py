@@ -0,0 +1,44 @@
+# tests/test_embedding_codec.py
+import numpy as np
+import pytest
+import torch
+
+from utils.embedding_codec import decode_embedding, encode_embedding, is_encoded
+
+
+@pytest.fixture
+def embedding():
+    return np.random.default_rng(0).standard_normal(512).astype(np.float32)
+
+
+def test_f32_round_trip_is_exact(embedding):
+    encoded = encode_embedding(embedding, encoding="f32")
+    assert encoded.startswith("v1:f32:")
+    assert is_encoded(encoded, encoding="f32") and not is_encoded(encoded, encoding="f16")
+    np.testing.assert_array_equal(decode_embedding(encoded), embedding)
+
+
+def test_f16_round_trip_is_close(embedding):
+    decoded = decode_embedding(encode_embedding(embedding, encoding="f16"))
+    assert decoded.dtype == np.float32 and decoded.shape == (512,)
+    np.testing.assert_allclose(decoded, embedding, rtol=1e-3, atol=1e-3)
+
+
+def test_json_and_tensor_inputs(embedding):
+    as_list = encode_embedding(embedding, encoding="json")
+    assert isinstance(as_list, list) and is_encoded(as_list, encoding="json")
+    np.testing.assert_array_equal(decode_embedding(as_list), embedding)
+
+    tensor = torch.from_numpy(embedding).reshape(1, -1)
+    np.testing.assert_array_equal(decode_embedding(encode_embedding(tensor, encoding="f32")), embedding)
+
+
+@pytest.mark.parametrize("value", ["not-an-embedding", "v2:f32:AAAA", "v1:f64:AAAA"])
+def test_bad_strings_raise(value):
+    with pytest.raises(ValueError):
+        decode_embedding(value)
+
+
+def test_unknown_encoding_raises(embedding):
+    with pytest.raises(ValueError):
+        encode_embedding(embedding, encoding="f8")
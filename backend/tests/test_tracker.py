@@ -0,0 +1,89 @@
+# tests/test_tracker.py
+from scanner.tracker import FaceTracker
+
+
+def alice(distance=0.2):
+    return {"name": "alice", "distance": distance}
+
+
+def new_track(tracker, box=(0, 0, 100, 100), frame_id=1):
+    [(track, _)] = tracker.update([{"box": box}], frame_id)
+    return track
+
+
+def test_k_of_n_votes_decide_identity():
+    tracker = FaceTracker(votes_required=2, votes_window=3)
+    track = new_track(tracker)
+
+    assert not tracker.vote(track, alice(0.2))
+    assert not tracker.vote(track, None)
+    assert tracker.vote(track, alice(0.4))
+    assert track.identity == "alice"
+    assert abs(track.confidence - 0.7) < 1e-9  # mean of alice's votes only
+    assert not tracker.needs_embedding(track)
+    assert not tracker.vote(track, alice())  # decided once
+
+
+def test_old_votes_leave_the_window():
+    tracker = FaceTracker(votes_required=2, votes_window=2)
+    track = new_track(tracker)
+
+    tracker.vote(track, alice())
+    tracker.vote(track, None)
+    assert not tracker.vote(track, {"name": "bob", "distance": 0.1})  # alice's vote has dropped out
+    assert not track.decided
+
+
+def test_unknown_track_is_rechecked():
+    tracker = FaceTracker(votes_required=2, votes_window=3, recheck_frames=5)
+    track = new_track(tracker)
+
+    tracker.vote(track, None)
+    tracker.vote(track, None)
+    assert track.unknown and not track.decided
+
+    track.last_embedded_frame = 1
+    track.last_frame_id = 4
+    assert not tracker.needs_embedding(track)
+    track.last_frame_id = 6
+    assert tracker.needs_embedding(track)
+
+    assert not tracker.vote(track, alice())
+    assert tracker.vote(track, alice())  # two of the last three
+    assert track.identity == "alice" and not track.unknown
+
+
+def test_unknown_then_recognised_within_window():
+    tracker = FaceTracker(votes_required=2, votes_window=4)
+    track = new_track(tracker)
+
+    tracker.vote(track, None)
+    tracker.vote(track, None)
+    assert track.unknown
+    tracker.vote(track, alice())
+    assert tracker.vote(track, alice())
+    assert not track.unknown
+
+
+def test_update_keeps_track_for_moving_face():
+    tracker = FaceTracker(iou_threshold=0.3, max_misses=1)
+    track = new_track(tracker)
+
+    [(same, _)] = tracker.update([{"box": (10, 5, 100, 100)}], 2)
+    assert same is track and track.hits == 2
+
+    [(fast, _)] = tracker.update([{"box": (40, 0, 100, 100)}], 3)  # low IoU, close centroid
+    assert fast is track
+
+
+def test_update_drops_tracks_missing_too_long():
+    tracker = FaceTracker(max_misses=1)
+    track = new_track(tracker)
+
+    tracker.update([], 2)
+    assert track.id in tracker.tracks and tracker.visible_tracks() == []
+    tracker.update([], 3)
+    assert track.id not in tracker.tracks
+
+    [(other, _)] = tracker.update([{"box": (0, 0, 100, 100)}], 4)
+    assert other.id != track.id
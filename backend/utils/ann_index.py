@@ -0,0 +1,237 @@
+# utils/ann_index.py
+import hashlib
+import os
+import numpy as np
+
+from utils.gallery import DEFAULT_THRESHOLD, GalleryIndex, l2_normalize
+
+
+def ids_fingerprint(ids):
+    """Stable hash of a set of gallery ids, used to tell whether a saved index is still current"""
+    digest = hashlib.sha1()
+    for face_id in sorted(str(i) for i in ids):
+        digest.update(face_id.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def gallery_fingerprint(ids, matrix, chunk_rows=8192):
+    """
+    Stable hash of a gallery's ids and embedding rows (independent of row
+    order), used to tell whether a saved index is still current: the same
+    ids with re-encoded or reseeded embeddings give a different value
+    """
+    keys = np.asarray([str(i) for i in ids])
+    order = np.argsort(keys, kind="stable")
+    digest = hashlib.sha1()
+    for face_id in keys[order]:
+        digest.update(face_id.encode("utf-8"))
+        digest.update(b"\0")
+    for start in range(0, len(order), chunk_rows):
+        digest.update(np.ascontiguousarray(matrix[order[start:start + chunk_rows]], dtype=np.float32))
+    return digest.hexdigest()
+
+
+def spherical_kmeans(data, n_clusters, n_iter=10, sample_size=None, seed=0):
+    """
+    K-means on L2-normalised rows using cosine similarity.
+    Trains on a random sample of at most `sample_size` rows and returns
+    an (n_clusters x D) matrix of unit-length centroids.
+    """
+    rng = np.random.default_rng(seed)
+    if sample_size is not None and len(data) > sample_size:
+        data = data[rng.choice(len(data), sample_size, replace=False)]
+
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = assign_clusters(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        counts = np.bincount(assignment, minlength=n_clusters)
+
+        # Re-seed empty clusters with random points so every list is used
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+def assign_clusters(data, centroids, chunk_size=65536):
+    """Index of the most similar centroid for every row, computed in chunks to bound memory"""
+    assignment = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), chunk_size):
+        block = data[start:start + chunk_size]
+        assignment[start:start + chunk_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+class IVFIndex(GalleryIndex):
+    """
+    Approximate gallery index (inverted file with k-means coarse centroids).
+
+    Embeddings are clustered into `nlist` cells and stored cell by cell, so a
+    query only scans the `nprobe` cells whose centroids are closest to it.
+    Exposes the same search()/match() interface as GalleryIndex.
+    """
+
+    def __init__(self, ids=None, names=None, embeddings=None, dim=512, nlist=None, nprobe=16, n_iter=10):
+        super().__init__(ids, names, embeddings, dim=dim)
+        self.nprobe = nprobe
+
+        n = len(self)
+        if n == 0:
+            self.centroids = np.zeros((0, self.dim), dtype=np.float32)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return
+
+        if nlist is None:
+            nlist = int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+
+        self.centroids = spherical_kmeans(self.matrix, nlist, n_iter=n_iter, sample_size=256 * nlist)
+        assignment = assign_clusters(self.matrix, self.centroids)
+
+        self._layout(self.ids, self.names, self.matrix, assignment)
+
+    def _layout(self, ids, names, matrix, assignment):
+        """Reorder rows so each cell is one contiguous slice of the matrix"""
+        order = np.argsort(assignment, kind="stable")
+        self.matrix = np.ascontiguousarray(matrix[order])
+        self.ids = ids[order]
+        self.names = names[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=self.nlist))))
+
+    @property
+    def nlist(self):
+        return len(self.centroids)
+
+    def extended(self, records):
+        """
+        Return a new index with `records` appended to their nearest existing
+        cells. Centroids are not retrained; build_gallery() retrains on the
+        next full reload.
+        """
+        new = GalleryIndex.from_records(records, dim=self.dim)
+        if len(new) == 0:
+            return self
+        if self.nlist == 0:
+            return IVFIndex(new.ids, new.names, new.matrix, dim=self.dim, nprobe=self.nprobe)
+
+        current = np.repeat(np.arange(self.nlist), np.diff(self.offsets))
+        index = IVFIndex.__new__(IVFIndex)
+        index.dim = self.dim
+        index.nprobe = self.nprobe
+        index.centroids = self.centroids
+        index._layout(
+            np.concatenate([self.ids, new.ids]),
+            np.concatenate([self.names, new.names]),
+            np.concatenate([self.matrix, new.matrix]),
+            np.concatenate([current, assign_clusters(new.matrix, self.centroids)]),
+        )
+        return index
+
+    def search(self, query, k=1):
+        """Approximate top-k search over the `nprobe` closest cells"""
+        if len(self) == 0:
+            return []
+        query = self._prepare_query(query)
+        if query is None:
+            return []
+
+        nprobe = min(self.nprobe, self.nlist)
+        cells = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+
+        # Score each probed cell on a view of the matrix (no gather copy)
+        rows, scores = [], []
+        for cell in cells:
+            start, end = self.offsets[cell], self.offsets[cell + 1]
+            if end > start:
+                rows.append(np.arange(start, end))
+                scores.append(self.matrix[start:end] @ query)
+        if not rows:
+            return []
+        rows = np.concatenate(rows)
+        scores = np.concatenate(scores)
+
+        top = self._top_k(scores, k)
+        return self._results(rows[top], scores[top])
+
+    def match_many(self, queries, threshold=DEFAULT_THRESHOLD):
+        """Per-query approximate match; each query probes its own cells"""
+        return [self.match(query, threshold) for query in queries]
+
+    def save(self, path):
+        """Persist the index (centroids, cell layout, ids, names) to a .npz file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            matrix=self.matrix,
+            centroids=self.centroids,
+            offsets=self.offsets,
+            ids=np.asarray([str(i) for i in self.ids]),
+            id_types=np.asarray([type(i).__name__ for i in self.ids]),
+            names=np.asarray([str(n) for n in self.names]),
+            fingerprint=np.asarray(gallery_fingerprint(self.ids, self.matrix)),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, nprobe=16):
+        """Load an index written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            ids = [int(i) if t == "int" else i for i, t in zip(data["ids"].tolist(), data["id_types"].tolist())]
+            index = cls.__new__(cls)
+            index.dim = data["matrix"].shape[1]
+            index.matrix = data["matrix"]
+            index.ids = np.asarray(ids, dtype=object)
+            index.names = np.asarray(data["names"].tolist(), dtype=object)
+            index.centroids = data["centroids"]
+            index.offsets = data["offsets"]
+            index.nprobe = nprobe
+            index.fingerprint = str(data["fingerprint"])
+        return index
+
+    @classmethod
+    def load_or_build(cls, records, path, nprobe=16, dim=512):
+        """
+        Reuse the index saved at `path` if it was built from the same faces
+        (ids and embeddings), or from a subset of them, in which case newer
+        faces are added to the saved cells; otherwise train a new one from
+        `records` and save it.
+        """
+        exact = GalleryIndex.from_records(records, dim=dim)
+        fingerprint = gallery_fingerprint(exact.ids, exact.matrix)
+
+        if path and os.path.exists(path):
+            try:
+                index = cls.load(path, nprobe=nprobe)
+                if index.fingerprint == fingerprint:
+                    print(f"✅ Loaded IVF index from {path} ({len(index)} faces, {index.nlist} cells)")
+                    return index
+
+                saved_ids = set(index.ids.tolist())
+                rows = [row for row, face_id in enumerate(exact.ids.tolist()) if face_id in saved_ids]
+                if len(rows) == len(saved_ids) and gallery_fingerprint(exact.ids[rows], exact.matrix[rows]) == index.fingerprint:
+                    missing = [r for r in records if r.get("id") not in saved_ids]
+                    index = index.extended(missing)
+                    print(f"✅ Loaded IVF index from {path} and added {len(missing)} new faces")
+                    index.save(path)
+                    return index
+                print("ℹ️ Saved IVF index is out of date, rebuilding")
+            except Exception as e:
+                print(f"⚠️ Could not load IVF index from {path}: {e}")
+
+        # Built from the records (normalised once, like `exact`) so saved rows hash the same
+        index = cls.from_records(records, dim=dim)
+        index.nprobe = nprobe
+        if path:
+            try:
+                index.save(path)
+            except Exception as e:
+                print(f"⚠️ Could not save IVF index to {path}: {e}")
+        return index
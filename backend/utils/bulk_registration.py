@@ -0,0 +1,72 @@
+# utils/bulk_registration.py
+import io
+import os
+import zipfile
+
+from PIL import Image
+
+from config import REGISTER_MAX_ITEMS, REGISTER_MAX_IMAGE_BYTES
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def name_from_path(path):
+    """
+    Person name for an archive entry or upload: the top-level folder if
+    there is one ("Alice Smith/1.jpg"), else the file name without its
+    extension ("Alice_Smith.jpg" -> "Alice Smith").
+    """
+    parts = [part for part in path.replace("\\", "/").split("/") if part]
+    if len(parts) > 1:
+        return parts[0].strip()
+    return os.path.splitext(parts[-1])[0].replace("_", " ").strip() if parts else ""
+
+
+def items_from_zip(data, max_items=REGISTER_MAX_ITEMS):
+    """
+    [(name, filename, image bytes)] for the images in a zip archive, named
+    with name_from_path(); bytes are None for images over
+    REGISTER_MAX_IMAGE_BYTES. Hidden files and non-images are ignored; raises
+    ValueError for a bad archive or one with more than `max_items` images.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid zip archive: {e}")
+
+    entries = [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+        and not any(part.startswith((".", "__MACOSX")) for part in info.filename.split("/"))
+    ]
+    if len(entries) > max_items:
+        raise ValueError(f"Archive has {len(entries)} images, the limit is {max_items}")
+
+    items = []
+    for info in sorted(entries, key=lambda info: info.filename):
+        if info.file_size > REGISTER_MAX_IMAGE_BYTES:
+            items.append((name_from_path(info.filename), info.filename, None))  # reported as too large
+            continue
+        items.append((name_from_path(info.filename), info.filename, archive.read(info)))
+    return items
+
+
+def detect_item(image_data):
+    """Decode one uploaded image (None if it was too large to read) and detect its face; returns (face tensor or None, status)"""
+    if image_data is None:
+        return None, "too_large"
+    if not image_data:
+        return None, "invalid_image"
+    try:
+        image = Image.open(io.BytesIO(image_data))
+        image.load()
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+    except Exception:
+        return None, "invalid_image"
+
+    from detection.detect_faces import detect_face  # loads MTCNN on first use
+
+    face = detect_face(image)
+    return (face, "ok") if face is not None else (None, "no_face")
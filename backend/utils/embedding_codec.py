@@ -0,0 +1,46 @@
+# utils/embedding_codec.py
+import base64
+
+import numpy as np
+
+from config import EMBEDDING_ENCODING
+
+# Stored embeddings are either a legacy JSON list of floats or a string
+#   "v1:<dtype>:<base64 of the little-endian array>"   dtype = f32 | f16
+# which fits in the existing JSONB column as a JSON string.
+FORMAT_VERSION = "v1"
+DTYPES = {"f32": np.dtype("<f4"), "f16": np.dtype("<f2")}
+
+
+def encode_embedding(embedding, encoding=EMBEDDING_ENCODING):
+    """Encode a flat embedding (numpy / tensor / list) for storage"""
+    if encoding == "json":
+        return np.asarray(embedding, dtype=np.float32).reshape(-1).astype(float).tolist()
+    if encoding not in DTYPES:
+        raise ValueError(f"Unknown embedding encoding: {encoding}")
+
+    if hasattr(embedding, "detach"):  # PyTorch tensor
+        embedding = embedding.detach().cpu().numpy()
+    array = np.asarray(embedding, dtype=np.float32).reshape(-1).astype(DTYPES[encoding])
+    return f"{FORMAT_VERSION}:{encoding}:{base64.b64encode(array.tobytes()).decode('ascii')}"
+
+
+def decode_embedding(value):
+    """Decode a stored embedding (encoded string or legacy float list) to a float32 vector"""
+    if isinstance(value, str):
+        try:
+            version, encoding, payload = value.split(":", 2)
+        except ValueError:
+            raise ValueError("Malformed embedding string")
+        if version != FORMAT_VERSION or encoding not in DTYPES:
+            raise ValueError(f"Unsupported embedding format: {version}:{encoding}")
+        return np.frombuffer(base64.b64decode(payload), dtype=DTYPES[encoding]).astype(np.float32)
+
+    return np.asarray(value, dtype=np.float32).reshape(-1)
+
+
+def is_encoded(value, encoding=EMBEDDING_ENCODING):
+    """True if `value` is already stored with `encoding`"""
+    if encoding == "json":
+        return isinstance(value, list)
+    return isinstance(value, str) and value.startswith(f"{FORMAT_VERSION}:{encoding}:")
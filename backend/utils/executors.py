@@ -0,0 +1,27 @@
+# utils/executors.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from config import INFERENCE_WORKERS, IO_WORKERS
+
+# CPU-bound model work (MTCNN, InceptionResnetV1, frame processing). Torch
+# releases the GIL inside its kernels, so threads overlap well and share one
+# copy of the models, unlike a process pool.
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+
+# Blocking Supabase round-trips, kept separate so slow network calls never
+# occupy the inference workers (and vice versa).
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="supabase-io")
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Run a blocking inference call without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def run_io(fn, *args, **kwargs):
+    """Run a blocking database / storage call without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(fn, *args, **kwargs))
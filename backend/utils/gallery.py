@@ -0,0 +1,195 @@
+# utils/gallery.py
+import numpy as np
+
+from config import GALLERY_INDEX, GALLERY_INDEX_PATH, IVF_NPROBE, GALLERY_INT8_RERANK
+from utils.embedding_codec import decode_embedding
+
+DEFAULT_THRESHOLD = 0.6  # cosine distance, same cut-off as utils.similarity.is_similar
+
+
+def to_vector(embedding):
+    """Convert a torch tensor / list / numpy / stored (encoded) embedding to a flat float32 vector"""
+    if hasattr(embedding, "detach"):  # PyTorch tensor
+        embedding = embedding.detach().cpu().numpy()
+    return decode_embedding(embedding)
+
+
+def l2_normalize(matrix):
+    """L2-normalise rows of a 2-D float32 array (zero rows stay zero)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class GalleryIndex:
+    """
+    Exact in-memory face gallery.
+
+    All embeddings live in one L2-normalised float32 matrix (N x D) with
+    parallel `ids` / `names` arrays, so a query is a single matrix-vector
+    product instead of a Python loop over every registered person.
+    """
+
+    def __init__(self, ids=None, names=None, embeddings=None, dim=512):
+        self.dim = dim
+        self.ids = np.asarray(ids if ids is not None else [], dtype=object)
+        self.names = np.asarray(names if names is not None else [], dtype=object)
+        if embeddings is None or len(embeddings) == 0:
+            self.matrix = np.zeros((0, dim), dtype=np.float32)
+        else:
+            self.matrix = l2_normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(self.ids), -1))
+            self.dim = self.matrix.shape[1]
+
+    @classmethod
+    def from_records(cls, records, dim=512):
+        """
+        Build an index from rows returned by supabase_client.get_embeddings()
+        (dicts with 'id', 'name' and 'embedding'). Rows without a usable
+        embedding are skipped.
+        """
+        ids, names, embeddings = [], [], []
+        for record in records or []:
+            embedding = record.get("embedding")
+            if embedding is None:
+                continue
+            try:
+                vector = to_vector(embedding)
+            except ValueError as e:
+                print(f"⚠️ Skipping face {record.get('id')} ({record.get('name')}): {e}")
+                continue
+            if vector.size != dim or not np.any(vector):
+                print(f"⚠️ Skipping face {record.get('id')} ({record.get('name')}): invalid embedding")
+                continue
+            ids.append(record.get("id"))
+            names.append(record.get("name", "Unknown"))
+            embeddings.append(vector)
+        return cls(ids, names, np.stack(embeddings) if embeddings else None, dim=dim)
+
+    @classmethod
+    def _from_arrays(cls, ids, names, matrix):
+        """Wrap already L2-normalised arrays without copying or re-normalising"""
+        index = cls.__new__(cls)
+        index.dim = matrix.shape[1]
+        index.ids = ids
+        index.names = names
+        index.matrix = matrix
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def extended(self, records):
+        """
+        Return a new index with the faces in `records` appended. The current
+        index is left untouched, so readers holding it are never disturbed.
+        """
+        new = GalleryIndex.from_records(records, dim=self.dim)
+        if len(new) == 0:
+            return self
+        return GalleryIndex._from_arrays(
+            np.concatenate([self.ids, new.ids]),
+            np.concatenate([self.names, new.names]),
+            np.concatenate([self.matrix, new.matrix]),
+        )
+
+    def search(self, query, k=1):
+        """
+        Return the k closest gallery entries to `query`, best first, as a list
+        of dicts with 'id', 'name' and 'distance' (cosine distance).
+        """
+        if len(self) == 0:
+            return []
+        query = self._prepare_query(query)
+        if query is None:
+            return []
+
+        similarities = self.matrix @ query
+        top = self._top_k(similarities, k)
+        return self._results(top, similarities[top])
+
+    def _prepare_query(self, query):
+        """Flatten and L2-normalise a query, or None if it cannot be matched"""
+        query = to_vector(query)
+        if query.size != self.dim or not np.any(query):
+            return None
+        return query / np.linalg.norm(query)
+
+    @staticmethod
+    def _top_k(scores, k):
+        """Positions of the k highest scores, best first"""
+        k = min(k, len(scores))
+        if k == 1:
+            return np.array([int(np.argmax(scores))])
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def _results(self, rows, similarities):
+        return [
+            {
+                "id": self.ids[row],
+                "name": self.names[row],
+                "distance": max(0.0, float(1.0 - similarity)),
+            }
+            for row, similarity in zip(rows, similarities)
+        ]
+
+    def match(self, query, threshold=DEFAULT_THRESHOLD):
+        """Return the closest entry if it is within `threshold`, else None"""
+        results = self.search(query, k=1)
+        if results and results[0]["distance"] < threshold:
+            return results[0]
+        return None
+
+    def match_many(self, queries, threshold=DEFAULT_THRESHOLD):
+        """
+        match() for several queries at once (e.g. every face in a frame),
+        answered with a single matrix-matrix product. Returns one entry or
+        None per query, in order.
+        """
+        queries = [to_vector(query) for query in queries]
+        if len(self) == 0 or not queries:
+            return [None] * len(queries)
+
+        valid = [i for i, q in enumerate(queries) if q.size == self.dim and np.any(q)]
+        results = [None] * len(queries)
+        if not valid:
+            return results
+
+        similarities = l2_normalize(np.stack([queries[i] for i in valid])) @ self.matrix.T
+        best = np.argmax(similarities, axis=1)
+        for i, row, similarity in zip(valid, best, similarities[np.arange(len(valid)), best]):
+            result = self._results([row], [similarity])[0]
+            if result["distance"] < threshold:
+                results[i] = result
+        return results
+
+
+def build_gallery(records, backend=None):
+    """
+    Build the gallery index configured by GALLERY_INDEX ("exact", "ivf" or
+    "int8"). The IVF index is persisted at GALLERY_INDEX_PATH and reused
+    across restarts as long as the set of registered faces has not changed.
+    """
+    backend = (backend or GALLERY_INDEX).lower()
+    if backend == "ivf":
+        from utils.ann_index import IVFIndex
+        return IVFIndex.load_or_build(records, GALLERY_INDEX_PATH, nprobe=IVF_NPROBE)
+    if backend == "int8":
+        from utils.quantized_index import QuantizedIndex
+        return QuantizedIndex.from_index(GalleryIndex.from_records(records), rerank=GALLERY_INT8_RERANK)
+    if backend != "exact":
+        print(f"⚠️ Unknown GALLERY_INDEX '{backend}', using exact search")
+    return GalleryIndex.from_records(records)
+
+
+def wrap_gallery(index, backend=None):
+    """
+    Adapt an exact index that was loaded rather than built (e.g. a local
+    snapshot) to GALLERY_INDEX, where that needs no training: "int8" is
+    quantised in place, "ivf" waits for the next build_gallery().
+    """
+    if (backend or GALLERY_INDEX).lower() == "int8":
+        from utils.quantized_index import QuantizedIndex
+        return QuantizedIndex.from_index(index, rerank=GALLERY_INT8_RERANK)
+    return index
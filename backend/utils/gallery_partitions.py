@@ -0,0 +1,186 @@
+# utils/gallery_partitions.py
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from config import SCHEDULE_PATH, SCHEDULE_FALLBACK_THRESHOLD
+from utils.gallery import DEFAULT_THRESHOLD, GalleryIndex
+
+DAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def _minutes(hhmm):
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class Timetable:
+    """
+    Gallery partitions (course / section / room rosters) and the sessions
+    that activate them, loaded from a JSON file (see schedule.example.json):
+
+        {
+          "partitions": {"COL106-A": ["Alice", "Bob", 42], ...},   # names or face ids
+          "sessions": [
+            {"camera_id": "lh121_cam1", "partition": "COL106-A",
+             "days": ["mon", "wed", "thu"], "start": "09:30", "end": "11:00"}
+          ]
+        }
+    """
+
+    def __init__(self, partitions=None, sessions=None):
+        self.partitions = {name: list(members) for name, members in (partitions or {}).items()}
+        self.sessions = []
+        for session in sessions or []:
+            if session.get("partition") not in self.partitions:
+                print(f"⚠️ Session {session} refers to an unknown partition, ignoring it")
+                continue
+            days = [day.lower()[:3] for day in session.get("days", DAYS)]
+            self.sessions.append({
+                "camera_id": session.get("camera_id"),
+                "partition": session["partition"],
+                "days": set(days),
+                "start": _minutes(session.get("start", "00:00")),
+                "end": _minutes(session.get("end", "24:00")),
+            })
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data.get("partitions"), data.get("sessions"))
+
+    def active_partitions(self, camera_id, when=None):
+        """Names of the partitions scheduled for `camera_id` at `when` (default now)"""
+        when = when or datetime.now()
+        day = DAYS[when.weekday()]
+        minute = when.hour * 60 + when.minute
+        return sorted({
+            session["partition"]
+            for session in self.sessions
+            if session["camera_id"] in (camera_id, None, "*")
+            and day in session["days"]
+            and session["start"] <= minute < session["end"]
+        })
+
+
+class PartitionRouter:
+    """
+    Schedule-aware matching. Queries are first matched against the faces
+    enrolled in the partitions active for the camera right now; only those
+    with no match there fall back to the full gallery (optionally with a
+    stricter SCHEDULE_FALLBACK_THRESHOLD). Partition sub-indexes are built
+    on demand and cached per gallery index, and the timetable file is
+    re-read when it changes on disk.
+    """
+
+    def __init__(self, path=SCHEDULE_PATH, fallback_threshold=SCHEDULE_FALLBACK_THRESHOLD):
+        self.path = path
+        self.fallback_threshold = fallback_threshold
+        self.timetable = Timetable()
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._subsets = {}  # (id(gallery), partitions) -> GalleryIndex
+        self._gallery = None
+
+        self.partition_hits = 0
+        self.fallback_hits = 0
+        self.misses = 0
+
+    def _reload(self):
+        try:
+            mtime = os.path.getmtime(self.path) if self.path else None
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                self.timetable = Timetable.load(self.path) if mtime is not None else Timetable()
+                if mtime is not None:
+                    print(f"✅ Timetable loaded: {len(self.timetable.partitions)} partitions, "
+                          f"{len(self.timetable.sessions)} sessions")
+            except Exception as e:
+                print(f"❌ Could not load timetable {self.path}: {e}")
+                self.timetable = Timetable()
+            self._mtime = mtime
+            self._subsets = {}
+
+    def subset(self, gallery, partitions):
+        """Sub-index of `gallery` holding the members of `partitions` (cached)"""
+        with self._lock:
+            if gallery is not self._gallery:  # new gallery version: drop stale subsets
+                self._gallery = gallery
+                self._subsets = {}
+            key = tuple(partitions)
+            index = self._subsets.get(key)
+            if index is not None:
+                return index
+
+            members = set()
+            for partition in partitions:
+                members.update(self.timetable.partitions.get(partition, []))
+            rows = np.array([
+                i for i, (face_id, name) in enumerate(zip(gallery.ids, gallery.names))
+                if face_id in members or name in members
+            ], dtype=np.int64)
+            index = GalleryIndex._from_arrays(gallery.ids[rows], gallery.names[rows], np.asarray(gallery.matrix[rows]))
+            self._subsets[key] = index
+            return index
+
+    def active_partitions(self, camera_id, when=None):
+        self._reload()
+        return self.timetable.active_partitions(camera_id, when)
+
+    def match_many(self, gallery, queries, camera_id, when=None, threshold=DEFAULT_THRESHOLD):
+        """
+        gallery.match_many() restricted to the active partitions first. Each
+        result gains a 'partition' key: the partition names it matched in,
+        or None if it came from the full-gallery fallback.
+        """
+        queries = list(queries)
+        partitions = self.active_partitions(camera_id, when)
+        results = [None] * len(queries)
+        pending = list(range(len(queries)))
+
+        if partitions:
+            subset = self.subset(gallery, partitions)
+            if len(subset):
+                for i, match in enumerate(subset.match_many(queries, threshold)):
+                    if match is not None:
+                        match["partition"] = ",".join(partitions)
+                        results[i] = match
+                        self.partition_hits += 1
+                pending = [i for i in pending if results[i] is None]
+
+        if pending:
+            fallback_threshold = self.fallback_threshold if partitions and self.fallback_threshold else threshold
+            for i, match in zip(pending, gallery.match_many([queries[i] for i in pending], fallback_threshold)):
+                if match is not None:
+                    match["partition"] = None
+                    results[i] = match
+                    self.fallback_hits += 1
+                else:
+                    self.misses += 1
+        return results
+
+    def match(self, gallery, query, camera_id, when=None, threshold=DEFAULT_THRESHOLD):
+        return self.match_many(gallery, [query], camera_id, when, threshold)[0]
+
+    def stats(self):
+        return {
+            "partitions": len(self.timetable.partitions),
+            "sessions": len(self.timetable.sessions),
+            "partition_hits": self.partition_hits,
+            "fallback_hits": self.fallback_hits,
+            "misses": self.misses,
+        }
+
+
+partition_router = PartitionRouter()
@@ -0,0 +1,107 @@
+# utils/gallery_snapshot.py
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+from utils.ann_index import ids_fingerprint
+from utils.gallery import GalleryIndex
+
+SNAPSHOT_FORMAT = 1
+META_FILE = "gallery_snapshot.json"
+
+_save_lock = threading.Lock()
+
+
+def save_snapshot(index, directory, watermark=None, min_age_to_delete=60.0):
+    """
+    Write `index` as <directory>/gallery-<stamp>.npy (the L2-normalised
+    float32 matrix) plus gallery_snapshot.json (ids, names, version stamp).
+    The JSON file is replaced last and atomically, so readers always see a
+    complete snapshot; older .npy files are removed once they are no longer
+    referenced (processes that still have them mapped keep working).
+    Saves within a process are serialised and every temporary file has a
+    unique name, so concurrent writers never share one.
+    """
+    with _save_lock:
+        return _save(index, directory, watermark, min_age_to_delete)
+
+
+def _save(index, directory, watermark, min_age_to_delete):
+    os.makedirs(directory, exist_ok=True)
+    ids = index.ids.tolist()
+    stamp = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    matrix_file = f"gallery-{stamp}.npy"
+
+    fd, tmp_matrix = tempfile.mkstemp(prefix=f".{matrix_file}.", suffix=".tmp", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, np.ascontiguousarray(index.matrix, dtype=np.float32))
+    os.replace(tmp_matrix, os.path.join(directory, matrix_file))
+
+    meta = {
+        "format": SNAPSHOT_FORMAT,
+        "version": stamp,
+        "matrix_file": matrix_file,
+        "count": len(ids),
+        "dim": int(index.dim),
+        "watermark": watermark,
+        "fingerprint": ids_fingerprint(ids),
+        "saved_at": datetime.now().isoformat(),
+        "ids": ids,
+        "names": index.names.tolist(),
+    }
+    fd, tmp_meta = tempfile.mkstemp(prefix=f".{META_FILE}.", suffix=".tmp", dir=directory)
+    with os.fdopen(fd, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, os.path.join(directory, META_FILE))
+
+    _remove_stale(directory, matrix_file, min_age_to_delete)
+    return meta
+
+
+def load_snapshot(directory):
+    """
+    Load the latest snapshot as a GalleryIndex whose matrix is a read-only
+    np.memmap, so start-up costs a JSON parse and processes on the same box
+    share the matrix pages through the OS page cache. Returns (index, meta),
+    or (None, None) if there is no usable snapshot.
+    """
+    meta_path = os.path.join(directory, META_FILE)
+    if not os.path.exists(meta_path):
+        return None, None
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("format") != SNAPSHOT_FORMAT:
+        print(f"⚠️ Ignoring gallery snapshot with format {meta.get('format')}")
+        return None, None
+
+    matrix = np.load(os.path.join(directory, meta["matrix_file"]), mmap_mode="r")
+    if matrix.shape != (meta["count"], meta["dim"]):
+        raise ValueError(f"Snapshot matrix shape {matrix.shape} does not match its metadata")
+
+    index = GalleryIndex._from_arrays(
+        np.asarray(meta["ids"], dtype=object),
+        np.asarray(meta["names"], dtype=object),
+        matrix,
+    )
+    return index, meta
+
+
+def _remove_stale(directory, keep, min_age):
+    now = time.time()
+    for path in glob.glob(os.path.join(directory, "gallery-*.npy")):
+        if os.path.basename(path) == keep:
+            continue
+        try:
+            # Leave fresh files alone: another process may be about to publish one
+            if now - os.path.getmtime(path) > min_age:
+                os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,181 @@
+# utils/model_weights.py
+"""
+Local, verified model weights.
+
+The InceptionResnetV1 (vggface2) and MTCNN (pnet/rnet/onet) state dicts
+are kept in MODEL_WEIGHTS_DIR next to a manifest.json of their SHA-256
+digests. Files are loaded memory-mapped and assigned to the model without
+a copy, and checked against the manifest first. Nothing is fetched from
+the internet at start-up unless the directory is empty and
+MODEL_WEIGHTS_OFFLINE is off.
+
+Populate the directory once on a connected machine (then copy it to the
+air-gapped ones) with:
+    python -m utils.model_weights prefetch [--dir data/models]
+and check a copy with:
+    python -m utils.model_weights verify [--dir data/models]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import torch
+from facenet_pytorch import MTCNN, InceptionResnetV1
+
+from config import MODEL_WEIGHTS_DIR, MODEL_WEIGHTS_OFFLINE, MODEL_WEIGHTS_VERIFY
+
+MANIFEST = "manifest.json"
+RESNET_FILE = "inception_resnet_v1-vggface2.pt"
+MTCNN_NETS = ("pnet", "rnet", "onet")
+
+
+class WeightsError(RuntimeError):
+    """Weights missing (offline) or failing verification"""
+
+
+def sha256_file(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(directory=MODEL_WEIGHTS_DIR):
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def verify_file(directory, filename, manifest=None):
+    """Raise WeightsError unless `filename` matches its manifest entry"""
+    manifest = read_manifest(directory) if manifest is None else manifest
+    entry = manifest.get(filename)
+    if entry is None:
+        raise WeightsError(f"{filename} is not listed in {os.path.join(directory, MANIFEST)}")
+    path = os.path.join(directory, filename)
+    if os.path.getsize(path) != entry["size"] or sha256_file(path) != entry["sha256"]:
+        raise WeightsError(f"{path} does not match its checksum; re-run prefetch or copy it again")
+
+
+def load_state_dict(path):
+    """Memory-mapped, weights-only torch.load (plain load on older torch)"""
+    try:
+        return torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    except TypeError:  # torch < 2.1
+        return torch.load(path, map_location="cpu")
+
+
+def _load_into(model, path):
+    state_dict = load_state_dict(path)
+    try:
+        model.load_state_dict(state_dict, assign=True)  # use the mapped tensors, no copy
+    except TypeError:  # torch < 2.1
+        model.load_state_dict(state_dict)
+    return model
+
+
+def _local_file(directory, filename, verify):
+    path = os.path.join(directory, filename)
+    if not os.path.exists(path):
+        return None
+    if verify:
+        verify_file(directory, filename)
+    return path
+
+
+def load_resnet(directory=MODEL_WEIGHTS_DIR, offline=MODEL_WEIGHTS_OFFLINE, verify=MODEL_WEIGHTS_VERIFY):
+    """Eval-mode InceptionResnetV1 with vggface2 weights, from `directory` when available"""
+    path = _local_file(directory, RESNET_FILE, verify)
+    if path is not None:
+        try:
+            with torch.device("meta"):  # skip random init; every tensor comes from the file
+                model = InceptionResnetV1()
+            return _load_into(model, path).eval()
+        except (AttributeError, TypeError, NotImplementedError):  # torch < 2.1
+            return _load_into(InceptionResnetV1(), path).eval()
+    if offline:
+        raise WeightsError(f"{os.path.join(directory, RESNET_FILE)} not found and MODEL_WEIGHTS_OFFLINE is set; "
+                           f"run 'python -m utils.model_weights prefetch' on a connected machine")
+    print(f"⚠️ {RESNET_FILE} not in {directory}, downloading (run 'python -m utils.model_weights prefetch' to cache it)")
+    return InceptionResnetV1(pretrained="vggface2").eval()
+
+
+def load_mtcnn(directory=MODEL_WEIGHTS_DIR, verify=MODEL_WEIGHTS_VERIFY, **kwargs):
+    """MTCNN(**kwargs) with P/R/O-net weights from `directory`, else the copies bundled with facenet_pytorch"""
+    mtcnn = MTCNN(**kwargs)  # starts from the bundled weights (small, never downloaded)
+    paths = {net: _local_file(directory, f"mtcnn-{net}.pt", verify) for net in MTCNN_NETS}
+    if all(path is not None for path in paths.values()):
+        for net, path in paths.items():
+            getattr(mtcnn, net).load_state_dict(load_state_dict(path))
+    return mtcnn.eval()
+
+
+def _save(state_dict, directory, filename, manifest):
+    path = os.path.join(directory, filename)
+    tmp = path + ".tmp"
+    torch.save(state_dict, tmp)  # zip format, so it can be memory-mapped
+    os.replace(tmp, path)
+    manifest[filename] = {"sha256": sha256_file(path), "size": os.path.getsize(path)}
+    print(f"✅ {filename} ({manifest[filename]['size'] / 1e6:.1f} MB)")
+
+
+def prefetch(directory=MODEL_WEIGHTS_DIR):
+    """Download / copy all weights into `directory` and write the manifest"""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {}
+
+    resnet = InceptionResnetV1(pretrained="vggface2")  # downloads into the torch hub cache
+    # The classifier head (8631 vggface2 identities) is never used for embeddings
+    state_dict = {k: v for k, v in resnet.state_dict().items() if not k.startswith("logits.")}
+    _save(state_dict, directory, RESNET_FILE, manifest)
+
+    mtcnn = MTCNN()
+    for net in MTCNN_NETS:
+        _save(getattr(mtcnn, net).state_dict(), directory, f"mtcnn-{net}.pt", manifest)
+
+    tmp = os.path.join(directory, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+    print(f"📦 Model weights cached in {directory}")
+
+
+def verify(directory=MODEL_WEIGHTS_DIR):
+    """Check every file in the manifest; returns True if all match"""
+    manifest = read_manifest(directory)
+    if not manifest:
+        print(f"❌ No {MANIFEST} in {directory}")
+        return False
+    ok = True
+    for filename in manifest:
+        try:
+            verify_file(directory, filename, manifest)
+            print(f"✅ {filename}")
+        except (WeightsError, OSError) as e:
+            print(f"❌ {e}")
+            ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the local model weights cache")
+    parser.add_argument("command", choices=["prefetch", "verify", "clear"])
+    parser.add_argument("--dir", default=MODEL_WEIGHTS_DIR)
+    args = parser.parse_args()
+
+    if args.command == "prefetch":
+        prefetch(args.dir)
+        raise SystemExit(0 if verify(args.dir) else 1)
+    if args.command == "verify":
+        raise SystemExit(0 if verify(args.dir) else 1)
+    shutil.rmtree(args.dir, ignore_errors=True)
+    print(f"🗑️ Removed {args.dir}")
+
+
+if __name__ == "__main__":
+    main()
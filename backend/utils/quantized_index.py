@@ -0,0 +1,203 @@
+# utils/quantized_index.py
+import glob
+import os
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+
+from config import GALLERY_INT8_RERANK_DIR
+from utils.gallery import DEFAULT_THRESHOLD, GalleryIndex, l2_normalize, to_vector
+
+
+def quantize(matrix, scale=None):
+    """
+    Symmetric int8 quantisation with one scale per dimension
+    (scale = max |value| / 127). Returns (codes, scale); pass `scale` to
+    quantise new rows consistently with an existing index (values are clipped).
+    """
+    if scale is None:
+        scale = np.abs(matrix).max(axis=0) / 127.0 if len(matrix) else np.ones(matrix.shape[1])
+        scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def _remove_file(file, path, owner):
+    file.close()
+    if os.getpid() == owner:  # forked serve.py workers inherit the object, not the file
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _remove_orphans(directory):
+    """Delete re-rank files left behind by processes that no longer exist"""
+    for path in glob.glob(os.path.join(directory, "rerank-*-*.f32")):
+        try:
+            os.kill(int(os.path.basename(path).split("-")[1]), 0)
+        except ProcessLookupError:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        except (ValueError, OSError):
+            pass
+
+
+class RerankRows:
+    """
+    Append-only float32 file holding the re-rank rows of QuantizedIndexes.
+
+    Rows are only ever appended, so each index maps its own prefix of the
+    file and a delta (extended()) appends to it without copying or
+    disturbing older indexes. The pages live in the OS page cache rather
+    than the process heap. The file is deleted once no index uses it.
+    """
+
+    write_rows = 8192  # rows converted and written at a time
+
+    def __init__(self, dim, directory=GALLERY_INT8_RERANK_DIR):
+        os.makedirs(directory, exist_ok=True)
+        _remove_orphans(directory)
+        fd, self.path = tempfile.mkstemp(prefix=f"rerank-{os.getpid()}-", suffix=".f32", dir=directory)
+        self._file = os.fdopen(fd, "wb")
+        self._lock = threading.Lock()
+        self.dim = dim
+        self.rows = 0
+        weakref.finalize(self, _remove_file, self._file, self.path, os.getpid())
+
+    def append(self, matrix):
+        """Append rows (any array-like, e.g. another memmap) and return a read-only memmap of the whole file"""
+        with self._lock:
+            for start in range(0, len(matrix), self.write_rows):
+                np.ascontiguousarray(matrix[start:start + self.write_rows], dtype=np.float32).tofile(self._file)
+            self._file.flush()
+            self.rows += len(matrix)
+            if self.rows == 0:
+                return np.zeros((0, self.dim), dtype=np.float32)
+            return np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+
+
+class QuantizedIndex(GalleryIndex):
+    """
+    Exact-search gallery that scans int8 codes instead of float32.
+
+    Each embedding is stored as int8 with a per-dimension scale (4x smaller
+    than float32). A query is scored against all codes, and the best
+    `rerank` candidates are re-scored with their float32 embeddings, so
+    search()/match() return the same ids, distances and threshold decisions
+    as GalleryIndex unless the true best match falls outside the shortlist.
+
+    The float32 `matrix` is only read for those shortlist rows, so it is
+    never kept on the heap: it is a read-only memmap of either the snapshot
+    the index was loaded from or a RerankRows file, and the process holds
+    only the codes (plus whichever matrix pages the page cache keeps).
+    """
+
+    block_rows = 512  # codes are widened to float32 a cache-sized block at a time
+
+    def __init__(self, ids=None, names=None, embeddings=None, dim=512, rerank=32):
+        super().__init__(ids, names, embeddings, dim=dim)
+        self.rerank = rerank
+        self.codes, self.scale = quantize(self.matrix)
+        self._rows = RerankRows(self.dim)
+        self.matrix = self._rows.append(self.matrix)
+
+    @classmethod
+    def from_index(cls, index, rerank=32):
+        """
+        Quantise an existing GalleryIndex, sharing its ids/names. A
+        memory-mapped matrix (a snapshot) is used in place; an in-memory one
+        is written to a RerankRows file and released.
+        """
+        quantized = cls._from_arrays(index.ids, index.names, index.matrix)
+        quantized.rerank = rerank
+        quantized.codes, quantized.scale = quantize(np.asarray(index.matrix))
+        quantized._rows = None
+        if not isinstance(index.matrix, np.memmap):
+            quantized._rows = RerankRows(quantized.dim)
+            quantized.matrix = quantized._rows.append(index.matrix)
+        return quantized
+
+    def extended(self, records):
+        """New index with `records` appended, quantised with the current scales"""
+        new = GalleryIndex.from_records(records, dim=self.dim)
+        if len(new) == 0:
+            return self
+        if len(self) == 0:
+            return QuantizedIndex.from_index(new, rerank=self.rerank)
+
+        rows = getattr(self, "_rows", None)
+        if rows is None or rows.rows != len(self):
+            # First delta on a snapshot (or on an older generation): start a
+            # file with a disk-to-disk copy of the current rows
+            rows = RerankRows(self.dim)
+            rows.append(self.matrix)
+
+        index = QuantizedIndex._from_arrays(
+            np.concatenate([self.ids, new.ids]),
+            np.concatenate([self.names, new.names]),
+            rows.append(new.matrix),
+        )
+        index._rows = rows
+        index.rerank = self.rerank
+        index.scale = self.scale
+        index.codes = np.concatenate([self.codes, quantize(new.matrix, self.scale)[0]])
+        return index
+
+    def approximate_scores(self, queries):
+        """(M x N) approximate cosine similarities of L2-normalised queries from the int8 codes"""
+        scaled = np.ascontiguousarray(queries * self.scale, dtype=np.float32)
+        scores = np.empty((len(self), len(queries)), dtype=np.float32)  # gallery-major so blocks are contiguous
+        block = np.empty((min(self.block_rows, len(self)), self.dim), dtype=np.float32)
+        for start in range(0, len(self), self.block_rows):
+            rows = min(self.block_rows, len(self) - start)
+            np.copyto(block[:rows], self.codes[start:start + rows], casting="unsafe")
+            np.dot(block[:rows], scaled.T, out=scores[start:start + rows])
+        return scores.T
+
+    def _rerank(self, query, approximate, k):
+        """Exact float32 scores for the best `rerank` approximate candidates; returns (rows, scores)"""
+        rows = np.sort(self._top_k(approximate, max(k, self.rerank)))  # sorted: sequential reads of a memmap
+        exact = np.asarray(self.matrix[rows]) @ query
+        top = self._top_k(exact, k)
+        return rows[top], exact[top]
+
+    def search(self, query, k=1):
+        if len(self) == 0:
+            return []
+        query = self._prepare_query(query)
+        if query is None:
+            return []
+
+        rows, scores = self._rerank(query, self.approximate_scores(query[None, :])[0], k)
+        return self._results(rows, scores)
+
+    def match_many(self, queries, threshold=DEFAULT_THRESHOLD):
+        """Batch match(): one int8 scan for all queries, then a float32 re-rank per query"""
+        queries = [to_vector(query) for query in queries]
+        results = [None] * len(queries)
+        valid = [i for i, q in enumerate(queries) if q.size == self.dim and np.any(q)]
+        if len(self) == 0 or not valid:
+            return results
+
+        normalized = l2_normalize(np.stack([queries[i] for i in valid]))
+        approximate = self.approximate_scores(normalized)
+        for i, query, scores in zip(valid, normalized, approximate):
+            rows, similarities = self._rerank(query, scores, 1)
+            result = self._results(rows, similarities)[0]
+            if result["distance"] < threshold:
+                results[i] = result
+        return results
+
+    def memory_bytes(self):
+        """
+        Heap bytes held for search: codes, scales and the float32 matrix
+        unless it is memory-mapped (then its pages are page cache, shared
+        with other processes and evictable, and only the shortlist is read)
+        """
+        matrix = 0 if isinstance(self.matrix, np.memmap) else self.matrix.nbytes
+        return self.codes.nbytes + self.scale.nbytes + matrix
@@ -0,0 +1,227 @@
+# utils/shared_gallery.py
+import collections
+import json
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from utils.gallery import GalleryIndex
+
+CONTROL_SIZE = 256  # generation (u64), refresh requested (u64), current block name
+NAME_OFFSET = 16
+ALIGN = 64
+
+
+def _attach(name):
+    """
+    Attach to an existing block. Readers are forked from the publisher and
+    share its resource tracker, which only unlinks leftovers once every
+    process has exited; the publisher unlinks blocks itself.
+    """
+    return shared_memory.SharedMemory(name=name)
+
+
+def _arrays(index):
+    """
+    Arrays to publish for `index`: the float32 matrix, plus int8 codes/scales
+    for a QuantizedIndex or the centroids / cell offsets for an IVFIndex. A
+    QuantizedIndex whose matrix is memory-mapped publishes only the codes;
+    workers map the same file (see _matrix_file).
+    """
+    arrays = {}
+    if _matrix_file(index) is None:
+        arrays["matrix"] = np.ascontiguousarray(index.matrix, dtype=np.float32)
+    if hasattr(index, "codes"):
+        arrays["codes"] = np.ascontiguousarray(index.codes)
+        arrays["scale"] = np.ascontiguousarray(index.scale)
+    if hasattr(index, "centroids"):
+        arrays["centroids"] = np.ascontiguousarray(index.centroids, dtype=np.float32)
+        arrays["offsets"] = np.ascontiguousarray(index.offsets, dtype=np.int64)
+    return arrays
+
+
+def _matrix_file(index):
+    """Where a QuantizedIndex's float32 re-rank rows live on disk, or None to copy them to shared memory"""
+    matrix = index.matrix
+    if not hasattr(index, "codes") or not isinstance(matrix, np.memmap) or not matrix.filename:
+        return None
+    return {"path": matrix.filename, "offset": int(matrix.offset), "rows": len(matrix)}
+
+
+class SharedGalleryPublisher:
+    """
+    Refresher side of a gallery shared between processes.
+
+    Each publish() copies the index into a new shared memory block (a JSON
+    header with ids / names, then the aligned arrays) and bumps the
+    generation number in a small control block. Readers attach to the new
+    block on their next get(); old blocks are unlinked once `keep` newer
+    ones exist and they are older than `min_age` seconds (readers that
+    still map them keep working).
+    """
+
+    def __init__(self, prefix=None, keep=2, min_age=60.0):
+        self.prefix = prefix or f"facegal-{os.getpid()}"
+        self.keep = keep
+        self.min_age = min_age
+        self.control = shared_memory.SharedMemory(name=f"{self.prefix}-ctl", create=True, size=CONTROL_SIZE)
+        self._header = np.ndarray((2,), dtype=np.uint64, buffer=self.control.buf)
+        self._header[:] = 0
+        self._blocks = collections.deque()  # (shared memory, published at)
+
+    @property
+    def name(self):
+        """Control block name to hand to SharedGalleryReader"""
+        return self.control.name
+
+    def publish(self, index, watermark=None):
+        generation = int(self._header[0]) + 1
+        arrays = _arrays(index)
+
+        layout, offset = {}, 0
+        for key, array in arrays.items():
+            layout[key] = {"offset": offset, "shape": list(array.shape), "dtype": array.dtype.str}
+            offset += -(-array.nbytes // ALIGN) * ALIGN
+        header = json.dumps({
+            "generation": generation,
+            "dim": int(index.dim),
+            "watermark": watermark,
+            "rerank": getattr(index, "rerank", None),
+            "nprobe": getattr(index, "nprobe", None),
+            "matrix_file": _matrix_file(index),
+            "ids": index.ids.tolist(),
+            "names": index.names.tolist(),
+            "arrays": layout,
+        }).encode()
+        data_start = -(-(8 + len(header)) // ALIGN) * ALIGN
+
+        shm = shared_memory.SharedMemory(name=f"{self.prefix}-{generation}", create=True, size=max(data_start + offset, 1))
+        shm.buf[:8] = len(header).to_bytes(8, "little")
+        shm.buf[8:8 + len(header)] = header
+        for key, array in arrays.items():
+            spec = layout[key]
+            target = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf, offset=data_start + spec["offset"])
+            target[...] = array
+            del target
+
+        # Name first, then generation: a reader that sees the new generation sees its block
+        name = shm.name.encode()
+        self.control.buf[NAME_OFFSET:NAME_OFFSET + len(name) + 1] = name + b"\0"
+        self._header[0] = generation
+        self._blocks.append((shm, time.monotonic()))
+        self._unlink_old()
+        print(f"📤 Gallery generation {generation} shared: {len(index)} faces ({shm.size / 1e6:.1f} MB)")
+        return generation
+
+    def refresh_requested(self):
+        """True (once) if a reader asked for a refresh since the last call"""
+        if self._header[1]:
+            self._header[1] = 0
+            return True
+        return False
+
+    def _unlink_old(self):
+        now = time.monotonic()
+        while len(self._blocks) > self.keep + 1 and now - self._blocks[0][1] > self.min_age:
+            shm, _ = self._blocks.popleft()
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        """Unlink every block (call when the server shuts down)"""
+        while self._blocks:
+            shm, _ = self._blocks.popleft()
+            shm.close()
+            shm.unlink()
+        del self._header
+        self.control.close()
+        self.control.unlink()
+
+
+class SharedGalleryReader:
+    """
+    Worker side: get() returns a GalleryIndex (or QuantizedIndex / IVFIndex) whose
+    arrays live in the publisher's shared memory block, re-attaching only
+    when the generation changes. No per-worker copy of the matrix is made.
+    """
+
+    def __init__(self, control_name):
+        self.control = _attach(control_name)
+        self._header = np.ndarray((2,), dtype=np.uint64, buffer=self.control.buf)
+        self._generation = None
+        self._index = None
+        self._blocks = []  # attached blocks; closed once no index uses them
+
+    @property
+    def generation(self):
+        return int(self._header[0])
+
+    def request_refresh(self):
+        """Ask the refresher process to sync with the database soon"""
+        self._header[1] = 1
+
+    def get(self):
+        generation = self.generation
+        if generation != self._generation or self._index is None:
+            if generation == 0:
+                raise RuntimeError("Shared gallery has not been published yet")
+            self._index = self._load()
+            self._release_old()
+        return self._index
+
+    def _load(self):
+        while True:
+            generation = self.generation
+            raw = bytes(self.control.buf[NAME_OFFSET:CONTROL_SIZE])
+            name = raw[:raw.index(b"\0")].decode()
+            if self.generation == generation:
+                break
+
+        shm = _attach(name)
+        length = int.from_bytes(bytes(shm.buf[:8]), "little")
+        header = json.loads(bytes(shm.buf[8:8 + length]))
+        arrays = {}
+        if header.get("matrix_file"):
+            spec = header["matrix_file"]
+            try:
+                arrays["matrix"] = np.memmap(spec["path"], dtype=np.float32, mode="r", offset=spec["offset"],
+                                             shape=(spec["rows"], header["dim"]))
+            except FileNotFoundError:
+                # Superseded (and deleted) since we read the name: take the newer generation
+                shm.close()
+                return self._load()
+
+        data_start = -(-(8 + length) // ALIGN) * ALIGN
+        for key, spec in header["arrays"].items():
+            array = np.ndarray(tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]), buffer=shm.buf,
+                               offset=data_start + spec["offset"])
+            array.flags.writeable = False
+            arrays[key] = array
+
+        ids = np.asarray(header["ids"], dtype=object)
+        names = np.asarray(header["names"], dtype=object)
+        if "codes" in arrays:
+            from utils.quantized_index import QuantizedIndex
+            index = QuantizedIndex._from_arrays(ids, names, arrays["matrix"])
+            index.codes, index.scale, index.rerank = arrays["codes"], arrays["scale"], header["rerank"]
+        elif "centroids" in arrays:
+            from utils.ann_index import IVFIndex
+            index = IVFIndex._from_arrays(ids, names, arrays["matrix"])
+            index.centroids, index.offsets, index.nprobe = arrays["centroids"], arrays["offsets"], header["nprobe"]
+        else:
+            index = GalleryIndex._from_arrays(ids, names, arrays["matrix"])
+
+        self._generation = header["generation"]
+        self._blocks.append(shm)
+        return index
+
+    def _release_old(self):
+        # A block can be closed once no index (or array) built on it is alive
+        for shm in self._blocks[:-1]:
+            try:
+                shm.close()
+                self._blocks.remove(shm)
+            except BufferError:
+                pass
@@ -0,0 +1,105 @@
+# utils/warmup.py
+import threading
+import time
+
+from config import EMBED_MAX_BATCH_SIZE, WARMUP_GALLERY
+
+
+class ModelWarmup:
+    """
+    Loads the detection and embedding models on a background thread and
+    runs dummy passes through them, so kernels are initialised before the
+    first real request. The API server starts serving straight away;
+    status() / GET /api/ready report when inference is hot.
+    """
+
+    def __init__(self, warm_gallery=WARMUP_GALLERY):
+        self.warm_gallery = warm_gallery
+        self.state = "cold"  # cold -> warming -> ready | failed
+        self.error = None
+        self.timings = {}
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start warming up (once); returns immediately"""
+        with self._lock:
+            if self._thread is None:
+                self.state = "warming"
+                self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+                self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Block until inference is hot (starting the warm-up if needed); True if ready"""
+        self.start()
+        self._ready.wait(timeout)
+        return self.state == "ready"
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def _step(self, name, fn):
+        start = time.perf_counter()
+        result = fn()
+        self.timings[name] = round(time.perf_counter() - start, 3)
+        return result
+
+    def _run(self):
+        try:
+            def load_models():
+                import cv2  # noqa: F401  (camera capture / JPEG encoding)
+                import numpy as np
+                import torch
+                from detection import detect_faces
+                from embedding import batcher, embedding_module
+                return np, torch, detect_faces, batcher, embedding_module
+
+            np, torch, detect_faces, batcher, embedding_module = self._step("import", load_models)
+
+            # One pass through each MTCNN stage and the embedding model at the
+            # sizes the scanner uses; the batcher's worker thread starts too.
+            # A blank frame only reaches P-Net (no candidates survive it), so
+            # R-Net / O-Net and the face crop run on dummy inputs directly
+            def warm_detection():
+                frame = np.full((480, 640, 3), 127, np.uint8)
+                detect_faces.detect_faces(frame, color="BGR")
+                with torch.no_grad():
+                    detect_faces.mtcnn.rnet(torch.zeros(1, 3, 24, 24))
+                    detect_faces.mtcnn.onet(torch.zeros(1, 3, 48, 48))
+                detect_faces._extract(detect_faces.to_frame_tensor(frame, "BGR"), [200, 120, 440, 360])
+
+            self._step("detect", warm_detection)
+            self._step("embed", lambda: [
+                embedding_module.get_face_embeddings(torch.zeros(n, *embedding_module.FACE_SHAPE))
+                for n in sorted({1, min(8, EMBED_MAX_BATCH_SIZE)})
+            ])
+            self._step("batcher", lambda: batcher.embedding_batcher.embed(torch.zeros(embedding_module.FACE_SHAPE)))
+            self.state = "ready"
+            print(f"🔥 Models warm: {self.timings}")
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"❌ Model warm-up failed: {e}")
+        finally:
+            self._ready.set()
+
+        if self.warm_gallery:
+            try:
+                from supabase_utils.gallery_cache import get_gallery
+                self._step("gallery", get_gallery)
+            except Exception as e:
+                print(f"⚠️ Gallery warm-up failed: {e}")
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "error": self.error,
+            "timings": dict(self.timings),
+        }
+
+
+model_warmup = ModelWarmup()
@@ -46,7 +46,8 @@ const AttendanceScanner: React.FC<AttendanceScannerProps> = ({ onBack }) => {
     } | null>(null);
     const [registeredFacesCount, setRegisteredFacesCount] = useState(0);
 
-    // Polling interval for frames
+    // Frame socket (pushed frames), with interval polling as a fallback
+    const frameSocketRef = useRef<WebSocket | null>(null);
     const frameIntervalRef = useRef<NodeJS.Timeout | null>(null);
     const summaryIntervalRef = useRef<NodeJS.Timeout | null>(null);
 
@@ -99,8 +100,38 @@ const AttendanceScanner: React.FC<AttendanceScannerProps> = ({ onBack }) => {
         }
     };
 
-    // Start polling for frames
+    // Start receiving frames: pushed over a WebSocket, falling back to polling
     const startFramePolling = () => {
+        stopFramePolling();
+        let received = false;
+        try {
+            const socket = ApiService.openScannerSocket(
+                (frameData: any) => {
+                    received = true;
+                    setCurrentFrame(frameData.frame);
+                    setLatestDetection(frameData.detection);
+                },
+                () => {
+                    // Fall back to polling if the socket never worked or dropped unexpectedly
+                    if (frameSocketRef.current === socket) {
+                        frameSocketRef.current = null;
+                        console.log(received ? 'Scanner socket closed, polling instead' : 'Scanner socket unavailable, polling instead');
+                        startIntervalPolling();
+                    }
+                }
+            );
+            frameSocketRef.current = socket;
+        } catch (error) {
+            console.error('Error opening scanner socket:', error);
+            startIntervalPolling();
+        }
+    };
+
+    // Poll /scanner-frame (older servers / networks without WebSocket support)
+    const startIntervalPolling = () => {
+        if (frameIntervalRef.current) {
+            return;
+        }
         frameIntervalRef.current = setInterval(async () => {
             try {
                 const frameData = await ApiService.getScannerFrame();
@@ -113,8 +144,13 @@ const AttendanceScanner: React.FC<AttendanceScannerProps> = ({ onBack }) => {
         }, 1000); // Poll every 1 second
     };
 
-    // Stop polling for frames
+    // Stop receiving frames
     const stopFramePolling = () => {
+        if (frameSocketRef.current) {
+            const socket = frameSocketRef.current;
+            frameSocketRef.current = null;
+            socket.close();
+        }
         if (frameIntervalRef.current) {
             clearInterval(frameIntervalRef.current);
             frameIntervalRef.current = null;
@@ -152,6 +152,40 @@ class ApiService {
     return this.makeRequest('/scanner-frame');
   }
 
+  // URL of the MJPEG stream (usable directly as an <Image> / <img> source)
+  getScannerStreamUrl() {
+    return `${this.baseURL}/scanner-stream`;
+  }
+
+  // Open a WebSocket that pushes scanner frames and attendance events.
+  // onMessage receives each {type: 'frame', frame, detection, detections, events} message;
+  // onClose is called when the socket closes or fails. Returns the socket.
+  openScannerSocket(onMessage, onClose, { frames = true } = {}) {
+    const wsUrl = this.baseURL.replace(/^http/, 'ws') + `/scanner-ws?frames=${frames}`;
+    console.log(`Opening scanner socket: ${wsUrl}`);
+
+    const socket = new WebSocket(wsUrl);
+    socket.onmessage = (event) => {
+      try {
+        const message = JSON.parse(event.data);
+        if (message.type === 'frame') {
+          onMessage(message);
+        }
+      } catch (error) {
+        console.error('Invalid scanner socket message:', error);
+      }
+    };
+    socket.onerror = (error) => {
+      console.error('Scanner socket error:', error);
+    };
+    socket.onclose = () => {
+      if (onClose) {
+        onClose();
+      }
+    };
+    return socket;
+  }
+
   // Get scanner status
   async getScannerStatus() {
     return this.makeRequest('/scanner-status');